@@ -3,11 +3,14 @@
 from ptools import *
 import sys
 import os
-#import time
+import time
 import datetime
 import math
 import string
 import bz2  #for compression of Ligand and receptor data
+import multiprocessing
+import tempfile
+import itertools
 import base64 #compressed ligand and receptor as base64 strings
 
 
@@ -30,62 +33,10 @@ def PrintVect(vect):
 
 
 
-class Rotation:
-    
-    class _Rot:
-        ssi=0.0
-        phi=0.0
-        rot=0.0
-        def __init__(self, ssii, phii, roti):
-            self.ssi=ssii
-            self.phi=phii
-            self.rot=roti
-    
-    def read_rotdat(self):
-        self.zwopi=2.0*3.14159265
-        self.NbRotByTrans=0
-        self.theta=[]
-        self.nphi=[]
-        # read theta,phi,rot data
-        rotdat=open('rotation.dat','r')
-        line=rotdat.readline().split()
-        self.ntheta=int(line[0])
-        self.nrot=int(line[1])
-        print "ntheta, nrot: %i %i" %(self.ntheta,self.nrot)
-        for i in range(self.ntheta):
-            line=rotdat.readline().split()
-            self.theta.append(float(line[0]))
-            self.nphi.append(int(line[1]))
-            self.NbRotByTrans=self.NbRotByTrans+self.nphi[i]*self.nrot
-            self.theta[i]=self.zwopi*self.theta[i]/360.0
-            print self.theta[i],self.nphi[i]
-        rotdat.close()
-        self._rot=[]
-        
-        print "%i rotations by translation"%self.NbRotByTrans
-
-        for kkk in range(self.ntheta):
-            ssii=self.theta[kkk]
-            phii=self.zwopi/self.nphi[kkk]
-            for jjj in range(self.nphi[kkk]):
-                phiii=(jjj+1)*phii
-                for iii in range(self.nrot):
-                    roti=(iii+1)*self.zwopi/self.nrot
-                    self._rot.append((phiii, ssii, roti))
-
-
-    def __init__(self):
-        self.read_rotdat()
-    
-    def __iter__(self):
-        return self._rot.__iter__()
-
-
-
 class Translation:
     def __init__(self):
         self.translation_dat=Rigidbody("translation.dat")
-        print "Reading %i translations from translation.dat"%self.translation_dat.Size()
+        printHeader("Reading %i translations from translation.dat"%self.translation_dat.Size())
 
     def __iter__(self):
         self.i=0
@@ -113,7 +64,7 @@ def readParams(filename):
     
     #nb of minimizations to perform is first integer of cleaned lines
     nbminim=int(clean.pop(0).split()[0])
-    print "%i series of minimizations"%nbminim
+    printHeader("%i series of minimizations"%nbminim)
     
     
     lignames=[]
@@ -149,21 +100,10 @@ def readParams(filename):
 def rigidXstd_vector(rigid, mat_std):
     
     #create a 4x4 matrix from a linear std_vector_double
-    mat=[]
-    for iline in range(4):
-        line=[]
-        for icol in range(4):
-            line.append(mat_std[iline*4+icol])
-        mat.append(line)
+    mat=[[mat_std[iline*4+icol] for icol in range(4)] for iline in range(4)]
 
     out=AttractRigidbody(rigid)
-    for i in range(rigid.Size()):
-        coords=rigid.GetCoords(i)
-        coords2=Coord3D()
-        coords2.x = mat[0][0]*coords.x + mat[0][1]*coords.y + mat[0][2]*coords.z + mat[0][3]
-        coords2.y = mat[1][0]*coords.x + mat[1][1]*coords.y + mat[1][2]*coords.z + mat[1][3]
-        coords2.z = mat[2][0]*coords.x + mat[2][1]*coords.y + mat[2][2]*coords.z + mat[2][3]
-        out.SetCoords(i, coords2)
+    out.SetCoordsArray(rigid.ApplyMatrixBatch([mat])[0])
     return out
 
 # check if a required file is found
@@ -176,6 +116,34 @@ def checkFile(name, comment):
         sys.exit(msg)	
 
 
+# checkpoint of a run writing its output in a file (-o):
+# the first 'units' starting positions of the run are done, their output
+# ends at byte 'offset' and their poses are the first 'store' records of the
+# result store, 'skipped' of them were skipped by the pre-screen. 'start' is
+# the start time of the run. 'complete' is 1 once the output is finished.
+def writeCheckpoint(filename, checkpoint):
+    f = open(filename+".tmp", "w")
+    for key in sorted(checkpoint.keys()):
+        f.write("%s %s\n"%(key, checkpoint[key]))
+    f.close()
+    os.rename(filename+".tmp", filename)
+
+def readCheckpoint(filename):
+    checkpoint={}
+    for line in open(filename, "r"):
+        key, value = line.rstrip("\n").split(" ", 1)
+        checkpoint[key]=value
+    for key in ("units", "offset", "store", "skipped", "complete"):
+        checkpoint[key]=int(checkpoint[key])
+    checkpoint['start']=datetime.datetime.strptime(checkpoint['start'], "%Y-%m-%d %H:%M:%S.%f")
+    return checkpoint
+
+# the header of the output is already in the output of a resumed run
+def printHeader(text):
+    if not resumed:
+        print text
+
+
 ###########################
 ##  MAIN ATTRACT PROGRAM  #
 ###########################
@@ -186,13 +154,47 @@ parser.add_option("-l", "--ligand", action="store", type="string", dest="ligand_
 parser.add_option("-s", "--single", action="store_true", dest="single", default=False, help="single minimization mode")
 parser.add_option("--ref", action="store", type="string", dest="reffile", help="reference ligand for rmsd" )
 parser.add_option("-t", "--translation", action="store", type="int", dest="transnb", help="translation number (distributed mode) starting from 0 for the first one!")
+parser.add_option("--ntrans", action="store", type="int", dest="ntrans", default=1, help="number of translations docked from the one given by -t (distributed mode)")
+parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=1, help="number of processes docking in parallel (same output as a single process)")
+parser.add_option("--clash", action="store", type="float", dest="clash", help="pre-screen: distance (A) between a receptor and a ligand atom counted as a clash")
+parser.add_option("--maxclash", action="store", type="int", dest="maxclash", default=0, help="pre-screen: starting positions with more clashing ligand atoms are not minimized (default 0)")
+parser.add_option("--contact", action="store", type="float", dest="contact", help="pre-screen: starting positions without any ligand atom closer than this distance (A) to the receptor are not minimized")
+parser.add_option("--flag", action="store_true", dest="flag", default=False, help="pre-screen: only flag the starting positions in the output, minimize them all")
+parser.add_option("-o", "--output", action="store", type="string", dest="outputfile", help="write the output in this file instead of the standard output, with a checkpoint (file.ckpt)")
+parser.add_option("--resume", action="store_true", dest="resume", default=False, help="resume an interrupted run from the checkpoint of its output (-o), appending to the output")
+parser.add_option("--checkpoint", action="store", type="float", dest="checkpoint", default=60.0, help="time between two checkpoints in seconds (default 60)")
+parser.add_option("--store", action="store", type="string", dest="storefile", help="also write the results in a binary result store (read by extract.py and cluster.py)")
 (options, args) = parser.parse_args()
 
+# the run being checkpointed: a resumed run must do the same docking
+runid="%s %s %s %s %s %s %s %s %s"%(options.receptor_name, options.ligand_name, options.transnb, options.ntrans, options.storefile, options.clash, options.maxclash, options.contact, options.flag)
+resumed=None
+if (options.resume and not options.outputfile):
+    parser.error("option --resume requires -o")
+if (options.outputfile):
+    checkpointfile=options.outputfile+".ckpt"
+    if (options.resume and os.path.exists(checkpointfile)):
+        resumed=readCheckpoint(checkpointfile)
+        if resumed['run']!=runid:
+            parser.error("the checkpoint %s is from another run (%s)"%(checkpointfile, resumed['run']))
+        if resumed['complete']:
+            sys.stderr.write("%s is complete, nothing to resume\n"%options.outputfile)
+            sys.exit(0)
+        output=open(options.outputfile, "r+b")
+        output.truncate(resumed['offset']) #drops what was written after the checkpoint
+        output.seek(0, 2)
+    else:
+        output=open(options.outputfile, "wb")
+    #the library writes to the standard output too: the file replaces it
+    sys.stdout.flush()
+    os.dup2(output.fileno(), 1)
+    output.close()
+
 
 #receptor_name=args[0]
 #ligand_name=args[1]
 
-print """
+printHeader("""
 **********************************************************************
 **                                                                  **
 **                ATTRACT  (Python edition)                         **
@@ -202,14 +204,16 @@ print """
 PTools revision %s
 from branch %s
 unique id %s
-"""%(Version().revstr, Version().branchnick, Version().revid)
+"""%(Version().revstr, Version().branchnick, Version().revid))
 
 import locale
 
 #locale.setlocale(locale.LC_ALL, 'fr_FR')
 time_start = datetime.datetime.now()
+if (resumed):
+    time_start = resumed['start'] #the elapsed time is that of the whole run
 #print now,"(",now.strftime("%A %B %d %Y, %H:%M"),")"
-print "Start time:", time_start
+printHeader("Start time: %s"%time_start)
 
 #==========================
 # check required files
@@ -233,18 +237,20 @@ checkFile("aminon.par", "forcefield file is required.")
 # read parameter file
 #==========================
 
-print "Reading parameters file: attract.inp"
+printHeader("Reading parameters file: attract.inp")
 (nbminim,lignames,minimlist,rstk) = readParams("attract.inp")
-print "rstk = ",rstk
+printHeader("rstk =  %s"%rstk)
 rec=Rigidbody(options.receptor_name)
 lig=Rigidbody(options.ligand_name)
 rec=AttractRigidbody(rec)
 lig=AttractRigidbody(lig)
-print "Reading receptor (fixed): %s with %d particules" %( options.receptor_name, rec.Size() )
-print "Reading  ligand (mobile): %s with %d particules" %( options.ligand_name,   lig.Size() )
+printHeader("Reading receptor (fixed): %s with %d particules" %( options.receptor_name, rec.Size() ))
+printHeader("Reading  ligand (mobile): %s with %d particules" %( options.ligand_name,   lig.Size() ))
 
 if (options.single and options.transnb):
     parser.error("options -s and -t are mutually exclusive")
+if (options.single and options.jobs > 1):
+    parser.error("options -s and -j are mutually exclusive")
 
 # save all minimization variables in trajectory file
 trjname = "minimization.trj"
@@ -254,11 +260,11 @@ if (options.single):
 if (options.reffile):
     checkFile(options.reffile, "")
     ref=Rigidbody(options.reffile)
-    print "Reading reference file: %s with %d particules" %( options.reffile, ref.Size() )
+    printHeader("Reading reference file: %s with %d particules" %( options.reffile, ref.Size() ))
     refca = ref.CA()
     if refca.Size() == 0:  #No C alpha atom, ligand is probably a dna
         Rmsd_alias = Rmsd
-        print "No Calpha atom found for ligand (DNA?). RMSD will be calculated on all grains"
+        printHeader("No Calpha atom found for ligand (DNA?). RMSD will be calculated on all grains")
     else:
         Rmsd_alias = rmsdca
 
@@ -268,12 +274,16 @@ if (not options.single):
     checkFile("rotation.dat", "rotation file is required.")
     checkFile("translation.dat", "translation file is required.\nFormer users can rename translat.dat into translation.dat.")
     translations=Translation()
-    rotations=Rotation()
+    rotations=RotationSet("rotation.dat")
+    printHeader("%i rotations by translation"%rotations.Size())
 else: #(single mode)
     #creates dummy translation and rotation
     translations=[[1,lig.FindCenter()]]
-    rotations=[(0,0,0)]
-    print "Single mode simulation"
+    rotations=RotationSet()
+    rotations.AddRotation(surreal(0),surreal(0),surreal(0))
+    printHeader("Single mode simulation")
+#centered and rotated ligands are computed once for all translations
+rotations.SetLigand(lig)
 
 
 
@@ -285,93 +295,227 @@ if (options.transnb!=None):
     checkFile("rotation.dat", "rotation file is required.")
     checkFile("translation.dat", "translation file is required.\nFormer users may rename translat.dat into translation.dat.")
     trans=Rigidbody("translation.dat")
-    co=trans.GetCoords(options.transnb)
-    translations=[[options.transnb+1,co]]
+    last=min(options.transnb+options.ntrans, trans.Size())
+    translations=[[i+1,trans.GetCoords(i)] for i in range(options.transnb, last)]
     transnb=options.transnb
-    if transnb!=trans.Size()-1:
+    if last!=trans.Size():
         printFiles=False #don't append ligand, receptor, etc. unless this is the last translation point of the simulation
 
-# core attract algorithm
-for trans in translations:
-    transnb+=1
-    print "@@@@@@@ Translation nb %i @@@@@@@" %(transnb)
-    rotnb=0
-    for rot in rotations:
-        rotnb+=1
-        print "----- Rotation nb %i -----"%rotnb
-        minimcounter=0
-        ligand=AttractRigidbody(lig)
-
-        center=ligand.FindCenter()
-        ligand.Translate(Coord3D()-center) #set ligand center of mass to 0,0,0
-        ligand.AttractEulerRotate(surreal(rot[0]),surreal(rot[1]),surreal(rot[2]))
-        ligand.Translate(trans[1])
-
-        for minim in minimlist:
-            minimcounter+=1
-            cutoff=math.sqrt(minim['squarecutoff'])
-            niter=minim['maxiter']
-            print "{{ minimization nb %i of %i ; cutoff= %.2f (A) ; maxiter= %d"%(minimcounter,nbminim,cutoff,niter)
-
-
-            #performs single minimization on receptor and ligand, given maxiter=niter and restraint constant rstk
-            forcefield=AttractForceField1("aminon.par",surreal(cutoff))
-            rec.setTranslation(False)
-            rec.setRotation(False)
-            
-            forcefield.AddLigand(rec)
-            forcefield.AddLigand(ligand)
-            rstk=minim['rstk']  #restraint force
-            #if rstk>0.0:
-                #forcefield.SetRestraint(rstk)
-            lbfgs_minimizer=Lbfgs(forcefield)
-            lbfgs_minimizer.minimize(niter)
-            X=lbfgs_minimizer.GetMinimizedVars()  #optimized freedom variables after minimization
-
-
-            #TODO: test and use CenterToOrigin() !
-            output=AttractRigidbody(ligand)
-            center=output.FindCenter()
-            output.Translate(Coord3D()-center)
-            output.AttractEulerRotate(surreal(X[0]), surreal(X[1]), surreal(X[2]))
-            output.Translate(Coord3D(surreal(X[3]),surreal(X[4]),surreal(X[5])))
-            output.Translate(center)
-
-            ligand=AttractRigidbody(output)
-            if (options.single):
-                ntraj=lbfgs_minimizer.GetNumberIter()
-                for iteration in range(ntraj):
-                    traj = lbfgs_minimizer.GetMinimizedVarsAtIter(iteration)
-                    for t in traj:
-                        ftraj.write("%f "%t)
-                    ftraj.write("\n")
-                ftraj.write("~~~~~~~~~~~~~~\n")
-
-
-        #computes RMSD if reference structure available
-        if (options.reffile):
-            rms=Rmsd_alias(ref, output)
-        else:
-            rms="XXXX"
+# the receptor is fixed: its spatial index is built once and shared by all minimizations
+rec.setTranslation(False)
+rec.setRotation(False)
+maxcutoff=max([math.sqrt(minim['squarecutoff']) for minim in minimlist])
+recindex=ReceptorIndex(rec, surreal(maxcutoff))
+
+# pre-screen of the starting positions with a finer index of the receptor
+screenindex=None
+if (options.clash or options.contact):
+    screenindex=ReceptorIndex(rec, surreal(min([d for d in (options.clash, options.contact) if d])))
+
+# one forcefield and one minimizer per minimization stage, reused for all starting positions
+stages=[]
+for minim in minimlist:
+    forcefield=AttractForceField1("aminon.par",surreal(math.sqrt(minim['squarecutoff'])))
+    forcefield.AddLigand(rec, recindex)
+    forcefield.AddLigand(AttractRigidbody(lig))
+    #rstk=minim['rstk']  #restraint force
+    #if rstk>0.0:
+        #forcefield.SetRestraint(rstk)
+    stages.append((forcefield, Lbfgs(forcefield)))
+scoringff=AttractForceField1("aminon.par", surreal(500))
+
+if (options.storefile):
+    from resultstore import ResultWriter
+    if (resumed):
+        resultstore=ResultWriter(options.storefile, count=resumed['store'])
+    else:
+        resultstore=ResultWriter(options.storefile)
+
+def screen(ligand):
+    """reason not to minimize a starting position (None if it passes the pre-screen)"""
+    if (options.clash):
+        clashes=screenindex.CountClashes(ligand, surreal(options.clash))
+        if clashes > options.maxclash:
+            return "%i clashing atoms"%clashes
+    if (options.contact and not screenindex.InContact(ligand, surreal(options.contact))):
+        return "no contact"
+    return None
+
+
+def dock(transnb, trans, rotnb):
+    """minimizes the ligand from one starting position and prints the results
+
+    returns the energy, the rmsd (None without reference) and the matrix of
+    the ligand (only with --store), or None if the pre-screen skips it
+    """
+    print "----- Rotation nb %i -----"%rotnb
+    minimcounter=0
+    ligand=AttractRigidbody(lig)
+    rotations.Place(rotnb-1, trans[1], ligand) #ligand centered, rotated and translated
+
+    if (screenindex is not None):
+        reason=screen(ligand)
+        if reason is not None:
+            #recorded in the output: skipped positions are not lost
+            print "%-4s %6d %6d %s" %("!!", transnb, rotnb, ("flagged: " if options.flag else "skipped: ")+reason)
+            if not options.flag:
+                return None
+
+    for minim in minimlist:
+        minimcounter+=1
+        cutoff=math.sqrt(minim['squarecutoff'])
+        niter=minim['maxiter']
+        print "{{ minimization nb %i of %i ; cutoff= %.2f (A) ; maxiter= %d"%(minimcounter,nbminim,cutoff,niter)
+
+
+        #performs single minimization on receptor and ligand, given maxiter=niter and restraint constant rstk
+        forcefield, lbfgs_minimizer = stages[minimcounter-1]
+        forcefield.ResetLigand(1, ligand)
+        lbfgs_minimizer.minimize(niter)
+        X=lbfgs_minimizer.GetMinimizedVars()  #optimized freedom variables after minimization
+
+
+        #TODO: test and use CenterToOrigin() !
+        output=AttractRigidbody(ligand)
+        center=output.FindCenter()
+        output.Translate(Coord3D()-center)
+        output.AttractEulerRotate(surreal(X[0]), surreal(X[1]), surreal(X[2]))
+        output.Translate(Coord3D(surreal(X[3]),surreal(X[4]),surreal(X[5])))
+        output.Translate(center)
+
+        ligand=AttractRigidbody(output)
+        if (options.single):
+            ntraj=lbfgs_minimizer.GetNumberIter()
+            for iteration in range(ntraj):
+                traj = lbfgs_minimizer.GetMinimizedVarsAtIter(iteration)
+                for t in traj:
+                    ftraj.write("%f "%t)
+                ftraj.write("\n")
+            ftraj.write("~~~~~~~~~~~~~~\n")
+
+
+    #computes RMSD if reference structure available
+    if (options.reffile):
+        rms=Rmsd_alias(ref, output)
+    else:
+        rms="XXXX"
+
+
+    #calculates true energy, and rmsd if possible
+    #with the new ligand position
+    print "%4s %6s %6s %13s %13s"  %(" ","Trans", "Rot", "Ener", "RmsdCA_ref")
+    ener=scoringff.ScoreEnergy(rec, recindex, ligand, surreal(500))
+    print "%-4s %6d %6d %13.7f %13s" %("==", transnb, rotnb, ener, str(rms))
+    output.PrintMatrix()
+    matrix=None
+    if (options.storefile):
+        matrix=output.GetMatrixArray()
+    return float(ener), (None if options.reffile is None else float(rms)), matrix
+
+
+def dock_unit(unit):
+    """dock() of a starting position given by its numbers (transnb, rotnb)"""
+    transnb, rotnb = unit
+    return dock(transnb, translist[transnb-firsttransnb-1], rotnb)
+
+
+capturefile=None
+def dock_captured(unit):
+    """dock_unit() in a worker process: returns the printed text with the results
+
+    the standard output (file descriptor 1, where both Python and the library
+    write) is redirected to a temporary file while the ligand is docked.
+    """
+    global capturefile
+    if capturefile is None:
+        capturefile=tempfile.TemporaryFile()
+    capturefile.seek(0)
+    capturefile.truncate()
+    sys.stdout.flush()
+    saved=os.dup(1)
+    os.dup2(capturefile.fileno(), 1)
+    try:
+        result=dock_unit(unit)
+        sys.stdout.flush()
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+    capturefile.seek(0)
+    return capturefile.read(), result
+
+
+def work_units():
+    """(transnb, rotnb) of each starting position left, in the output order"""
+    units=((firsttransnb+i+1, j+1) for i in range(len(translist)) for j in range(rotations.Size()))
+    return itertools.islice(units, unitsdone, None)
+
+
+def checkpoint(complete=0):
+    """records the starting positions done once their output is on the disk"""
+    sys.stdout.flush()
+    state={'run': runid, 'units': unitsdone, 'offset': os.lseek(1, 0, os.SEEK_CUR),
+           'store': 0, 'skipped': skipped, 'start': time_start.strftime("%Y-%m-%d %H:%M:%S.%f"),
+           'complete': complete}
+    if (options.storefile and not complete):
+        resultstore.flush()
+        state['store']=resultstore.count
+    writeCheckpoint(checkpointfile, state)
 
 
-        #calculates true energy, and rmsd if possible
-        #with the new ligand position
-        forcefield=AttractForceField1("aminon.par", surreal(500))
-        print "%4s %6s %6s %13s %13s"  %(" ","Trans", "Rot", "Ener", "RmsdCA_ref")
-        pl = AttractPairList(rec, ligand,surreal(500))
-        print "%-4s %6d %6d %13.7f %13s" %("==", transnb, rotnb, forcefield.nonbon8(rec,ligand,pl), str(rms))
-        output.PrintMatrix()
+# core attract algorithm
+#the starting positions are numbered once: workers only receive the numbers
+translist=list(translations)
+firsttransnb=transnb
+unitsdone=0
+skipped=0
+if (resumed):
+    unitsdone=resumed['units']
+    skipped=resumed['skipped']
+    sys.stderr.write("Resuming after %i starting positions (checkpoint %s)\n"%(unitsdone, checkpointfile))
+lastcheckpoint=time.time()
+if (options.jobs > 1):
+    #starting positions are given one at a time to the first free worker
+    #(minimizations have very different lengths), and their outputs are
+    #written in the order of the serial run
+    sys.stdout.flush() #the workers must not inherit pending output
+    pool=multiprocessing.Pool(options.jobs)
+    results=pool.imap(dock_captured, work_units(), 1)
+else:
+    results=((None, dock_unit(unit)) for unit in work_units())
+
+for transnb, rotnb in work_units():
+    if rotnb==1:
+        print "@@@@@@@ Translation nb %i @@@@@@@" %(transnb)
+        sys.stdout.flush()
+    text, result = results.next()
+    if text is not None:
+        sys.stdout.write(text)
+    if result is None:
+        skipped+=1
+    elif (options.storefile):
+        ener, rms, matrix = result
+        resultstore.add(transnb, rotnb, ener, rms, matrix)
+    unitsdone+=1
+    if (options.outputfile and time.time()-lastcheckpoint >= options.checkpoint):
+        checkpoint()
+        lastcheckpoint=time.time()
+
+if (options.jobs > 1):
+    pool.close()
+    pool.join()
+if (screenindex is not None and not options.flag):
+    print "%i starting positions skipped by the pre-screen (lines starting with !!)"%skipped
 
 
 #output compressed ligand and receptor:
 if ( not options.single and printFiles==True): 
-    print compress_file(options.receptor_name)
-    print compress_file(options.ligand_name)
-    print compress_file("aminon.par")
-    print compress_file("translation.dat")
-    print compress_file("rotation.dat")
-    print compress_file("attract.inp")
+    for name in (options.receptor_name, options.ligand_name, "aminon.par", "translation.dat", "rotation.dat", "attract.inp"):
+        compressed=compress_file(name)
+        print compressed
+        if (options.storefile):
+            resultstore.addFile(name, compressed.split(' : "', 1)[1][:-1])
+if (options.storefile):
+    resultstore.close()
 
 # close trajectory file for single minimization 
 if (options.single):
@@ -383,4 +527,6 @@ time_end = datetime.datetime.now()
 #print "Finished at: ",now.strftime("%A %B %d %Y, %H:%M")
 print "End time:", time_end
 print "Elapsed time:", time_end - time_start
+if (options.outputfile):
+    checkpoint(complete=1)
 
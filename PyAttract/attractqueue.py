@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+
+## work queue for distributed attract runs
+##
+## The translations are split into chunks, each one docked by
+## "attract.py -t first --ntrans count". The queue is a directory shared by
+## the workers (local processes, or jobs of a cluster running
+## "attractqueue.py --work QUEUE" in the run directory):
+##
+##   command        arguments given to attract.py, one per line
+##   todo/NNNNNN    chunks waiting for a worker ("first count attempts")
+##   running/       chunks claimed by a worker (atomic rename from todo/), the
+##                  worker touches them every HEARTBEAT seconds while docking
+##   done/          docked chunks, their output being out/NNNNNN.out
+##   failed/        chunks which failed more than --retries times
+##   log            one line per event (chunk times, job counts)
+##
+## A chunk whose file in running/ was not touched for --lease seconds belongs
+## to a worker which is gone: it is put back in todo/ by the next run of the
+## queue or by a worker which has nothing left to dock. A queue can only be
+## run again with the arguments it was created with (same command).
+##
+## The outputs of the chunks are then merged into a single attract output
+## (with its index, see resultstore.py) or a result store.
+
+import sys
+import os
+import time
+import datetime
+import socket
+import subprocess
+import multiprocessing
+
+from resultstore import ResultWriter, OutputIndex, parseOutput
+
+
+HEARTBEAT = 10 #seconds between two touches of a running chunk
+SKIPPED = " starting positions skipped by the pre-screen (lines starting with !!)\n" #end of the skipped count line of attract
+
+
+def countTranslations(filename):
+    """number of translations of translation.dat (its ATOM lines)"""
+    f = open(filename, "r")
+    n = 0
+    for line in f:
+        if line.startswith("ATOM  "):
+            n += 1
+    f.close()
+    return n
+
+
+class WorkQueue:
+    """file-based queue of translation chunks"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def log(self, message):
+        line = "%s %s\n" % (datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), message)
+        f = open(self.path("log"), "a")
+        f.write(line)
+        f.close()
+        sys.stderr.write(line)
+
+    def create(self, command, ntrans, chunksize):
+        """creates the queue: one chunk of chunksize translations for each range"""
+        if os.path.exists(self.directory):
+            raise ValueError("the queue %s already exists" % self.directory)
+        os.mkdir(self.directory)
+        for name in ("todo", "running", "done", "failed", "out"):
+            os.mkdir(self.path(name))
+        f = open(self.path("command"), "w")
+        f.write("".join("%s\n" % arg for arg in command))
+        f.close()
+        nchunks = 0
+        for first in range(0, ntrans, chunksize):
+            self._write("todo", nchunks, first, min(chunksize, ntrans - first), 0)
+            nchunks += 1
+        self.log("queue created: %i translations in %i chunks of %i" % (ntrans, nchunks, chunksize))
+
+    def _write(self, state, chunk, first, count, attempts):
+        name = self.path(state, "%06d" % chunk)
+        f = open(name + ".tmp", "w")
+        f.write("%i %i %i\n" % (first, count, attempts))
+        f.close()
+        os.rename(name + ".tmp", name)
+
+    def _read(self, state, chunk):
+        f = open(self.path(state, "%06d" % chunk), "r")
+        first, count, attempts = [int(x) for x in f.read().split()]
+        f.close()
+        return first, count, attempts
+
+    def chunks(self, state):
+        return sorted(int(name) for name in os.listdir(self.path(state)) if not name.endswith(".tmp"))
+
+    def command(self):
+        f = open(self.path("command"), "r")
+        command = f.read().splitlines()
+        f.close()
+        return command
+
+    def claim(self):
+        """moves the first waiting chunk to running/ and returns its number (None if none left)"""
+        for chunk in self.chunks("todo"):
+            try:
+                os.utime(self.path("todo", "%06d" % chunk), None) #starts the lease
+                os.rename(self.path("todo", "%06d" % chunk), self.path("running", "%06d" % chunk))
+            except OSError:
+                continue #claimed by another worker
+            return chunk
+        return None
+
+    def work(self, retries, attract, lease):
+        """docks chunks until the queue is empty, returns the number of chunks docked"""
+        command = self.command()
+        ndocked = 0
+        while True:
+            chunk = self.claim()
+            if chunk is None and self.requeue(lease):
+                continue #chunks of workers which are gone
+            if chunk is None:
+                return ndocked
+            first, count, attempts = self._read("running", chunk)
+            attempts += 1
+            outname = self.path("out", "%06d.out" % chunk)
+            #a requeued chunk may be docked twice at the same time: each worker has its own output
+            tmpname = "%s.%s.%i" % (outname, socket.gethostname(), os.getpid())
+            start = time.time()
+            out = open(tmpname, "w")
+            status = self.run(chunk, [sys.executable, attract] + command + ["-t", str(first), "--ntrans", str(count)], out)
+            out.close()
+            elapsed = time.time() - start
+            if not self.release(chunk):
+                os.remove(tmpname)
+                self.log("chunk %i (translations %i-%i) was requeued while docked (pid %i), result dropped" % (chunk, first, first + count - 1, os.getpid()))
+                continue
+            os.rename(tmpname, outname)
+            if status == 0 and isComplete(outname):
+                self._write("done", chunk, first, count, attempts)
+                self.log("chunk %i (translations %i-%i) done in %.1f s (attempt %i, pid %i)" % (chunk, first, first + count - 1, elapsed, attempts, os.getpid()))
+                ndocked += 1
+            else:
+                state = "todo" if attempts <= retries else "failed"
+                self._write(state, chunk, first, count, attempts)
+                self.log("chunk %i (translations %i-%i) failed after %.1f s (attempt %i, status %i)%s" % (chunk, first, first + count - 1, elapsed, attempts, status, "" if state == "todo" else ", given up"))
+
+    def run(self, chunk, args, out):
+        """runs the docking of a chunk, touching its running/ file every HEARTBEAT seconds"""
+        process = subprocess.Popen(args, stdout=out)
+        lastbeat = time.time()
+        while process.poll() is None:
+            time.sleep(0.2)
+            if time.time() - lastbeat >= HEARTBEAT:
+                try:
+                    os.utime(self.path("running", "%06d" % chunk), None)
+                except OSError:
+                    pass #requeued: see release()
+                lastbeat = time.time()
+        return process.returncode
+
+    def release(self, chunk):
+        """removes a chunk from running/, false if it was not there any more (requeued)"""
+        try:
+            os.remove(self.path("running", "%06d" % chunk))
+        except OSError:
+            return False
+        return True
+
+    def requeue(self, lease):
+        """puts back in the queue the chunks of workers which are gone (running/
+        files not touched for lease seconds), returns their number"""
+        nrequeued = 0
+        for chunk in self.chunks("running"):
+            name = self.path("running", "%06d" % chunk)
+            try:
+                if time.time() - os.path.getmtime(name) < lease:
+                    continue
+                os.rename(name, self.path("todo", "%06d" % chunk))
+            except OSError:
+                continue #done or requeued by another worker
+            self.log("chunk %i put back in the queue (no heartbeat for %i s)" % (chunk, lease))
+            nrequeued += 1
+        return nrequeued
+
+    def summary(self):
+        counts = dict((state, len(self.chunks(state))) for state in ("todo", "running", "done", "failed"))
+        retried = len([chunk for chunk in self.chunks("done") if self._read("done", chunk)[2] > 1])
+        self.log("jobs: %(done)i done, %(failed)i failed, %(todo)i waiting, %(running)i running" % counts + ", %i retried" % retried)
+        return counts
+
+    def outputs(self):
+        """outputs of the chunks in the order of the translations (all chunks must be done)"""
+        missing = [chunk for state in ("todo", "running", "failed") for chunk in self.chunks(state)]
+        if missing:
+            raise ValueError("chunks not docked: %s" % " ".join(str(chunk) for chunk in sorted(missing)))
+        return [self.path("out", "%06d.out" % chunk) for chunk in self.chunks("done")]
+
+
+def isComplete(outputfile):
+    """true if attract went to the end of the output (its last line is the elapsed time)"""
+    f = open(outputfile, "rb")
+    f.seek(0, 2)
+    f.seek(max(0, f.tell() - 256))
+    tail = f.read().decode("ascii", "replace")
+    f.close()
+    return "Elapsed time:" in tail
+
+
+def _parseTime(text):
+    """datetime printed by attract (str() of a datetime)"""
+    text = text.strip()
+    return datetime.datetime.strptime(text, "%Y-%m-%d %H:%M:%S.%f" if "." in text else "%Y-%m-%d %H:%M:%S")
+
+
+def mergeOutputs(outputs, outputfile=None, storefile=None):
+    """merges the outputs of the chunks into one attract output and/or a result store
+
+    the merged output looks like that of a single run: the header (banner,
+    start time, files read) of the first chunk, the translations of all the
+    chunks in their order, then the trailer (skipped count, embedded input
+    files written once, end and elapsed times of the whole run).
+    """
+    nposes = 0
+    if outputfile:
+        starts = []
+        for name in outputs:
+            f = open(name, "rb")
+            for l in f:
+                l = l.decode("ascii", "replace")
+                if l.startswith("Start time:"):
+                    starts.append(_parseTime(l[len("Start time:"):]))
+                    break
+                if l.startswith("@@@@@@@"):
+                    break
+            f.close()
+        out = open(outputfile, "wb")
+        copied = set()
+        compressed = []
+        skipped = None
+        end = None
+        for k, name in enumerate(outputs):
+            f = open(name, "rb")
+            header = True
+            for raw in f:
+                l = raw.decode("ascii", "replace")
+                if l.startswith("@@@@@@@"):
+                    header = False
+                if l.startswith("compressed "):
+                    filename = l.split(" : ", 1)[0]
+                    if filename not in copied:
+                        copied.add(filename)
+                        compressed.append(raw)
+                elif l.endswith(SKIPPED):
+                    skipped = (skipped or 0) + int(l.split()[0])
+                elif l.startswith("End time:"):
+                    chunkend = _parseTime(l[len("End time:"):])
+                    end = chunkend if end is None else max(end, chunkend)
+                elif l.startswith("Elapsed time:"):
+                    pass
+                elif not header:
+                    out.write(raw)
+                elif k == 0 and l.startswith("Start time:") and starts:
+                    out.write(("Start time: %s\n" % min(starts)).encode("ascii"))
+                elif k == 0:
+                    out.write(raw)
+            f.close()
+        if skipped is not None:
+            out.write(("%i%s" % (skipped, SKIPPED)).encode("ascii"))
+        for l in compressed:
+            out.write(l)
+        if end is not None:
+            out.write(("End time: %s\n" % end).encode("ascii"))
+            if starts:
+                out.write(("Elapsed time: %s\n" % (end - min(starts))).encode("ascii"))
+        out.close()
+        nposes = len(OutputIndex(outputfile)) #builds the index
+    if storefile:
+        writer = ResultWriter(storefile)
+        added = set()
+        nposes = 0
+        for name in outputs:
+            f = open(name, "rb")
+            for item in parseOutput(f):
+                if item[0] == "pose":
+                    kind, offset, trans, rot, ener, rmsd, matrix = item
+                    try:
+                        rmsd = float(rmsd)
+                    except ValueError:
+                        rmsd = None
+                    writer.add(trans, rot, ener, rmsd, matrix)
+                    nposes += 1
+                elif item[2] not in added:
+                    added.add(item[2])
+                    writer.addFile(item[2], item[3])
+            f.close()
+        writer.close()
+    return nposes
+
+
+def _work(directory, retries, attract, lease):
+    return WorkQueue(directory).work(retries, attract, lease)
+
+
+def main():
+    from optparse import OptionParser
+    parser = OptionParser(usage="%prog -q queue -r receptor_file -l ligand_file [--ref file] [-c size] [-w workers] [-o output] [--store file]\n       %prog -q queue --work\n       %prog -q queue --merge [-o output] [--store file]")
+    parser.add_option("-q", "--queue", action="store", type="string", dest="queue", help="directory of the work queue")
+    parser.add_option("-r", "--receptor", action="store", type="string", dest="receptor_name", help="name of the receptor file")
+    parser.add_option("-l", "--ligand", action="store", type="string", dest="ligand_name", help="name of the ligand file")
+    parser.add_option("--ref", action="store", type="string", dest="reffile", help="reference ligand for rmsd")
+    parser.add_option("-c", "--chunk", action="store", type="int", dest="chunksize", default=10, help="number of translations of a chunk (default 10)")
+    parser.add_option("-w", "--workers", action="store", type="int", dest="workers", default=multiprocessing.cpu_count(), help="number of local workers (default: number of processors)")
+    parser.add_option("--retries", action="store", type="int", dest="retries", default=2, help="number of times a failed chunk is docked again (default 2)")
+    parser.add_option("--lease", action="store", type="int", dest="lease", default=120, help="seconds without heartbeat after which a running chunk is docked again (default 120)")
+    parser.add_option("--work", action="store_true", dest="work", default=False, help="only dock chunks of an existing queue (cluster jobs)")
+    parser.add_option("--merge", action="store_true", dest="merge", default=False, help="only merge the outputs of a finished queue")
+    parser.add_option("-o", "--output", action="store", type="string", dest="outputfile", help="merged attract output (indexed)")
+    parser.add_option("--store", action="store", type="string", dest="storefile", help="merged result store")
+    parser.add_option("--attract", action="store", type="string", dest="attract", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "attract.py"), help="attract script")
+    (options, args) = parser.parse_args()
+
+    if not options.queue:
+        parser.error("option -q is mandatory")
+    queue = WorkQueue(options.queue)
+
+    if options.lease <= HEARTBEAT:
+        parser.error("--lease must be longer than the heartbeat (%i s)" % HEARTBEAT)
+
+    if options.work:
+        queue.work(options.retries, options.attract, options.lease)
+        return
+
+    if not options.merge:
+        if not options.receptor_name or not options.ligand_name:
+            parser.error("options -r and -l are mandatory")
+        if not options.outputfile and not options.storefile:
+            parser.error("an output (-o or --store) is required")
+        command = ["-r", options.receptor_name, "-l", options.ligand_name]
+        if options.reffile:
+            command += ["--ref", options.reffile]
+        if not os.path.exists(options.queue):
+            queue.create(command, countTranslations("translation.dat"), options.chunksize)
+        elif queue.command() != command:
+            sys.exit("ERROR: the queue %s was created for another docking (%s)" % (options.queue, " ".join(queue.command())))
+        else:
+            queue.requeue(options.lease) #run again after an interruption
+        start = time.time()
+        pool = multiprocessing.Pool(options.workers)
+        results = [pool.apply_async(_work, (options.queue, options.retries, options.attract, options.lease)) for i in range(options.workers)]
+        pool.close()
+        pool.join()
+        for r in results:
+            r.get()
+        queue.log("%i workers, %.1f s" % (options.workers, time.time() - start))
+
+    counts = queue.summary()
+    if counts["failed"] or counts["todo"] or counts["running"]:
+        sys.exit("ERROR: the queue is not finished, outputs not merged")
+    nposes = mergeOutputs(queue.outputs(), options.outputfile, options.storefile)
+    queue.log("%i poses merged" % nposes)
+
+
+if __name__ == "__main__":
+    main()
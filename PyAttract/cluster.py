@@ -23,7 +23,6 @@
 
 import sys
 from optparse import OptionParser
-import re
 import shelve
 
 import extract
@@ -146,18 +145,10 @@ if (__name__=="__main__"):
     ligandfile = sys.argv[2]
     lig = Rigidbody(ligandfile)
 
-    e = extract.Extractor(outputfile)   #extracts output structures or reuse the generated database
-    validkeys=[]
-    regexp = re.compile("[0-9]+:[0-9]+")  #filter keys of the form "23:356"
-    for k in e.d.keys():
-        if regexp.match(k):
-            validkeys.append(k)
+    e = extract.Extractor(outputfile)   #reads the result store (converted once from a text output)
 
-
-    #_,structures = readStructures(outputfile)
-    structures=[]
-    for k in validkeys:
-        structures.append(e.d[k])
+    #only the nstruct structures of lowest energy are clustered
+    structures=e.store.best(nstruct)
 
 
     dependencies=[outputfile]
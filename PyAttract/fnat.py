@@ -9,22 +9,18 @@ def contact(receptor, ligand):
     assert(isinstance(ligand,Rigidbody))
     
     
-    resnblig = []
-    for i in range(ligand.Size()):
-        at = ligand.CopyAtom(i)
-        resnblig.append(at.GetResidId())
-    resnbrec = []
-    for j in range(receptor.Size()):
-        at = receptor.CopyAtom(j)
-        resnbrec.append(at.GetResidId())
+    resnblig = ligand.GetResidIds()
+    resnbrec = receptor.GetResidIds()
     
     
     pl = AttractPairList(receptor,ligand,7)
     contactnat = {} # residue list in interaction
 
-    for i in range(pl.Size()):
-        ap = pl[i]
-        contactnat[(resnbrec[ap.atrec], resnblig[ap.atlig])] = True
+    #residue numbers of all the pairs at once:
+    resrec = resnbrec[list(pl.GetReceptorIndexes())]
+    reslig = resnblig[list(pl.GetLigandIndexes())]
+    for pair in zip(resrec.tolist(), reslig.tolist()):
+        contactnat[pair] = True
     
     return contactnat.keys()
 
@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+
+## binary store of docking results
+##
+## One fixed-width record per pose (translation and rotation numbers, energy,
+## rmsd and 4x4 ligand matrix) after a 64 bytes header, followed by the
+## compressed input files of the run. All numbers are little-endian.
+## The records are memory-mapped as a numpy structured array.
+##
+## header: "PTRESULT", version (uint32), record size (uint32),
+##         number of records (uint64), offset of the files section (uint64)
+## files section: number of files (uint32), then for each file the length
+##         (uint32) and characters of its name and of its data
+
+import os
+import struct
+import numpy
+
+
+MAGIC = "PTRESULT".encode("ascii")
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ32x")
+RECORD = numpy.dtype([("trans", "<i4"), ("rot", "<i4"), ("ener", "<f8"), ("rmsd", "<f8"), ("matrix", "<f8", (4, 4))])
+
+
+def isResultStore(filename):
+    f = open(filename, "rb")
+    magic = f.read(len(MAGIC))
+    f.close()
+    return magic == MAGIC
+
+
+
+class StructureI:
+    def __cmp__(self, other):
+            if self.trans < other.trans:
+                return -1
+            if self.trans > other.trans:
+                return 1
+            return cmp(self.rot, other.rot)
+    pass
+
+
+
+class ResultWriter:
+    """writes a result store, records are added in the order of the run"""
+
+    def __init__(self, filename, buffersize=1024, count=None):
+        """count: reopens an interrupted store, keeping its first count records"""
+        if count is None:
+            self.file = open(filename, "wb")
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize, 0, 0))
+            self.count = 0
+        else:
+            self.file = open(filename, "r+b")
+            magic, version, recordsize = HEADER.unpack(self.file.read(HEADER.size))[:3]
+            if magic != MAGIC or version != VERSION or recordsize != RECORD.itemsize:
+                raise ValueError("%s is not a result store" % filename)
+            if os.fstat(self.file.fileno()).st_size < HEADER.size + count * RECORD.itemsize:
+                raise ValueError("%s: less than %i records" % (filename, count))
+            self.file.truncate(HEADER.size + count * RECORD.itemsize)
+            self.file.seek(0, 2)
+            self.count = count
+        self.files = []
+        self.buffer = numpy.zeros(buffersize, dtype=RECORD)
+        self.nbuffered = 0
+
+    def add(self, trans, rot, ener, rmsd, matrix):
+        """adds a pose, rmsd is None if unknown"""
+        if rmsd is None:
+            rmsd = float("nan")
+        self.buffer[self.nbuffered] = (trans, rot, ener, rmsd, matrix)
+        self.nbuffered += 1
+        self.count += 1
+        if self.nbuffered == len(self.buffer):
+            self.flush()
+
+    def addFile(self, name, data):
+        """adds an input file of the run (as given by attract.py compress_file)"""
+        self.files.append((name, data))
+
+    def flush(self):
+        self.file.write(self.buffer[:self.nbuffered].tostring())
+        self.nbuffered = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        filesoffset = 0
+        if self.files:
+            filesoffset = HEADER.size + self.count * RECORD.itemsize
+            self.file.write(struct.pack("<I", len(self.files)))
+            for name, data in self.files:
+                for s in (name, data):
+                    s = s.encode("ascii")
+                    self.file.write(struct.pack("<I", len(s)))
+                    self.file.write(s)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize, self.count, filesoffset))
+        self.file.close()
+
+
+
+class ResultStore:
+    """read-only access to a result store
+
+    the records are memory-mapped: only the accessed poses are read from the
+    disk. Poses are indexed by (trans, rot).
+    """
+
+    def __init__(self, filename):
+        f = open(filename, "rb")
+        magic, version, recordsize, count, filesoffset = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a result store" % filename)
+        if version != VERSION or recordsize != RECORD.itemsize:
+            raise ValueError("%s: unsupported result store version %d" % (filename, version))
+
+        self.files = {}
+        if filesoffset:
+            f.seek(filesoffset)
+            nfiles, = struct.unpack("<I", f.read(4))
+            for i in range(nfiles):
+                values = []
+                for k in range(2):
+                    length, = struct.unpack("<I", f.read(4))
+                    values.append(f.read(length).decode("ascii"))
+                self.files[values[0]] = values[1]
+        f.close()
+
+        if count:
+            self.records = numpy.memmap(filename, dtype=RECORD, mode="r", offset=HEADER.size, shape=(count,))
+        else:
+            self.records = numpy.zeros(0, dtype=RECORD)
+
+        #index by (trans, rot): attract writes the poses in this order, so
+        #that the keys usually need no sorting
+        keys = (self.records["trans"].astype(numpy.int64) << 32) | self.records["rot"].astype(numpy.int64)
+        if len(keys) > 1 and numpy.any(keys[1:] < keys[:-1]):
+            self.order = numpy.argsort(keys, kind="mergesort")
+            self.keys = keys[self.order]
+        else:
+            self.order = None
+            self.keys = keys
+
+    def __len__(self):
+        return len(self.records)
+
+    def find(self, trans, rot):
+        """index of the record of a pose (KeyError if missing)"""
+        key = (trans << 32) | rot
+        i = numpy.searchsorted(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError("%i:%i" % (trans, rot))
+        if self.order is not None:
+            i = self.order[i]
+        return int(i)
+
+    def getMatrix(self, trans, rot):
+        return self.records["matrix"][self.find(trans, rot)].tolist()
+
+    def getNbStructures(self):
+        if len(self.records) == 0:
+            return -1, -1
+        return int(self.records["trans"].max()), int(self.records["rot"].max())
+
+    def structure(self, i):
+        """record i as a StructureI object (trans, rot, ener, rmsd, matrix)"""
+        rec = self.records[i]
+        s = StructureI()
+        s.trans = int(rec["trans"])
+        s.rot = int(rec["rot"])
+        s.ener = float(rec["ener"])
+        rmsd = float(rec["rmsd"])
+        s.rmsd = "XXXX" if rmsd != rmsd else str(rmsd)
+        s.matrix = rec["matrix"].tolist()
+        return s
+
+    def best(self, n):
+        """the n structures of lowest energy (StructureI objects, by increasing energy)"""
+        order = numpy.argsort(self.records["ener"], kind="mergesort")[:n]
+        return [self.structure(i) for i in order]
+
+    def structures(self):
+        """all the structures (StructureI objects)"""
+        return [self.structure(i) for i in range(len(self.records))]
+
+
+
+##
+## attract text outputs
+##
+## A text output is read in a single pass by parseOutput(). Its index
+## (OutputIndex, written next to the output as filename.idx) holds the byte
+## offset of each pose and of each compressed file, so that a single pose
+## is read by seeking to it.
+##
+## index: "PTOUTIDX", version (uint32), number of files (uint32), size and
+##        modification time of the output (int64), number of poses (uint64),
+##        then (trans, rot, offset) of each pose (int32, int32, int64) and
+##        for each file the length (uint32) and characters of its name and
+##        its offset (int64)
+
+INDEXMAGIC = "PTOUTIDX".encode("ascii")
+INDEXHEADER = struct.Struct("<8sIIqqQ")
+INDEXRECORD = numpy.dtype([("trans", "<i4"), ("rot", "<i4"), ("offset", "<i8")])
+
+
+def parseOutput(f, offset=0):
+    """reads an attract text output from a file opened in binary mode
+
+    yields ("pose", offset, trans, rot, ener, rmsd, matrix) for each pose (rmsd
+    is the text of the output) and ("file", offset, name, data) for each
+    compressed file, offsets being those of the "==" and "compressed" lines.
+    Only the current pose is kept in memory.
+    """
+    pose = None
+    while True:
+        l = f.readline()
+        if not l:
+            break
+        lineoffset = offset
+        offset += len(l)
+        l = l.decode("ascii", "replace")
+        if l.startswith("=="):
+            lspl = l.split()
+            pose = [lineoffset, int(lspl[1]), int(lspl[2]), float(lspl[3]), lspl[4], []]
+        elif pose is not None and l.startswith("MAT "):
+            pose[5].append([float(x) for x in l.split()[1:5]])
+        elif pose is not None and l.startswith("### MAT END"):
+            yield tuple(["pose"] + pose)
+            pose = None
+        elif l.startswith("compressed "):
+            name, sep, data = l.partition(" : ")
+            yield ("file", lineoffset, name[len("compressed "):], data.strip().strip('"'))
+
+
+def _outputStamp(outputfile):
+    st = os.stat(outputfile)
+    return st.st_size, int(st.st_mtime)
+
+
+def writeIndex(indexfile, outputfile, poses, files):
+    """writes the index of an output: poses are (trans, rot, offset), files (name, offset)"""
+    size, mtime = _outputStamp(outputfile)
+    f = open(indexfile + ".tmp", "wb")
+    f.write(INDEXHEADER.pack(INDEXMAGIC, VERSION, len(files), size, mtime, len(poses)))
+    f.write(numpy.array(poses, dtype=INDEXRECORD).tostring())
+    for name, offset in files:
+        name = name.encode("ascii")
+        f.write(struct.pack("<I", len(name)))
+        f.write(name)
+        f.write(struct.pack("<q", offset))
+    f.close()
+    os.rename(indexfile + ".tmp", indexfile)
+
+
+def convertOutput(outputfile, storefile, indexfile=None):
+    """writes the result store (and optionally the index) of an attract text output in a single pass"""
+    writer = ResultWriter(storefile)
+    poses = []
+    files = []
+    f = open(outputfile, "rb")
+    for item in parseOutput(f):
+        if item[0] == "pose":
+            kind, offset, trans, rot, ener, rmsd, matrix = item
+            try:
+                rmsd = float(rmsd)
+            except ValueError:
+                rmsd = None
+            writer.add(trans, rot, ener, rmsd, matrix)
+            poses.append((trans, rot, offset))
+        else:
+            kind, offset, name, data = item
+            writer.addFile(name, data)
+            files.append((name, offset))
+    f.close()
+    writer.close()
+    if indexfile:
+        writeIndex(indexfile, outputfile, poses, files)
+
+
+
+class OutputIndex:
+    """random access to the poses and files of an attract text output
+
+    the index (filename.idx) is built in one pass over the output when it is
+    missing or when the output has changed. Memory use does not depend on the
+    size of the output, apart from the 16 bytes per pose of the index.
+    """
+
+    def __init__(self, outputfile):
+        self.outputfile = outputfile
+        indexfile = "%s.idx" % outputfile
+        if not self._load(indexfile):
+            self._build(indexfile)
+            self._load(indexfile)
+
+    def _load(self, indexfile):
+        if not os.path.exists(indexfile):
+            return False
+        f = open(indexfile, "rb")
+        magic, version, nfiles, size, mtime, count = INDEXHEADER.unpack(f.read(INDEXHEADER.size))
+        if magic != INDEXMAGIC or version != VERSION or (size, mtime) != _outputStamp(self.outputfile):
+            f.close()
+            return False
+        if count:
+            self.poses = numpy.memmap(indexfile, dtype=INDEXRECORD, mode="r", offset=INDEXHEADER.size, shape=(count,))
+        else:
+            self.poses = numpy.zeros(0, dtype=INDEXRECORD)
+        f.seek(INDEXHEADER.size + count * INDEXRECORD.itemsize)
+        self.files = {}
+        for i in range(nfiles):
+            length, = struct.unpack("<I", f.read(4))
+            name = f.read(length).decode("ascii")
+            self.files[name], = struct.unpack("<q", f.read(8))
+        f.close()
+        keys = (self.poses["trans"].astype(numpy.int64) << 32) | self.poses["rot"].astype(numpy.int64)
+        self.order = numpy.argsort(keys, kind="mergesort")
+        self.keys = keys[self.order]
+        return True
+
+    def _build(self, indexfile):
+        poses = []
+        files = []
+        f = open(self.outputfile, "rb")
+        for item in parseOutput(f):
+            if item[0] == "pose":
+                poses.append((item[2], item[3], item[1]))
+            else:
+                files.append((item[2], item[1]))
+        f.close()
+        writeIndex(indexfile, self.outputfile, poses, files)
+
+    def __len__(self):
+        return len(self.poses)
+
+    def getNbStructures(self):
+        if len(self.poses) == 0:
+            return -1, -1
+        return int(self.poses["trans"].max()), int(self.poses["rot"].max())
+
+    def _read(self, offset):
+        f = open(self.outputfile, "rb")
+        f.seek(offset)
+        item = next(parseOutput(f, offset))
+        f.close()
+        return item
+
+    def getStructure(self, trans, rot):
+        """pose (trans, rot) read from the output (StructureI object)"""
+        key = (trans << 32) | rot
+        i = numpy.searchsorted(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError("%i:%i" % (trans, rot))
+        kind, offset, trans, rot, ener, rmsd, matrix = self._read(int(self.poses["offset"][self.order[i]]))
+        s = StructureI()
+        s.trans, s.rot, s.ener, s.rmsd, s.matrix = trans, rot, ener, rmsd, matrix
+        return s
+
+    def getMatrix(self, trans, rot):
+        return self.getStructure(trans, rot).matrix
+
+    def getFile(self, name):
+        """compressed file of the output (base64 string)"""
+        return self._read(self.files[name])[3]
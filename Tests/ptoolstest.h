@@ -2,6 +2,10 @@
 #include <ptools.h>
 
 #include <cstdlib>
+#include <cstring>
+#include <stdint.h>
+#include <sys/stat.h>
+#include <utime.h>
 
 #include <cxxtest/TestSuite.h>
 
@@ -115,6 +119,224 @@ Coord3D A, B;
         }
     }
 
+    void testCoordsArray()
+    {
+        r.AttractEulerRotate(0.3, -0.6, 1.2);
+        r.Translate(Coord3D(1.0, 2.0, -3.0));
+        const std::vector<Coord3D> & coords = r.GetCoordsArray();
+        TS_ASSERT_EQUALS(coords.size(), r.Size());
+        for (uint i=0; i<r.Size(); i++)
+            TS_ASSERT_EQUALS(coords[i], r.GetCoords(i));
+
+        //batch of two matrices: identity and a translation
+        dbl matrices[32];
+        for (uint k=0; k<32; k++) matrices[k] = ((k%16)%5 == 0) ? 1.0 : 0.0;
+        matrices[16+3] = 2.0;
+        std::vector<Coord3D> moved(2*r.Size());
+        r.ApplyMatrixBatch(matrices, 2, &moved[0]);
+
+        s = Rigidbody(r);
+        std::vector<Coord3D> shifted(r.Size());
+        for (uint i=0; i<r.Size(); i++)
+        {
+            TS_ASSERT_EQUALS(moved[i], r.GetCoords(i));
+            shifted[i] = r.GetCoords(i) + Coord3D(0.0, 0.0, 5.0);
+        }
+        s.SetCoordsArray(&shifted[0], shifted.size());
+        for (uint i=0; i<r.Size(); i++)
+        {
+            TS_ASSERT(Norm2(moved[r.Size()+i] - r.GetCoords(i) - Coord3D(2.0, 0.0, 0.0)) < 1e-20);
+            TS_ASSERT(Norm2(s.GetCoords(i) - shifted[i]) < 1e-18);
+        }
+        TS_ASSERT_THROWS(s.SetCoordsArray(&shifted[0], 3), std::invalid_argument);
+    }
+
+    void testAddAtoms()
+    {
+        AtomSelection sel = r.CA();
+        Rigidbody ca = sel.CreateRigid();
+        TS_ASSERT_EQUALS(ca.Size(), sel.Size());
+        for (uint i=0; i<ca.Size(); i++)
+        {
+            TS_ASSERT_EQUALS(ca.GetCoords(i), sel[i].GetCoords());
+            TS_ASSERT_EQUALS(ca.GetAtomProperty(i).GetType(), "CA");
+        }
+
+        Rigidbody merged = r + ca;
+        TS_ASSERT_EQUALS(merged.Size(), r.Size() + ca.Size());
+        TS_ASSERT_EQUALS(merged.GetCoords(r.Size()), ca.GetCoords(0));
+
+        std::vector<Atomproperty> atoms(2);
+        std::vector<Coord3D> coords(1);
+        TS_ASSERT_THROWS(merged.AddAtoms(atoms, coords), std::invalid_argument);
+    }
+
+    void testCopyOnWrite()
+    {
+        s = Rigidbody(r);
+        AttractRigidbody att(r);
+        //copies share the atom properties...
+        TS_ASSERT_EQUALS(&s.GetAtomProperty(0), &r.GetAtomProperty(0));
+        TS_ASSERT_EQUALS(&att.GetAtomProperty(0), &r.GetAtomProperty(0));
+
+        //...until one of them modifies them
+        Atomproperty atp(r.GetAtomProperty(0));
+        atp.SetType("XX");
+        s.SetAtomProperty(0, atp);
+        TS_ASSERT(&s.GetAtomProperty(0) != &r.GetAtomProperty(0));
+        TS_ASSERT_EQUALS(s.CopyAtom(0).GetType(), "XX");
+        TS_ASSERT_EQUALS(att.CopyAtom(0).GetType(), r.CopyAtom(0).GetType());
+        TS_ASSERT(r.CopyAtom(0).GetType() != "XX");
+
+        s.AddAtom(atp, Coord3D());
+        TS_ASSERT_EQUALS(s.Size(), r.Size() + 1);
+        TS_ASSERT_EQUALS(att.Size(), r.Size());
+    }
+
+    void testAtomStrings()
+    {
+        Atomproperty a, b;
+        a.SetType("CA");
+        b.SetType(std::string("C") + "A");
+        TS_ASSERT_EQUALS(a.GetTypeCode(), b.GetTypeCode());
+        TS_ASSERT_EQUALS(b.GetType(), "CA");
+        b.SetResidType("LEU");
+        TS_ASSERT_EQUALS(b.GetResidType(), "LEU");
+        TS_ASSERT_EQUALS(Atomproperty().GetResidType(), "XXX");
+
+        a.SetExtra("    3   -1.000 0 0");
+        TS_ASSERT_EQUALS(a.GetExtra(), "    3   -1.000 0 0");
+        TS_ASSERT_EQUALS(a.GetExtraCategory(), 3);
+        TS_ASSERT_EQUALS(a.GetExtraCharge(), -1.0);
+        TS_ASSERT_EQUALS(b.GetExtraCategory(), 0);
+        uint code;
+        TS_ASSERT(!FindAtomString("    3   -1.000 0 0", code)); //extra fields are not interned
+        b = a;
+        a.SetExtra("");
+        TS_ASSERT_EQUALS(b.GetExtra(), "    3   -1.000 0 0");
+        TS_ASSERT_EQUALS(a.GetExtra(), "");
+        TS_ASSERT_EQUALS(a.GetExtraCategory(), 0);
+
+        TS_ASSERT_EQUALS(r.SelectAtomType("NOT_AN_ATOM_TYPE").Size(), 0);
+        TS_ASSERT_EQUALS(r.SelectAtomType("CA").Size(), r.CA().Size());
+        uint nbb = 0;
+        for (uint i=0; i<r.Size(); i++)
+        {
+            std::string type = r.GetAtomProperty(i).GetType();
+            if (type=="N" || type=="CA" || type=="C" || type=="O") nbb++;
+        }
+        TS_ASSERT_EQUALS(r.Backbone().Size(), nbb);
+    }
+
+    void testReadPDB()
+    {
+        //the stream and the file readers give the same rigidbody
+        std::ifstream file("1FIN_r.pdb");
+        Rigidbody fromstream;
+        ReadPDB(file, fromstream);
+        TS_ASSERT_EQUALS(fromstream.Size(), r.Size());
+        TS_ASSERT_EQUALS(fromstream.PrintPDB(), r.PrintPDB());
+
+        Atom at = r.CopyAtom(0);
+        TS_ASSERT_EQUALS(at.GetType(), "N");
+        TS_ASSERT_EQUALS(at.GetResidId(), 1);
+        TS_ASSERT_EQUALS(at.GetCoords(), Coord3D(-13.434, 190.993, 108.831));
+
+        TS_ASSERT_THROWS(Rigidbody("no_such_file.pdb"), std::invalid_argument);
+    }
+
+    void testBinaryFile()
+    {
+        r.Translate(Coord3D(1.0, -2.0, 0.5));
+        r.SaveBinary("test_binary.ptb");
+        TS_ASSERT(IsBinaryFile("test_binary.ptb"));
+        TS_ASSERT(!IsBinaryFile("1FIN_r.pdb"));
+        Rigidbody binary("test_binary.ptb");
+        TS_ASSERT_EQUALS(binary.PrintPDB(), r.PrintPDB());
+        for (uint i=0; i<r.Size(); i++)
+            TS_ASSERT_EQUALS(binary.GetCoords(i), r.GetCoords(i));
+        TS_ASSERT_EQUALS(AttractRigidbody(binary).getCharges(), AttractRigidbody(r).getCharges());
+        TS_ASSERT_THROWS(ReadBinary("1FIN_r.pdb", binary), std::invalid_argument);
+        std::remove("test_binary.ptb");
+
+        //binary cache of a PDB file
+        std::ifstream source("1FIN_r.pdb");
+        std::ostringstream content;
+        content << source.rdbuf();
+        {
+            std::ofstream copy("test_cache.pdb");
+            copy << content.str();
+        }
+        SetBinaryCache(true);
+        Rigidbody first("test_cache.pdb");
+        TS_ASSERT(IsBinaryFile("test_cache.pdb.ptb"));
+        Rigidbody cached("test_cache.pdb");
+        TS_ASSERT_EQUALS(cached.PrintPDB(), first.PrintPDB());
+
+        //a touched source is hashed once, then the copy records its new time
+        struct stat st;
+        stat("test_cache.pdb", &st);
+        struct utimbuf times;
+        times.actime = st.st_atime;
+        times.modtime = st.st_mtime - 100;
+        utime("test_cache.pdb", &times);
+        Rigidbody touched("test_cache.pdb");
+        TS_ASSERT_EQUALS(touched.PrintPDB(), first.PrintPDB());
+        std::ifstream copy("test_cache.pdb.ptb", std::ios::binary);
+        char header[64];
+        copy.read(header, 64);
+        int64_t mtime;
+        memcpy(&mtime, header + 32, 8); //little-endian test host
+        TS_ASSERT_EQUALS(mtime, (int64_t) st.st_mtime - 100);
+        copy.close();
+
+        //a modified source is read again
+        {
+            std::ofstream copy("test_cache.pdb");
+            copy << content.str() << "ATOM   9999  CA  GLY   999       1.000   2.000   3.000  1 0.000 0 0\n";
+        }
+        Rigidbody modified("test_cache.pdb");
+        SetBinaryCache(false);
+        TS_ASSERT_EQUALS(modified.Size(), first.Size() + 1);
+        TS_ASSERT_EQUALS(modified.CopyAtom(first.Size()).GetCoords(), Coord3D(1.0, 2.0, 3.0));
+        std::remove("test_cache.pdb");
+        std::remove("test_cache.pdb.ptb");
+    }
+
+    /// the coordinates of a binary file stay in its mapping until they are modified
+    void testBinaryFileShared()
+    {
+        r.SaveBinary("test_shared.ptb");
+        Rigidbody binary("test_shared.ptb");
+        Rigidbody copy(binary);
+        std::remove("test_shared.ptb"); //the mapping outlives the file name
+        const uint last = r.Size() - 1;
+
+        copy.Translate(Coord3D(1.0, 0.0, 0.0));
+        TS_ASSERT_EQUALS(copy.GetCoords(last), r.GetCoords(last) + Coord3D(1.0, 0.0, 0.0));
+        copy.SetCoords(0, Coord3D(1.0, 2.0, 3.0));
+        TS_ASSERT_EQUALS(copy.GetCoords(0), Coord3D(1.0, 2.0, 3.0));
+        TS_ASSERT_EQUALS(copy.GetCoords(last), r.GetCoords(last) + Coord3D(1.0, 0.0, 0.0));
+        TS_ASSERT_EQUALS(binary.GetCoords(0), r.GetCoords(0));
+
+        binary.AddAtom(Atomproperty(), Coord3D(4.0, 5.0, 6.0));
+        TS_ASSERT_EQUALS(binary.Size(), r.Size() + 1);
+        TS_ASSERT_EQUALS(binary.GetCoords(last), r.GetCoords(last));
+        TS_ASSERT_EQUALS(binary.GetCoords(last + 1), Coord3D(4.0, 5.0, 6.0));
+        TS_ASSERT_EQUALS(copy.GetCoordsArray().size(), r.Size());
+    }
+
+    void testSetMatrixFrom()
+    {
+        s = Rigidbody(r);
+        s.AttractEulerRotate(0.2, 1.1, -0.4);
+        s.Translate(Coord3D(3.0, -2.0, 1.0));
+        r2 = Rigidbody(r);
+        r2.SetMatrixFrom(s);
+        for (uint i=0; i<r.Size(); i++)
+            TS_ASSERT_EQUALS(r2.GetCoords(i), s.GetCoords(i));
+    }
+
 };
 
 
@@ -219,6 +441,33 @@ public:
         TS_ASSERT(Norm2(co-co2)<1.0e-6);
     }
 
+    void testSetAllCoords()
+    {
+        //bulk and per-atom setters must give the same coordinates,
+        //with or without an up to date cache
+        c.Translate(tr);
+        c.AttractEulerRotate(2.0,4.0,5.0);
+        CoordsArray d(c);
+        Coord3D co[2] = {Coord3D(3,2,1), Coord3D(-1,0.5,2)};
+        Coord3D tmp;
+        d.GetCoords(0, tmp); //synchronize d only
+        c.SetAllCoords(co);
+        d.SetCoords(0, co[0]);
+        d.SetCoords(1, co[1]);
+        for (uint i=0; i<2; i++)
+        {
+            Coord3D c1, c2;
+            c.GetCoords(i, c1);
+            d.GetCoords(i, c2);
+            TS_ASSERT_EQUALS(c1, c2);
+            TS_ASSERT(Norm2(c1-co[i])<1.0e-12);
+        }
+
+        VCoords more(3, Coord3D(1,1,1));
+        c.AddCoords(more);
+        TS_ASSERT_EQUALS(c.Size(), 5u);
+    }
+
 };
 
 
@@ -392,6 +641,51 @@ public:
 
     }
 
+    void testRotationSet()
+    {
+        {
+            std::ofstream rotdat("test_rotation.dat");
+            rotdat << "   3   2\n    0.0   1\n   60.0   3\n  120.0   4\n";
+        }
+        RotationSet rotations("test_rotation.dat");
+        std::remove("test_rotation.dat");
+        TS_ASSERT_EQUALS(rotations.Size(), 16u);
+        const double zwopi = 2.0*3.14159265;
+        Vdouble angles = rotations.GetAngles(3);  //theta 60, phi 1 of 3, rot 2 of 2
+        TS_ASSERT_EQUALS(angles[0], zwopi/3);
+        TS_ASSERT_EQUALS(angles[1], zwopi*60.0/360.0);
+        TS_ASSERT_EQUALS(angles[2], 2*zwopi/2);
+        TS_ASSERT_THROWS(RotationSet("no_such_rotation.dat"), std::invalid_argument);
+
+        //placements equal the moves done by hand, with or without the coordinates
+        Rigidbody lig("pk6c.red");
+        const Coord3D translation(12.5, -3.0, 7.25);
+        for (uint maxmemory=0; maxmemory<2; maxmemory++)
+        {
+            rotations.SetLigand(lig, maxmemory);
+            TS_ASSERT_EQUALS(rotations.HasCoords(), maxmemory == 1);
+            for (uint r=0; r<rotations.Size(); r++)
+            {
+                Rigidbody byhand(lig);
+                byhand.Translate(Coord3D()-byhand.FindCenter());
+                angles = rotations.GetAngles(r);
+                byhand.AttractEulerRotate(angles[0], angles[1], angles[2]);
+                byhand.Translate(translation);
+
+                Rigidbody placed(lig);
+                rotations.Place(r, translation, placed);
+                TS_ASSERT_EQUALS(placed.PrintPDB(), byhand.PrintPDB());
+                for (uint i=0; i<lig.Size(); i++)
+                    TS_ASSERT_EQUALS(placed.GetCoords(i), byhand.GetCoords(i));
+                TS_ASSERT(placed.GetMatrix().almostEqual(byhand.GetMatrix(), 0.0));
+            }
+        }
+        Rigidbody other("pk6a.red");
+        TS_ASSERT_THROWS(rotations.Place(0, translation, other), std::invalid_argument);
+        TS_ASSERT_THROWS(rotations.Place(rotations.Size(), translation, lig), std::out_of_range);
+    }
+
+
 
 
 
@@ -402,15 +696,531 @@ public:
 
 
 
+};
+
+
+
+class TestPairList: public CxxTest::TestSuite
+{
+public:
+
+    /// reference N*M pairlist generation
+    void bruteForce(const AttractRigidbody& rec, const AttractRigidbody& lig, double cutoff,
+                    std::vector<uint>& vl, std::vector<uint>& vr)
+    {
+        for (uint i=0; i<lig.Size(); i++)
+            for (uint j=0; j<rec.Size(); j++)
+                if (Norm2(lig.GetCoords(i)-rec.GetCoords(j)) <= cutoff*cutoff)
+                {
+                    vl.push_back(i);
+                    vr.push_back(j);
+                }
+    }
+
+    void testSamePairsAsBruteForce()
+    {
+        AttractRigidbody rec("pk6a.red");
+        AttractRigidbody lig("pk6c.red");
+        srand(42);
+
+        double cutoffs[] = {0.5, 5.0, 12.0, 20.0, 500.0};
+        for (int n=0; n<20; n++)
+        {
+            lig.AttractEulerRotate(randfloat(), randfloat(), randfloat());
+            lig.Translate(rdCoord(-3.0, 3.0));
+            for (int c=0; c<5; c++)
+            {
+                std::vector<uint> vl, vr;
+                bruteForce(rec, lig, cutoffs[c], vl, vr);
+                AttractPairList pl(rec, lig, cutoffs[c]);
+                TS_ASSERT_EQUALS(pl.Size(), vl.size());
+                if (pl.Size() != vl.size()) continue;
+                for (uint i=0; i<pl.Size(); i++)
+                {
+                    TS_ASSERT_EQUALS(pl[i].atlig, vl[i]);
+                    TS_ASSERT_EQUALS(pl[i].atrec, vr[i]);
+                }
+            }
+        }
+    }
+
+    /// a single receptor index must give the same pairs for any cutoff and ligand position
+    void testSharedIndex()
+    {
+        AttractRigidbody rec("pk6a.red");
+        AttractRigidbody lig("pk6c.red");
+        ReceptorIndex index(rec, 7.0);
+        srand(43);
+
+        double cutoffs[] = {0.5, 5.0, 12.0, 20.0, 500.0};
+        for (int n=0; n<20; n++)
+        {
+            lig.AttractEulerRotate(randfloat(), randfloat(), randfloat());
+            lig.Translate(rdCoord(-3.0, 3.0));
+            for (int c=0; c<5; c++)
+            {
+                AttractPairList pl(rec, lig, cutoffs[c]);
+                AttractPairList plindex(rec, lig, index, cutoffs[c]);
+                TS_ASSERT_EQUALS(pl.Size(), plindex.Size());
+                if (pl.Size() != plindex.Size()) continue;
+                for (uint i=0; i<pl.Size(); i++)
+                {
+                    TS_ASSERT_EQUALS(pl[i].atlig, plindex[i].atlig);
+                    TS_ASSERT_EQUALS(pl[i].atrec, plindex[i].atrec);
+                }
+            }
+        }
+
+        AttractRigidbody other("pk6c.red");
+        TS_ASSERT_THROWS(AttractPairList(other, lig, index, 10.0), std::invalid_argument);
+    }
 
 };
 
 
 
+class TestForceFields: public CxxTest::TestSuite
+{
+public:
+
+    AttractRigidbody a, c; ///< fixed receptor and ligand of the pk6 complex
+
+    void setUp()
+    {
+        a = AttractRigidbody("pk6a.red");
+        c = AttractRigidbody("pk6c.red");
+        a.setRotation(false);
+        a.setTranslation(false);
+    }
+
+    /// test if calculated energies are stable through library versions
+    void testFF2k()
+    {
+        AttractForceField2 FF("mbest1k.par", 20.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+        Vdouble x(6, 0.0);
+        dbl ener = FF.Function(x);
+        TS_ASSERT_DELTA(ener, -32.9487770656, 1e-6); //energy from ptools 0.3
+        TS_ASSERT_EQUALS(ener, FF.getVdw() + FF.getCoulomb());
+    }
+
+    /// with a Verlet skin, energies after a minimization must be those of an up to date pairlist
+    void testSkin()
+    {
+        AttractForceField2 FF("mbest1k.par", 8.0);
+        FF.setSkin(1.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+        Lbfgs lbfgs(FF);
+        lbfgs.minimize(50);
+        Vdouble x = lbfgs.GetMinimizedVars();
+        dbl ener = FF.Function(x);
+        TS_ASSERT(FF.getPairListUpdates() > 0);
+
+        AttractRigidbody rec = FF.GetLigand(0);
+        AttractRigidbody lig = FF.GetLigand(1);
+        AttractPairList pl(rec, lig, 8.0);
+        AttractForceField2 FFref("mbest1k.par", 8.0);
+        TS_ASSERT_DELTA(ener, FFref.nonbon8(rec, lig, pl), 1e-9);
+    }
+
+    /// a forcefield using a receptor index must give the same energies
+    void testReceptorIndex()
+    {
+        ReceptorIndex index(a, 10.0);
+
+        AttractForceField2 FF("mbest1k.par", 8.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+        AttractForceField2 FFindex("mbest1k.par", 8.0);
+        FFindex.AddLigand(a, index);
+        FFindex.AddLigand(c);
+
+        Vdouble x(6, 0.0);
+        x[0] = 0.3; x[4] = -1.5;
+        TS_ASSERT_DELTA(FF.Function(x), FFindex.Function(x), 1e-9);
 
+        TS_ASSERT_THROWS(FFindex.AddLigand(c, ReceptorIndex(c, 10.0)), std::invalid_argument);
+    }
 
+    void testClashScreen()
+    {
+        ReceptorIndex index(a, 3.0);
 
+        for (uint move=0; move<3; move++)
+        {
+            Rigidbody lig(c);
+            lig.Translate(Coord3D(4.0*move, -3.0*move, 2.0));
+            //brute force
+            uint clashes = 0;
+            dbl mindist = 1e30;
+            for (uint i=0; i<lig.Size(); i++)
+            {
+                dbl atommin = 1e30;
+                for (uint j=0; j<a.Size(); j++)
+                    atommin = std::min(atommin, Norm(lig.GetCoords(i) - a.GetCoords(j)));
+                if (atommin < 3.0) clashes++;
+                mindist = std::min(mindist, atommin);
+            }
+            TS_ASSERT_EQUALS(index.CountClashes(lig, 3.0), clashes);
+            TS_ASSERT_EQUALS(index.InContact(lig, mindist * 1.001), true);
+            TS_ASSERT_EQUALS(index.InContact(lig, mindist * 0.999), false);
+        }
 
+        //far from the receptor
+        Rigidbody far(c);
+        far.Translate(Coord3D(200.0, 0.0, 0.0));
+        TS_ASSERT_EQUALS(index.CountClashes(far, 3.0), 0u);
+        TS_ASSERT_EQUALS(index.InContact(far, 10.0), false);
+    }
 
+    /// forcefields built from different parameters files must coexist
+    void testParamsFiles()
+    {
+        AttractPairList pl(a, c, 20.0);
+
+        AttractForceField2 FFk("mbest1k.par", 20.0);
+        dbl enerk = FFk.nonbon8(a, c, pl);
+        AttractForceField2 FFu("mbest1u.par", 20.0);
+        dbl eneru = FFu.nonbon8(a, c, pl);
+        TS_ASSERT(fabs(enerk - eneru) > 1e-6);
+
+        TS_ASSERT_EQUALS(FFk.nonbon8(a, c, pl), enerk);
+        AttractForceField2 FFk2("mbest1k.par", 20.0);
+        TS_ASSERT_EQUALS(FFk2.nonbon8(a, c, pl), enerk);
+        TS_ASSERT_EQUALS(FFu.nonbon8(a, c, pl), eneru);
+    }
 
+    /// per-pair parameters cached in a pairlist must follow its updates
+    void testPairParamsCache()
+    {
+        AttractForceField2 FF("mbest1k.par", 10.0);
+        AttractPairList pl(a, c, 10.0);
+
+        dbl ener = FF.nonbon8(a, c, pl);
+        TS_ASSERT_EQUALS(pl.GetPairParams().alen.size(), pl.Size());
+        TS_ASSERT_EQUALS(FF.nonbon8(a, c, pl), ener);
+
+        c.Translate(Coord3D(1.5, -0.5, 2.0));
+        pl.update();
+        TS_ASSERT_EQUALS(pl.GetPairParams().paramsid, 0u);
+        AttractPairList fresh(a, c, 10.0);
+        TS_ASSERT_EQUALS(FF.nonbon8(a, c, pl), FF.nonbon8(a, c, fresh));
+    }
+
+    /// threaded non-bonded interactions must reproduce the sequential ones
+    void testThreads()
+    {
+        AttractForceField2 FF("mbest1k.par", 500.0);
+        AttractPairList pl(a, c, 500.0);
+
+        std::vector<Coord3D> forcea(a.Size()), forcec(c.Size());
+        dbl ener = FF.nonbon8_forces(a, c, pl, forcea, forcec);
+
+        FF.setNumThreads(4);
+        TS_ASSERT_EQUALS(FF.getNumThreads(), 4u);
+        std::vector<Coord3D> forcea4(a.Size()), forcec4(c.Size());
+        dbl ener4 = FF.nonbon8_forces(a, c, pl, forcea4, forcec4);
+        TS_ASSERT_DELTA(ener4, ener, 1e-10*fabs(ener));
+        TS_ASSERT_EQUALS(ener4, FF.getVdw() + FF.getCoulomb());
+
+        for (uint i=0; i<c.Size(); i++)
+            TS_ASSERT(Norm(forcec4[i]-forcec[i]) < 1e-8*(1.0+Norm(forcec[i])));
+        for (uint i=0; i<a.Size(); i++)
+            TS_ASSERT(Norm(forcea4[i]-forcea[i]) < 1e-8*(1.0+Norm(forcea[i])));
+    }
+
+    /// energy-only scoring must match nonbon8 with a pairlist
+    void testScoreEnergy()
+    {
+        AttractForceField2 FF("mbest1k.par", 20.0);
+        srand(44);
+
+        double cutoffs[] = {8.0, 500.0};
+        for (int n=0; n<5; n++)
+        {
+            c.AttractEulerRotate(randfloat(), randfloat(), randfloat());
+            c.Translate(rdCoord(-2.0, 2.0));
+            for (int k=0; k<2; k++)
+            {
+                AttractPairList pl(a, c, cutoffs[k]);
+                dbl ener = FF.nonbon8(a, c, pl);
+                dbl vdw = FF.getVdw();
+                dbl elec = FF.getCoulomb();
+                TS_ASSERT_DELTA(FF.ScoreEnergy(a, c, cutoffs[k]), ener, 1e-9*(1.0+fabs(ener)));
+                TS_ASSERT_DELTA(FF.getVdw(), vdw, 1e-9*(1.0+fabs(vdw)));
+                TS_ASSERT_DELTA(FF.getCoulomb(), elec, 1e-9*(1.0+fabs(elec)));
+            }
+        }
+    }
+
+    /// grid interpolated energies: derivatives, save/load and far ligands
+    void testReceptorGrid()
+    {
+
+        AttractForceField2 FF("mbest1k.par", 5.0);
+        ReceptorGrid grid(a, FF, 1.0, 5.0);
+        FF.AddLigand(a, grid);
+        FF.AddLigand(c);
+
+        Vdouble x(6, 0.0);
+        dbl ener = FF.Function(x);
+        TS_ASSERT_EQUALS(ener, FF.getVdw() + FF.getCoulomb());
+
+        Vdouble delta(6);
+        FF.Derivatives(x, delta);
+        for (uint k=0; k<6; k++)
+        {
+            Vdouble xk(x);
+            xk[k] += 1e-6;
+            dbl numerical = (FF.Function(xk) - ener)/1e-6;
+            TS_ASSERT_DELTA(delta[k], numerical, 1e-2 + 1e-4*fabs(delta[k]));
+        }
+
+        grid.Save("grid.tmp");
+        ReceptorGrid loaded("grid.tmp");
+        remove("grid.tmp");
+        TS_ASSERT_EQUALS(loaded.GetSpacing(), grid.GetSpacing());
+        TS_ASSERT_EQUALS(loaded.Energy(c), grid.Energy(c));
+
+        c.Translate(Coord3D(200.0, 0.0, 0.0));
+        TS_ASSERT_EQUALS(grid.Energy(c), 0.0);
+
+        AttractForceField2 FFmobile("mbest1k.par", 5.0);
+        TS_ASSERT_THROWS(FFmobile.AddLigand(c, grid), std::invalid_argument);
+
+        //only used with the parameters and the cutoff it was computed with
+        TS_ASSERT_EQUALS(loaded.GetParamsHash(), grid.GetParamsHash());
+        AttractForceField2 FFother("mbest1u.par", 5.0);
+        TS_ASSERT_THROWS(FFother.AddLigand(a, loaded), std::invalid_argument);
+        AttractForceField2 FFcutoff("mbest1k.par", 8.0);
+        TS_ASSERT_THROWS(FFcutoff.AddLigand(a, loaded), std::invalid_argument);
+        AttractForceField2 FFsame("mbest1k.par", 5.0);
+        FFsame.AddLigand(a, loaded);
+    }
+
+    /// grid energies and forces of a docked pose against the pairwise ones
+    void testReceptorGridError()
+    {
+
+        AttractForceField2 FF("mbest1k.par", 8.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+        Lbfgs lbfgs(FF);
+        lbfgs.minimize(100);
+        AttractRigidbody lig = FF.GetLigand(1);
+
+        std::vector<Coord3D> forcerec(a.Size()), forcelig(lig.Size());
+        AttractPairList pl(a, lig, 8.0);
+        dbl exact = FF.nonbon8_forces(a, lig, pl, forcerec, forcelig);
+        TS_ASSERT(exact < -10.0);
+        Coord3D exactforce;
+        for (uint i=0; i<lig.Size(); i++) exactforce += forcelig[i];
+
+        dbl error[2], forceerror[2];
+        dbl spacings[] = {0.5, 1.0};
+        for (int k=0; k<2; k++)
+        {
+            ReceptorGrid grid(a, FF, spacings[k], 8.0);
+            std::vector<Coord3D> forcegrid(lig.Size());
+            dbl vdw, elec;
+            error[k] = fabs(grid.Interpolate(lig, forcegrid, vdw, elec) - exact);
+            Coord3D force;
+            for (uint i=0; i<lig.Size(); i++) force += forcegrid[i];
+            forceerror[k] = Norm(force - exactforce);
+        }
+
+        //0.5A: within 5% of the pairwise energy, ~h^2 decrease of the error
+        TS_ASSERT(error[0] < 0.05*fabs(exact));
+        TS_ASSERT(error[0] < 0.25*error[1]);
+        TS_ASSERT(forceerror[0] < forceerror[1]);
+    }
+
+    /// evaluations must not depend on the previous ones
+    void testFunctionRepeat()
+    {
+        AttractForceField2 FF("mbest1k.par", 10.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+
+        Vdouble x(6, 0.0), y(6, 0.0);
+        x[2] = 0.2; x[5] = 1.0;
+        y[0] = -0.5; y[3] = 2.0;
+        Vdouble gx(6), gy(6), gx2(6);
+        dbl ex = FF.Function(x);
+        FF.Derivatives(x, gx);
+        FF.Function(y);
+        FF.Derivatives(y, gy);
+        TS_ASSERT_EQUALS(FF.Function(x), ex);
+        FF.Derivatives(x, gx2);
+        for (uint k=0; k<6; k++)
+            TS_ASSERT_EQUALS(gx2[k], gx[k]);
+
+        AttractRigidbody moved = FF.GetLigand(1);
+        AttractRigidbody ref(c);
+        Coord3D center = ref.FindCenter();
+        ref.CenterToOrigin();
+        ref.AttractEulerRotate(x[0], x[1], x[2]);
+        ref.Translate(center);
+        ref.Translate(Coord3D(x[3], x[4], x[5]));
+        for (uint i=0; i<c.Size(); i++)
+            TS_ASSERT_EQUALS(moved.GetCoords(i), ref.GetCoords(i));
+    }
+
+    /// the fused evaluation must match Function() followed by Derivatives()
+    void testEvaluate()
+    {
+        a.setRotation(true);
+        a.setTranslation(true);
+        AttractForceField2 FF("mbest1k.par", 10.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+
+        Vdouble x(12, 0.0);
+        x[1] = 0.4; x[5] = -1.0; x[6] = 0.3; x[8] = -0.7; x[10] = 1.5;
+        dbl ener = FF.Function(x);
+        Vdouble delta(12), fused(12);
+        FF.Derivatives(x, delta);
+
+        FF.Function(Vdouble(12, 0.0)); //the forces of another point must not be used
+        TS_ASSERT_EQUALS(FF.Evaluate(x, fused), ener);
+        for (uint k=0; k<12; k++)
+            TS_ASSERT_EQUALS(fused[k], delta[k]);
+    }
+
+    /// batch scoring of Euler and matrix poses
+    /// a scorer built from rigidbodies never given to a forcefield must ignore the dummy atoms too
+    void testBatchScorerDummyTypes()
+    {
+        AttractForceField2 FFscore("mbest1k.par", 10.0);
+        BatchScorer scorer(a, c, FFscore, 10.0);
+
+        AttractForceField2 FF("mbest1k.par", 10.0);
+        FF.setSkin(2.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+        Vdouble x(6, 0.0);
+        x[1] = 0.05; x[4] = 1.0;
+        dbl ener = FF.Function(x);
+        TS_ASSERT_DELTA(scorer.ScoreEuler(x), ener, 1e-8*(1.0+fabs(ener)));
+    }
+
+    void testBatchScorer()
+    {
+        AttractForceField2 FF("mbest1k.par", 10.0);
+        FF.setSkin(2.0); //keeps the pairlist exact for all poses
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+        AttractForceField2 FFscore("mbest1k.par", 10.0);
+        BatchScorer scorer(a, c, FFscore, 10.0);
+
+        const double poses[12] = {0.05, -0.02, 0.1, 1.0, 0.0, 2.5,
+                                  -0.1, 0.05, 0.0, 0.0, 1.5, 3.0};
+        double energies[2], vdw[2], elec[2], gradients[12];
+        scorer.Score(poses, 2, 6, energies, vdw, elec, gradients);
+
+        for (uint p=0; p<2; p++)
+        {
+            Vdouble x(poses + 6*p, poses + 6*p + 6);
+            Vdouble delta(6);
+            dbl ener = FF.Evaluate(x, delta);
+            TS_ASSERT_DELTA(energies[p], ener, 1e-9*(1.0+fabs(ener)));
+            TS_ASSERT_DELTA(vdw[p] + elec[p], energies[p], 1e-9);
+            TS_ASSERT_DELTA(scorer.ScoreEuler(x), ener, 1e-8*(1.0+fabs(ener)));
+            for (uint k=0; k<6; k++)
+                TS_ASSERT_DELTA(gradients[6*p+k], delta[k], 1e-8*(1.0+fabs(delta[k])));
+
+            //the same pose given as a matrix
+            Rigidbody posed(c);
+            Coord3D center = posed.FindCenter();
+            posed.CenterToOrigin();
+            posed.AttractEulerRotate(x[0], x[1], x[2]);
+            posed.Translate(center + Coord3D(x[3], x[4], x[5]));
+            Matrix mat = posed.GetMatrix();
+            double matpose[16], matgradient[6], matenergy;
+            for (uint i=0; i<4; i++)
+                for (uint j=0; j<4; j++)
+                    matpose[4*i+j] = mat(i,j);
+            scorer.Score(matpose, 1, 16, &matenergy, 0, 0, matgradient);
+            TS_ASSERT_DELTA(matenergy, energies[p], 1e-8*(1.0+fabs(ener)));
+            TS_ASSERT_DELTA(scorer.ScoreMatrix(mat), matenergy, 1e-8*(1.0+fabs(ener)));
+            for (uint k=3; k<6; k++)
+                TS_ASSERT_DELTA(matgradient[k], delta[k], 1e-6*(1.0+fabs(delta[k])));
+
+            //torque around z: numerical derivative
+            Coord3D posedcenter = posed.FindCenter();
+            const double h = 1e-6;
+            Matrix rotz(4, 4);
+            for (uint i=0; i<4; i++)
+                for (uint j=0; j<4; j++)
+                    rotz(i,j) = (i == j) ? 1.0 : 0.0;
+            rotz(0,0) = cos(h); rotz(0,1) = -sin(h);
+            rotz(1,0) = sin(h); rotz(1,1) = cos(h);
+            posed.Translate(Coord3D() - posedcenter);
+            posed.ApplyMatrix(rotz);
+            posed.Translate(posedcenter);
+            dbl numerical = (scorer.ScoreMatrix(posed.GetMatrix()) - matenergy)/h;
+            TS_ASSERT_DELTA(matgradient[2], numerical, 1e-2 + 1e-3*fabs(numerical));
+        }
+
+        TS_ASSERT_THROWS(scorer.Score(poses, 1, 5, energies), std::invalid_argument);
+    }
+
+    /// a forcefield reset with a new ligand pose must behave like a new one
+    void testResetLigand()
+    {
+        AttractForceField2 FF("mbest1k.par", 8.0);
+        FF.setSkin(1.0);
+        FF.AddLigand(a);
+        FF.AddLigand(c);
+        Lbfgs lbfgs(FF);
+        lbfgs.minimize(20);
+
+        AttractRigidbody c2(c);
+        c2.AttractEulerRotate(0.3, -0.2, 0.5);
+        c2.Translate(Coord3D(1.0, 0.5, -1.0));
+        FF.ResetLigand(1, c2);
+        TS_ASSERT_EQUALS(FF.getPairListUpdates(), 0u);
+
+        AttractForceField2 FFref("mbest1k.par", 8.0);
+        FFref.setSkin(1.0);
+        FFref.AddLigand(a);
+        FFref.AddLigand(c2);
+        Vdouble x(6, 0.0);
+        x[1] = 0.1; x[3] = 0.5;
+        TS_ASSERT_DELTA(FF.Function(x), FFref.Function(x), 1e-9);
+
+        //a second minimization with the same minimizer must be that of a new one
+        lbfgs.minimize(20);
+        FFref.initMinimization();
+        Lbfgs lbfgsref(FFref);
+        lbfgsref.minimize(20);
+        TS_ASSERT_EQUALS(lbfgs.GetNumberIter(), lbfgsref.GetNumberIter());
+        Vdouble xmin = lbfgs.GetMinimizedVars();
+        Vdouble xref = lbfgsref.GetMinimizedVars();
+        for (uint k=0; k<6; k++)
+            TS_ASSERT_DELTA(xmin[k], xref[k], 1e-9);
+
+        TS_ASSERT_THROWS(FF.ResetLigand(2, c2), std::out_of_range);
+        TS_ASSERT_THROWS(FF.ResetLigand(0, c2), std::invalid_argument);
+
+        //same number of atoms, another atom type
+        Rigidbody retyped(c);
+        Atomproperty atp = retyped.GetAtomProperty(0);
+        atp.SetExtra("    2   0.000 0 0");
+        retyped.SetAtomProperty(0, atp);
+        TS_ASSERT_THROWS(FF.ResetLigand(1, AttractRigidbody(retyped)), std::invalid_argument);
+
+        //skin set after the pairlists were built without one
+        AttractForceField2 FFlate("mbest1k.par", 8.0);
+        FFlate.AddLigand(a);
+        FFlate.AddLigand(c);
+        FFlate.Function(x);
+        FFlate.setSkin(1.0);
+        FFlate.ResetLigand(1, c2);
+        TS_ASSERT_DELTA(FFlate.Function(x), FFref.Function(x), 1e-9);
+    }
+
+};
 
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from ptools import *
+import os
 import random
 import unittest
 
@@ -65,6 +66,71 @@ class TestRigidbody(unittest.TestCase):
             self.r2.unsafeGetCoords(i,co2)
             self.assertEqual(co1,co2)
 
+    def testCoordsView(self):
+        import numpy
+        self.r.Translate(Coord3D(1.0, 2.0, 3.0))
+        coords = self.r.GetCoordsView()
+        self.assertEqual(coords.shape, (self.r.Size(), 3))
+        co = self.r.GetCoords(10)
+        self.assertEqual(tuple(coords[10]), (co.x, co.y, co.z))
+        self.assertEqual(self.r.GetResidIds()[10], self.r.CopyAtom(10).GetResidId())
+
+        moved = self.r.ApplyMatrixBatch(numpy.array([numpy.identity(4)]*2))
+        self.assertEqual(moved.shape, (2, self.r.Size(), 3))
+        s = Rigidbody(self.r)
+        s.SetCoordsArray(coords + numpy.array([0.0, 0.0, 5.0]))
+        self.assertTrue(abs(s.GetCoords(10).z - co.z - 5.0) < 1e-9)
+        self.assertTrue(numpy.allclose(moved[1], coords))
+        #a copy: moving the rigidbody does not change it
+        self.r.Translate(Coord3D(1.0, 0.0, 0.0))
+        self.assertEqual(coords[10][0], co.x)
+
+    def testGetMatrixArray(self):
+        self.r.Translate(Coord3D(1.0, 2.0, 3.0))
+        mat = self.r.GetMatrixArray()
+        self.assertEqual(mat.shape, (4, 4))
+        self.assertEqual(list(mat[:3, 3]), [1.0, 2.0, 3.0])
+
+    def testAddAtoms(self):
+        ca = self.r.CA().CreateRigid()
+        merged = self.r + ca
+        self.assertEqual(merged.Size(), self.r.Size() + ca.Size())
+        coords = VCoord3D()
+        for i in range(ca.Size()):
+            coords.append(ca.GetCoords(i) + Coord3D(1.0, 0.0, 0.0))
+        ca.SetAllCoords(coords)
+        self.assertEqual(ca.GetCoords(3), coords[3])
+
+    def testCopyOnWrite(self):
+        s = Rigidbody(self.r)
+        atp = s.GetAtomProperty(0)
+        atp.SetType("XX")
+        s.SetAtomProperty(0, atp)
+        self.assertEqual(s.CopyAtom(0).GetType(), "XX")
+        self.assertNotEqual(self.r.CopyAtom(0).GetType(), "XX")
+
+    def testAtomStrings(self):
+        atp = Atomproperty()
+        atp.SetExtra("    3   -1.000 0 0")
+        self.assertEqual(atp.GetExtra(), "    3   -1.000 0 0")
+        self.assertEqual(atp.GetExtraCategory(), 3)
+        self.assertEqual(self.r.SelectAtomType("NOT_AN_ATOM_TYPE").Size(), 0)
+
+    def testBinaryFile(self):
+        self.r.SaveBinary("test_binary.ptb")
+        binary = Rigidbody("test_binary.ptb")
+        os.remove("test_binary.ptb")
+        self.assertEqual(binary.PrintPDB(), self.r.PrintPDB())
+
+    def testSetMatrixFrom(self):
+        s = Rigidbody(self.r)
+        s.AttractEulerRotate(0.2, 1.1, -0.4)
+        s.Translate(Coord3D(3.0, -2.0, 1.0))
+        r2 = Rigidbody(self.r)
+        r2.SetMatrixFrom(s)
+        for i in range(self.r.Size()):
+            self.assertEqual(r2.GetCoords(i), s.GetCoords(i))
+
 
 class TestBasicMoves(unittest.TestCase):
     def setUp(self):
@@ -169,8 +235,29 @@ class TestSuperposition(unittest.TestCase):
             prot2.ApplyMatrix(matrix)
             self.assertTrue(Rmsd(prot2,self.prot1)<1e-6)
 
+    def testRotationSet(self):
+        rotations = RotationSet()
+        rotations.AddRotation(0.3, 1.2, -0.7)
+        rotations.AddRotation(2.0, 0.4, 1.1)
+        self.assertEqual(rotations.Size(), 2)
+        self.assertEqual(list(rotations.GetAngles(1)), [2.0, 0.4, 1.1])
+        rotations.SetLigand(self.prot1)
+        byhand = Rigidbody(self.prot1)
+        byhand.Translate(Coord3D()-byhand.FindCenter())
+        byhand.AttractEulerRotate(2.0, 0.4, 1.1)
+        byhand.Translate(Coord3D(5.0, -1.0, 2.0))
+        placed = Rigidbody(self.prot1)
+        rotations.Place(1, Coord3D(5.0, -1.0, 2.0), placed)
+        self.assertEqual(placed.PrintPDB(), byhand.PrintPDB())
+
 class TestForceFields(unittest.TestCase):
     """ test if calculated energies are stable through library versions """
+    def setUp(self):
+        self.a = AttractRigidbody(Rigidbody("pk6a.red"))
+        self.c = AttractRigidbody(Rigidbody("pk6c.red"))
+        self.a.setRotation(False)
+        self.a.setTranslation(False)
+
     def testFF2k(self):
         a = Rigidbody("pk6a.red")
         c = Rigidbody("pk6c.red")
@@ -187,6 +274,169 @@ class TestForceFields(unittest.TestCase):
         self.assertTrue( (FF.Function(x)+32.9487770656) < 1e-6) #energy from ptools 0.3
 	self.assertEqual(FF.Function(x), FF.getVdw() + FF.getCoulomb())
 
+    def testParamsFiles(self):
+        pl = AttractPairList(self.a, self.c, 20.0)
+        FFk = AttractForceField2("mbest1k.par", 20.0)
+        enerk = FFk.nonbon8(self.a, self.c, pl)
+        FFu = AttractForceField2("mbest1u.par", 20.0)
+        eneru = FFu.nonbon8(self.a, self.c, pl)
+        self.assertNotEqual(enerk, eneru)
+        self.assertEqual(FFk.nonbon8(self.a, self.c, pl), enerk)
+
+    def testReceptorIndex(self):
+        index = ReceptorIndex(self.a, 10.0)
+        self.assertEqual(index.Size(), self.a.Size())
+        pl = AttractPairList(self.a, self.c, 8.0)
+        plindex = AttractPairList(self.a, self.c, index, 8.0)
+        self.assertEqual(pl.Size(), plindex.Size())
+        FF = AttractForceField2("mbest1k.par", 8.0)
+        FF.AddLigand(self.a)
+        FF.AddLigand(self.c)
+        FFindex = AttractForceField2("mbest1k.par", 8.0)
+        FFindex.AddLigand(self.a, index)
+        FFindex.AddLigand(self.c)
+        x = Vdouble()
+        for i in range(6):
+            x.append(0)
+        self.assertTrue(abs(FF.Function(x) - FFindex.Function(x)) < 1e-9)
+
+    def testClashScreen(self):
+        index = ReceptorIndex(self.a, 3.0)
+        clashes = 0
+        for i in range(self.c.Size()):
+            if min([Norm(self.c.GetCoords(i) - self.a.GetCoords(j)) for j in range(self.a.Size())]) < 3.0:
+                clashes += 1
+        self.assertEqual(index.CountClashes(self.c, 3.0), clashes)
+        self.assertTrue(index.InContact(self.c, 3.0))
+        self.c.Translate(Coord3D(200.0, 0.0, 0.0))
+        self.assertEqual(index.CountClashes(self.c, 3.0), 0)
+        self.assertFalse(index.InContact(self.c, 10.0))
+
+    def testScoreEnergy(self):
+        FF = AttractForceField2("mbest1k.par", 20.0)
+        pl = AttractPairList(self.a, self.c, 8.0)
+        ener = FF.nonbon8(self.a, self.c, pl)
+        vdw = FF.getVdw()
+        self.assertTrue(abs(FF.ScoreEnergy(self.a, self.c, 8.0) - ener) < 1e-9)
+        self.assertTrue(abs(FF.getVdw() - vdw) < 1e-9)
+
+    def testThreads(self):
+        FF = AttractForceField2("mbest1k.par", 500.0)
+        pl = AttractPairList(self.a, self.c, 500.0)
+        ener = FF.nonbon8(self.a, self.c, pl)
+        FF.setNumThreads(4)
+        self.assertEqual(FF.getNumThreads(), 4)
+        self.assertTrue(abs(FF.nonbon8(self.a, self.c, pl) - ener) < 1e-10*abs(ener))
+
+    def testReceptorGrid(self):
+        FF = AttractForceField2("mbest1k.par", 5.0)
+        grid = ReceptorGrid(self.a, FF, 1.0, 5.0)
+        grid.Save("grid.tmp")
+        loaded = ReceptorGrid("grid.tmp")
+        os.remove("grid.tmp")
+        self.assertEqual(loaded.Energy(self.c), grid.Energy(self.c))
+        FF.AddLigand(self.a, grid)
+        FF.AddLigand(self.c)
+        x = Vdouble()
+        for i in range(6):
+            x.append(0)
+        self.assertEqual(FF.Function(x), grid.Energy(self.c))
+        #only used with the parameters and the cutoff it was computed with
+        self.assertRaises(ValueError, AttractForceField2("mbest1u.par", 5.0).AddLigand, self.a, loaded)
+        self.assertRaises(ValueError, AttractForceField2("mbest1k.par", 8.0).AddLigand, self.a, loaded)
+
+    def testReceptorGridError(self):
+        FF = AttractForceField2("mbest1k.par", 8.0)
+        FF.AddLigand(self.a)
+        FF.AddLigand(self.c)
+        lbfgs = Lbfgs(FF)
+        lbfgs.minimize(100)
+        lig = FF.GetLigand(1)
+        exact = FF.ScoreEnergy(self.a, lig, 8.0)
+        error = [abs(ReceptorGrid(self.a, FF, spacing, 8.0).Energy(lig) - exact) for spacing in (0.5, 1.0)]
+        self.assertTrue(error[0] < 0.05*abs(exact))
+        self.assertTrue(error[0] < 0.25*error[1])
+
+    def testEvaluate(self):
+        FF = AttractForceField2("mbest1k.par", 10.0)
+        FF.AddLigand(self.a)
+        FF.AddLigand(self.c)
+        x = Vdouble()
+        for v in [0.2, 0.0, -0.1, 1.0, 0.0, -0.5]:
+            x.append(v)
+        ener = FF.Function(x)
+        delta = Vdouble()
+        fused = Vdouble()
+        for i in range(6):
+            delta.append(0)
+            fused.append(0)
+        FF.Derivatives(x, delta)
+        self.assertEqual(FF.Evaluate(x, fused), ener)
+        for k in range(6):
+            self.assertEqual(fused[k], delta[k])
+
+    def testArrayViews(self):
+        types = self.c.GetAtomTypesView()
+        charges = self.c.GetChargesView()
+        self.assertEqual(types.shape, (self.c.Size(),))
+        self.assertEqual(types[5], self.c.getAtomTypeNumber(5))
+        self.assertEqual(charges[5], self.c.getCharge(5))
+        self.assertEqual(self.c.GetForcesView().shape, (self.c.Size(), 3))
+        #the views would be moved by new atoms
+        self.assertRaises(RuntimeError, self.c.AddAtom, Atomproperty(), Coord3D())
+        del types, charges
+        self.c.AddAtom(Atomproperty(), Coord3D())
+
+    def testBatchScorerDummyTypes(self):
+        scorer = BatchScorer(self.a, self.c, AttractForceField2("mbest1k.par", 10.0), 10.0)
+        FF = AttractForceField2("mbest1k.par", 10.0)
+        FF.setSkin(2.0)
+        FF.AddLigand(self.a)
+        FF.AddLigand(self.c)
+        x = Vdouble()
+        for v in [0.0, 0.05, 0.0, 0.0, 1.0, 0.0]:
+            x.append(v)
+        ener = FF.Function(x)
+        self.assertTrue(abs(scorer.ScoreEuler(x) - ener) < 1e-8*(1.0 + abs(ener)))
+
+    def testBatchScorer(self):
+        import numpy
+        FF = AttractForceField2("mbest1k.par", 10.0)
+        scorer = BatchScorer(self.a, self.c, FF, 10.0)
+        poses = numpy.array([[0.05, -0.02, 0.1, 1.0, 0.0, 2.5],
+                             [-0.1, 0.05, 0.0, 0.0, 1.5, 3.0]])
+        energies, vdw, elec, gradients = scorer.Score(poses, split=True, gradient=True)
+        self.assertEqual(energies.shape, (2,))
+        self.assertEqual(gradients.shape, (2, 6))
+        for p in range(2):
+            x = Vdouble()
+            for v in poses[p]:
+                x.append(v)
+            self.assertTrue(abs(scorer.ScoreEuler(x) - energies[p]) < 1e-6*(1.0 + abs(energies[p])))
+            self.assertTrue(abs(vdw[p] + elec[p] - energies[p]) < 1e-6)
+        matrices = numpy.zeros((3, 4, 4))
+        for p in range(3):
+            matrices[p] = numpy.identity(4)
+            matrices[p, 2, 3] = 2.0*p
+        self.assertEqual(scorer.Score(matrices).shape, (3,))
+
+    def testResetLigand(self):
+        FF = AttractForceField2("mbest1k.par", 8.0)
+        FF.AddLigand(self.a)
+        FF.AddLigand(self.c)
+        lbfgs = Lbfgs(FF)
+        lbfgs.minimize(20)
+        c2 = AttractRigidbody(self.c)
+        c2.Translate(Coord3D(1.0, 0.5, -1.0))
+        FF.ResetLigand(1, c2)
+        FFref = AttractForceField2("mbest1k.par", 8.0)
+        FFref.AddLigand(self.a)
+        FFref.AddLigand(c2)
+        x = Vdouble()
+        for i in range(6):
+            x.append(0)
+        self.assertTrue(abs(FF.Function(x) - FFref.Function(x)) < 1e-9)
+
          
 
 
@@ -1,5 +1,7 @@
 #include <sstream>
 #include <stdio.h>
+#include <map>
+#include <pthread.h>
 
 #include "atom.h"
 #include "coord3d.h"
@@ -8,6 +10,134 @@ using namespace std;
 
 namespace PTools{
 
+
+////////////////////////////////////////////////////////////////
+//     table of atom property strings
+////////////////////////////////////////////////////////////////
+
+/*
+   Entries are allocated by chunks which never move, so that a string is read
+   from its code without locking. Only the additions (and the lookups by
+   string) are protected by the mutex.
+*/
+
+static const uint atomstrings_chunksize = 1024;
+static const uint atomstrings_maxchunks = 16384;
+static AtomString * atomstrings_chunks[atomstrings_maxchunks]; ///< zero-initialized
+static uint atomstrings_size = 0; ///< number of strings in the table (protected by the mutex)
+static std::map<std::string, uint> * atomstrings_codes = 0; ///< code of each string (protected by the mutex)
+static pthread_mutex_t atomstrings_mutex = PTHREAD_MUTEX_INITIALIZER;
+static pthread_once_t atomstrings_once = PTHREAD_ONCE_INIT;
+
+///codes of the strings of a default Atomproperty
+static const uint atomstrings_empty = 0; // ""
+static const uint atomstrings_x = 1; // "X"
+static const uint atomstrings_xxx = 2; // "XXX"
+
+
+///adds a string to the table (the mutex must be held)
+static uint addAtomString(const std::string & text)
+{
+    const uint code = atomstrings_size;
+    const uint chunk = code / atomstrings_chunksize;
+    if (chunk >= atomstrings_maxchunks)
+        throw std::length_error("InternAtomString: too many distinct atom property strings");
+    if (!atomstrings_chunks[chunk])
+        atomstrings_chunks[chunk] = new AtomString[atomstrings_chunksize];
+
+    atomstrings_chunks[chunk][code % atomstrings_chunksize].text = text;
+
+    (*atomstrings_codes)[text] = code;
+    atomstrings_size++;
+    return code;
+}
+
+
+static void initAtomStrings()
+{
+    pthread_mutex_lock(&atomstrings_mutex);
+    atomstrings_codes = new std::map<std::string, uint>;
+    addAtomString("");
+    addAtomString("X");
+    addAtomString("XXX");
+    pthread_mutex_unlock(&atomstrings_mutex);
+}
+
+
+uint InternAtomString(const std::string & text)
+{
+    pthread_once(&atomstrings_once, initAtomStrings);
+    pthread_mutex_lock(&atomstrings_mutex);
+    uint code;
+    try
+    {
+        std::map<std::string, uint>::const_iterator it = atomstrings_codes->find(text);
+        code = (it != atomstrings_codes->end()) ? it->second : addAtomString(text);
+    }
+    catch (...)
+    {
+        pthread_mutex_unlock(&atomstrings_mutex);
+        throw;
+    }
+    pthread_mutex_unlock(&atomstrings_mutex);
+    return code;
+}
+
+
+bool FindAtomString(const std::string & text, uint & code)
+{
+    pthread_once(&atomstrings_once, initAtomStrings);
+    pthread_mutex_lock(&atomstrings_mutex);
+    std::map<std::string, uint>::const_iterator it = atomstrings_codes->find(text);
+    const bool found = (it != atomstrings_codes->end());
+    if (found) code = it->second;
+    pthread_mutex_unlock(&atomstrings_mutex);
+    return found;
+}
+
+
+const AtomString & GetAtomString(uint code)
+{
+    pthread_once(&atomstrings_once, initAtomStrings);
+    return atomstrings_chunks[code / atomstrings_chunksize][code % atomstrings_chunksize];
+}
+
+
+
+Atomproperty::Atomproperty()
+{
+    mAtomType = atomstrings_x;
+    mAtomElement = atomstrings_x;
+    mResidType = atomstrings_xxx;
+    mChainId = atomstrings_x;
+    mResidId = 1;
+    mAtomId = 1;
+    mAtomCharge = 0.0;
+    mExtraCategory = 0;
+    mExtraCharge = 0.0;
+}
+
+
+void Atomproperty::SetExtra(std::string extra)
+{
+    uint category = 0;
+    dbl charge = 0.0;
+    std::istringstream iss(extra);
+    iss >> category >> charge;
+    mExtraCategory = category;
+    mExtraCharge = charge;
+    if (extra.empty()) mExtra.reset();
+    else mExtra.reset(new std::string(extra));
+}
+
+
+const std::string & Atomproperty::GetExtra() const
+{
+    return mExtra ? *mExtra : GetAtomString(atomstrings_empty).text;
+}
+
+
+
 Coord3D Atom::GetCoords() const {return mCoords;}
 
 //! Convert an atom to a string
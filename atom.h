@@ -5,46 +5,69 @@
 
 #include <string>
 #include <iostream>
+#include <boost/shared_ptr.hpp>
 #include "coord3d.h"
 
 namespace PTools{
 
 
+/*! \brief entry of the table of atom property strings
+*
+*   Atom names, residue names and chain ids are stored once for the whole
+*   process: atom properties only keep the code of their strings, so that
+*   they are small and compared as integers. Strings are never removed from
+*   the table, hence it only holds these small vocabularies: the free-form
+*   extra fields stay with the atoms which read them (see Atomproperty).
+*/
+struct AtomString
+{
+    std::string text;
+};
+
+/// code of a string in the table of atom property strings (the string is added if needed)
+uint InternAtomString(const std::string & text);
+
+/// code of a string already in the table of atom property strings, false if the string is unknown
+bool FindAtomString(const std::string & text, uint & code);
+
+/// entry of the table of atom property strings from its code
+const AtomString & GetAtomString(uint code);
+
+
 class Atomproperty {
 private:
-    std::string mAtomType;  ///< CA, N, HN1, ...
-    std::string mAtomElement; ///< C, N, H, O, etc.
-    std::string mResidType; ///< LEU, ARG, ...
-    std::string mChainId; ///< A, B, etc.
+    uint mAtomType;  ///< CA, N, HN1, ... (code of the string, see AtomString)
+    uint mAtomElement; ///< C, N, H, O, etc. (code of the string)
+    uint mResidType; ///< LEU, ARG, ... (code of the string)
+    uint mChainId; ///< A, B, etc. (code of the string)
     uint mResidId; ///< residue number
     uint mAtomId; ///< atom number
     dbl mAtomCharge; ///< charge of the atom
-    std::string mExtra; ///< extra data
+    uint mExtraCategory; ///< atom category read from the extra data
+    dbl mExtraCharge; ///< atom charge read from the extra data
+    boost::shared_ptr<const std::string> mExtra; ///< extra data, shared by the atoms read from the same field (null if empty)
 
 public:
     /// default constructor
-    Atomproperty()
-    {
-        mAtomType="X";
-        mAtomElement="X";
-        mResidType="XXX";
-        mChainId="X";
-        mResidId=1;
-        mAtomId=1;
-        mAtomCharge=0.0;
-    };
+    Atomproperty();
 
     /// return atom type (CA, CB, O, N...)
-    std::string GetType() const  {return mAtomType;};
+    const std::string & GetType() const  {return GetAtomString(mAtomType).text;};
 
     /// define atom type (CA, CB, O, N...)
-    void SetType(std::string newtype) { mAtomType = newtype;};
+    void SetType(std::string newtype) { mAtomType = InternAtomString(newtype);};
+
+    /// code of the atom type (equal codes for equal types)
+    uint GetTypeCode() const {return mAtomType;};
 
     /// return residue type (LEU, ARG...)
-    std::string GetResidType() const {return mResidType;};
+    const std::string & GetResidType() const {return GetAtomString(mResidType).text;};
 
     /// define residue type (LEU, ARG...)
-    void SetResidType(std::string residtype){mResidType=residtype;};
+    void SetResidType(std::string residtype){mResidType = InternAtomString(residtype);};
+
+    /// code of the residue type (equal codes for equal types)
+    uint GetResidTypeCode() const {return mResidType;};
 
     /// return atom charge
     inline dbl GetAtomCharge() const {return mAtomCharge;};
@@ -53,10 +76,13 @@ public:
     inline void SetAtomCharge(dbl ch) {mAtomCharge=ch;};
 
     /// return chain ID (A, B...)
-    inline std::string GetChainId() const {return mChainId;};
+    inline const std::string & GetChainId() const {return GetAtomString(mChainId).text;};
 
     /// define chain ID (A, B...)
-    inline void SetChainId(std::string chainid) {mChainId=chainid;};
+    inline void SetChainId(std::string chainid) {mChainId = InternAtomString(chainid);};
+
+    /// code of the chain ID (equal codes for equal chains)
+    uint GetChainIdCode() const {return mChainId;};
 
     /// return residue ID (1, 2...)
     inline uint GetResidId() const {return mResidId;};
@@ -70,11 +96,29 @@ public:
     /// define atom ID (1, 2...)
     inline void SetAtomId(uint atomnumber) {mAtomId=atomnumber;};
 
-    /// set the extra data field
-    inline void SetExtra(std::string extra){mExtra=extra;};
+    /// set the extra data field (category and charge are read from it)
+    void SetExtra(std::string extra);
 
     /// get the extra data field
-    inline std::string GetExtra() const {return mExtra;};
+    const std::string & GetExtra() const;
+
+    /// codes of the strings: type, element, residue type and chain (see AtomString)
+    void GetStringCodes(uint codes[4]) const
+    {
+        codes[0] = mAtomType; codes[1] = mAtomElement; codes[2] = mResidType; codes[3] = mChainId;
+    };
+
+    /// define the strings from their codes (codes given by InternAtomString(), in the order of GetStringCodes())
+    void SetStringCodes(const uint codes[4])
+    {
+        mAtomType = codes[0]; mAtomElement = codes[1]; mResidType = codes[2]; mChainId = codes[3];
+    };
+
+    /// atom category read from the extra data field (Attract reduced models, 0 if none)
+    inline uint GetExtraCategory() const {return mExtraCategory;};
+
+    /// atom charge read from the extra data field (Attract reduced models, 0 if none)
+    inline dbl GetExtraCharge() const {return mExtraCharge;};
 
 };
 
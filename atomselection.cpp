@@ -36,11 +36,15 @@ AtomSelection::AtomSelection(const AtomSelection& oldsel)
 Rigidbody AtomSelection::CreateRigid()
 {
     Rigidbody newrigid;
+    std::vector<Atomproperty> atoms(this->Size());
+    std::vector<Coord3D> coords(this->Size());
+    const std::vector<Coord3D> & allcoords = m_rigid->GetCoordsArray();
     for (uint i=0; i<this->Size(); i++)
     {
-        Atom at = m_rigid->CopyAtom(m_list[i]);
-        newrigid.AddAtom(at);
+        atoms[i] = m_rigid->GetAtomProperty(m_list[i]);
+        coords[i] = allcoords[m_list[i]];
     }
+    newrigid.AddAtoms(atoms, coords);
 
     return newrigid;
 }
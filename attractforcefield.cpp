@@ -2,8 +2,11 @@
 
 
 #include <fstream>
+#include <map>
 #include <math.h>  //for fabs()
 #include <sstream> //for istringstream
+#include <pthread.h>
+#include <sys/stat.h>
 
 
 using std::ios_base;
@@ -21,21 +24,101 @@ namespace PTools {
 void extractExtra( Rigidbody& rig, std::vector<uint>& vCat, std::vector<dbl>& vCh)
 {
 
-    uint   atcategory  = 0;
-    dbl  atcharge   = 0.0;
-
     for (uint i=0; i<rig.Size(); i++)
     {
-        const Atomproperty at = rig.GetAtomProperty(i);
-        std::string extra = at.GetExtra();
-        //std::cout << extra << std::endl;
-        std::istringstream iss( extra );
-        iss >> atcategory >> atcharge ;
-        vCat.push_back(atcategory-1);
-        vCh.push_back(atcharge);
+        const Atomproperty & at = rig.GetAtomProperty(i);
+        vCat.push_back(at.GetExtraCategory()-1);
+        vCh.push_back(at.GetExtraCharge());
+    }
+
+
+}
+
+
+
+////////////////////////////////////////////////////////////////
+//     parameters cache
+////////////////////////////////////////////////////////////////
+
+/*
+   Forcefield parameters are read-only once loaded: they are shared between
+   all the forcefields built from the same file. Files are identified by their
+   path, modification time and content, so that a modified file is read again.
+   The cache is never emptied (parameter tables are small).
+*/
+
+static pthread_mutex_t paramscache_mutex = PTHREAD_MUTEX_INITIALIZER;
+static std::map<std::string, boost::shared_ptr<const AttFF1_params> > ff1cache;
+static std::map<std::string, boost::shared_ptr<const AttFF2_params> > ff2cache;
+static uint lastparamsid = 0; ///< last identifier given to a set of parameters (protected by the mutex)
+
+
+///locks a mutex for the lifetime of the object
+class ScopedLock
+{
+public:
+    ScopedLock(pthread_mutex_t & mutex): m_mutex(mutex) {pthread_mutex_lock(&m_mutex);}
+    ~ScopedLock() {pthread_mutex_unlock(&m_mutex);}
+private:
+    pthread_mutex_t & m_mutex;
+};
+
+
+/*! \brief reads a whole parameters file and computes its cache key and content hash
+*
+*  returns false if the file cannot be opened
+*/
+static bool readParamsFile(const std::string & filename, std::string & content, std::string & key, uint & hash)
+{
+    std::ifstream file(filename.c_str(), ios_base::in | ios_base::binary);
+    if (!file) return false;
+
+    std::ostringstream oss;
+    oss << file.rdbuf();
+    content = oss.str();
+
+    struct stat st;
+    long mtime = 0;
+    if (stat(filename.c_str(), &st) == 0) mtime = (long) st.st_mtime;
+
+    //FNV-1a hash of the content
+    hash = 2166136261u;
+    for (uint i = 0; i < content.size(); i++)
+    {
+        hash ^= (unsigned char) content[i];
+        hash *= 16777619u;
+    }
+
+    std::ostringstream keystream;
+    keystream << filename << '|' << mtime << '|' << content.size() << '|' << hash;
+    key = keystream.str();
+    return true;
+}
+
+
+///reads forcefield 1 parameters (aminon.par)
+static void parseParams(std::istream & aminon, AttFF1_params & params)
+{
+    int indice, inull;
+    dbl rad;
+    dbl amp;
+
+    while (!aminon.eof())
+    {
+        aminon >> indice >> rad >> amp >> inull ;
+        params.rad.push_back(rad) ;
+        params.amp.push_back(amp) ;
+        assert(params.rad.size()<64);
     }
 
 
+    //initialisation of the pre-calculated array of rc and ac
+    for (uint i=0; i<params.rad.size();i++)
+        for (uint j=0; j<params.rad.size(); j++)
+        {
+            params.rc[i][j]=params.amp[i]*params.amp[j]*pow((params.rad[i]+params.rad[j]),8);
+            params.ac[i][j]=params.amp[i]*params.amp[j]*pow((params.rad[i]+params.rad[j]),6);
+        }
 }
 
 
@@ -57,12 +140,11 @@ AttractForceField1::AttractForceField1(std::string paramsFileName, dbl cutoff)
 
 void AttractForceField1::InitParams(const std::string & paramsFileName )
 {
-    int indice, inull;
-    dbl rad;
-    dbl amp;
+    std::string content, key;
+    uint hash;
+    ScopedLock lock(paramscache_mutex);
 
-    std::ifstream aminon(paramsFileName.c_str());
-    if (!aminon)
+    if (!readParamsFile(paramsFileName, content, key, hash))
     {
         //the file cannot be opened
         std::string msg = "Forcefield.cpp: Cannot Locate file forcefield parameters (aminon.par)\n";
@@ -70,58 +152,55 @@ void AttractForceField1::InitParams(const std::string & paramsFileName )
         throw std::invalid_argument(msg);
     }
 
-    while (!aminon.eof())
+    std::map<std::string, boost::shared_ptr<const AttFF1_params> >::iterator it = ff1cache.find(key);
+    if (it != ff1cache.end())
     {
-        aminon >> indice >> rad >> amp >> inull ;
-        m_rad.push_back(rad) ;
-        m_amp.push_back(amp) ;
-        assert(m_rad.size()<64);
+        m_params = it->second;
+    }
+    else
+    {
+        boost::shared_ptr<AttFF1_params> params (new AttFF1_params());
+        std::istringstream aminon(content);
+        parseParams(aminon, *params);
+        params->paramsid = ++lastparamsid;
+        params->paramshash = hash;
+        ff1cache[key] = params;
+        m_params = params;
     }
 
-
-    //initialisation of the pre-calculated array of rc and ac
-    for (uint i=0; i<m_rad.size();i++)
-        for (uint j=0; j<m_rad.size(); j++)
-        {
-            m_rc[i][j]=m_amp[i]*m_amp[j]*pow((m_rad[i]+m_rad[j]),8);
-            m_ac[i][j]=m_amp[i]*m_amp[j]*pow((m_rad[i]+m_rad[j]),6);
-        }
+    m_paramsid = m_params->paramsid;
+    m_paramshash = m_params->paramshash;
 }
 
 
 
-dbl AttractForceField1::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, bool print)
+void AttractForceField1::nonbon8_range(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, uint first, uint last, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, dbl& vdw, dbl& elec)
 {
 
-    assert(forcerec.size() == rec.Size());
-    assert(forcelig.size() == lig.Size());
-
     dbl sumLJ=0.0 ;
     dbl sumElectrostatic=0.0;
 
-
-    //synchronize coordinates for using unsafeGetCoords
-    rec.syncCoords();
-    lig.syncCoords();
-
     Coord3D a, b;
 
+    //with a Verlet skin the list contains pairs beyond the cutoff
+    const bool checkcutoff = (pairlist.GetSkin() > 0.0);
+    const dbl squarecutoff = pairlist.GetSquareCutoff();
 
-    for (uint iter=0; iter<pairlist.Size(); iter++)
-    {
 
-        uint ir = pairlist[iter].atrec;
-        uint jl = pairlist[iter].atlig;
+    const std::vector<uint> & vectl = pairlist.GetLigandIndexes();
+    const std::vector<uint> & vectr = pairlist.GetReceptorIndexes();
+    const PairParams & params = pairlist.GetPairParams();
+    assert(params.paramsid == m_paramsid);
 
-        uint rAtomCat = rec.getAtomTypeNumber(ir);
-        uint lAtomCat = lig.getAtomTypeNumber(jl);
 
-        assert(rAtomCat < m_rad.size());
-        assert(lAtomCat < m_rad.size());
+    for (uint iter=first; iter<last; iter++)
+    {
 
+        uint ir = vectr[iter];
+        uint jl = vectl[iter];
 
-        dbl alen = m_ac[ rAtomCat ][ lAtomCat ];
-        dbl rlen = m_rc[ rAtomCat ][ lAtomCat ];
+        dbl alen = params.alen[iter];
+        dbl rlen = params.rlen[iter];
 
 
         lig.unsafeGetCoords(jl,a);
@@ -130,6 +209,7 @@ dbl AttractForceField1::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody&
         Coord3D dx = a-b ;
         dbl r2 = Norm2(dx);
 
+        if (checkcutoff && r2 > squarecutoff) continue;
         if (r2 < 0.001 ) r2=0.001;
         dbl rr2 = 1.0/r2;
         dx = rr2*dx;
@@ -150,9 +230,7 @@ dbl AttractForceField1::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody&
 
 
         //electrostatic part:
-        dbl chargeR = rec.m_charge[ir];
-        dbl chargeL = lig.m_charge[jl];
-        dbl charge = chargeR * chargeL * (332.053986/20.0);
+        dbl charge = params.charge[iter];
 
         if (fabs(charge) > 0.0)
         {
@@ -166,10 +244,8 @@ dbl AttractForceField1::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody&
         }
     }
 
-    m_vdw = sumLJ;
-    m_elec = sumElectrostatic;
-
-    return sumLJ + sumElectrostatic;
+    vdw = sumLJ;
+    elec = sumElectrostatic;
 }
 
 
@@ -180,152 +256,324 @@ dbl AttractForceField1::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody&
 
 
 
-void BaseAttractForceField::initMinimization()
+void AttractForceField1::cachePairParams(const AttractRigidbody& rec, const AttractRigidbody& lig, AttractPairList & pairlist)
 {
-    MakePairLists();
+    const std::vector<uint> & vectl = pairlist.GetLigandIndexes();
+    const std::vector<uint> & vectr = pairlist.GetReceptorIndexes();
+    const uint npairs = vectl.size();
+
+    //arrays are filled in place to reuse their storage
+    PairParams & params = pairlist.GetPairParams();
+    params.alen.resize(npairs);
+    params.rlen.resize(npairs);
+    params.charge.resize(npairs);
+
+    for (uint iter=0; iter<npairs; iter++)
+    {
+        uint ir = vectr[iter];
+        uint jl = vectl[iter];
+
+        uint rAtomCat = rec.getAtomTypeNumber(ir);
+        uint lAtomCat = lig.getAtomTypeNumber(jl);
+
+        assert(rAtomCat < m_params->rad.size());
+        assert(lAtomCat < m_params->rad.size());
+
+        params.alen[iter] = m_params->ac[ rAtomCat ][ lAtomCat ];
+        params.rlen[iter] = m_params->rc[ rAtomCat ][ lAtomCat ];
+        params.charge[iter] = rec.m_charge[ir] * lig.m_charge[jl] * (332.053986/20.0);
+    }
+
+    params.paramsid = m_paramsid;
 }
 
 
-////////////////////////////////////////////////////////////////
-//     AttractForceField2 implementation
-////////////////////////////////////////////////////////////////
 
+dbl AttractForceField1::pairVdw(uint rectype, uint ligtype, dbl r2) const
+{
+    assert(rectype < m_params->rad.size());
+    assert(ligtype < m_params->rad.size());
+
+    if (r2 < 0.001 ) r2=0.001;
+    dbl rr2 = 1.0/r2;
+    dbl rr23 = rr2*rr2*rr2 ;
+    return (m_params->rc[rectype][ligtype]*rr2 - m_params->ac[rectype][ligtype])*rr23 ;
+}
 
-static AttFF2_params* m_params = 0;
 
-AttractForceField2::AttractForceField2(const std::string & filename, dbl cutoff)
+
+
+
+
+/*! \brief non-bonded energy and forces of a pair of ligands
+*
+*  The pairlist is split into as many contiguous chunks as threads. Each thread
+*  accumulates its forces in its own buffers, which are then reduced in the
+*  threads order: for a given number of threads the result does not depend on
+*  the scheduling. Changing the number of threads only changes the summation
+*  order (relative differences on the energy of the order of 1e-12).
+*/
+dbl BaseAttractForceField::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, bool print)
 {
-     loadParams(filename, cutoff);
+    assert(forcerec.size() == rec.Size());
+    assert(forcelig.size() == lig.Size());
+
+    //synchronize coordinates for using unsafeGetCoords
+    rec.syncCoords();
+    lig.syncCoords();
+
+    //per-pair parameters are computed once per pairlist update
+    if (pairlist.GetPairParams().paramsid != m_paramsid)
+        cachePairParams(rec, lig, pairlist);
+
+    const uint npairs = pairlist.Size();
+    dbl vdw = 0.0;
+    dbl elec = 0.0;
+
+    //small pairlists are not worth the threads overhead
+    const uint minpairsperthread = 2000;
+    uint nthreads = m_numthreads;
+    if (npairs / minpairsperthread < nthreads) nthreads = npairs / minpairsperthread;
+
+#ifdef _OPENMP
+    if (nthreads > 1)
+    {
+        //thread 0 writes in the output arrays, the others in their own buffers:
+        m_threadforcerec.resize(nthreads-1);
+        m_threadforcelig.resize(nthreads-1);
+        std::vector<dbl> & threadvdw = m_threadvdw;
+        std::vector<dbl> & threadelec = m_threadelec;
+        threadvdw.assign(nthreads, 0.0);
+        threadelec.assign(nthreads, 0.0);
+
+        #pragma omp parallel for num_threads(nthreads) schedule(static, 1)
+        for (int t = 0; t < (int) nthreads; t++)
+        {
+            const uint chunk = npairs / nthreads;
+            uint first = t * chunk;
+            uint last = (t == (int) nthreads-1) ? npairs : first + chunk;
+            if (t == 0)
+            {
+                nonbon8_range(rec, lig, pairlist, first, last, forcerec, forcelig, threadvdw[t], threadelec[t]);
+            }
+            else
+            {
+                std::vector<Coord3D> & frec = m_threadforcerec[t-1];
+                std::vector<Coord3D> & flig = m_threadforcelig[t-1];
+                frec.assign(rec.Size(), Coord3D());
+                flig.assign(lig.Size(), Coord3D());
+                nonbon8_range(rec, lig, pairlist, first, last, frec, flig, threadvdw[t], threadelec[t]);
+            }
+        }
+
+        for (uint t = 0; t < nthreads; t++)
+        {
+            vdw += threadvdw[t];
+            elec += threadelec[t];
+        }
+
+        for (uint t = 0; t < nthreads-1; t++)
+        {
+            const std::vector<Coord3D> & frec = m_threadforcerec[t];
+            const std::vector<Coord3D> & flig = m_threadforcelig[t];
+            for (uint i = 0; i < frec.size(); i++) forcerec[i] += frec[i];
+            for (uint i = 0; i < flig.size(); i++) forcelig[i] += flig[i];
+        }
+    }
+    else
+#endif
+    {
+        nonbon8_range(rec, lig, pairlist, 0, npairs, forcerec, forcelig, vdw, elec);
+    }
+
+    if (print)
+    {
+        std::cout.precision(20);
+        std::cout << "vlj  coulomb: " << vdw << "  " << elec << "\n";
+    }
+    m_vdw = vdw;
+    m_elec = elec;
+    return vdw + elec;
 }
 
-void AttractForceField2::resetParams()
+
+/*! \brief set the number of threads used for the non-bonded interactions
+*
+*  Only effective if the library was compiled with OpenMP support
+*  (sequential otherwise).
+*/
+void BaseAttractForceField::setNumThreads(uint nthreads)
 {
-     delete m_params;
-     m_params = NULL;
-     m_filename = "";
+    if (nthreads < 1) nthreads = 1;
+    m_numthreads = nthreads;
 }
 
-void AttractForceField2::reloadParams(const std::string & filename, dbl cutoff)
+
+
+void BaseAttractForceField::initMinimization()
 {
-  resetParams();
-  loadParams(filename, cutoff);
+    MakePairLists();
+    m_pairlistupdates = 0;
 }
 
 
-void AttractForceField2::loadParams(const std::string & filename, dbl cutoff)
+////////////////////////////////////////////////////////////////
+//     AttractForceField2 implementation
+////////////////////////////////////////////////////////////////
+
+
+///reads forcefield 2 parameters (mbest1k.par)
+static void parseParams(std::istream & mbest, AttFF2_params & params)
 {
+    std::string line;
+    getline(mbest, line); //read the first line into "line"
+    std::istringstream iss (line); // iss allows formated extraction from "line"
 
-    m_cutoff=cutoff;
-    if (m_params==0)
+    std::string magic;
+    iss >> magic;   //reads magic constant
+    if (magic == "AFF")   // file format version 2 at least
     {
-        m_params=new AttFF2_params();
-
-        std::ifstream mbest (filename.c_str());
-        //open(11,file=eingabe2) -> eingabe2: mbest1k.par
-        if (!mbest)
-        {
-            //the file cannot be opened
-            std::string msg = "Forcefield.cpp: Cannot Locate file  " + filename + "\n" ;
+       int revnb;
+       iss >> revnb;  //get revision number
+       if (revnb == 2 ) // file format version 2:
+         {
+             //get list of dummy types:
+             uint numdummy;
+             iss >> numdummy;
+             std::vector<uint> dummyatomtypes;
+             for(uint i=0; i<numdummy; i++)
+                {
+                   uint type;
+                   iss >> type;
+                   dummyatomtypes.push_back(type-1); //types counting begins at 0
+                }
+             std::swap(dummyatomtypes, params._dummytypes);
+         }
+        else
+         {
+            std::string msg = "AttractForceField2: cannot read parameter file version \n";
+            msg += revnb ;
+            std::cerr << msg ;
             ios_base::failure fail(msg);
-            std::cout << msg ;
             throw fail;
-        }
-        m_filename = filename;
-
-
+         }
+    }
+    else 
+    {
+      //declare forcefield file as invalid:
+      std::string msg = "AttractForceField2: invalid paramters file format: doesn't contain AFF string \n";
+      std::cerr << msg ;
+      ios_base::failure fail(msg);
+      throw fail;
+    }
 
-        std::string line;
-        getline(mbest, line); //read the first line into "line"
-        std::istringstream iss (line); // iss allows formated extraction from "line"
 
-        std::string magic;
-        iss >> magic;   //reads magic constant
-        if (magic == "AFF")   // file format version 2 at least
+    for (uint i = 0; i<31; i++)
+        for (uint j = 0; j<31; j++)
         {
-           int revnb;
-           iss >> revnb;  //get revision number
-           if (revnb == 2 ) // file format version 2:
-             {
-                 //get list of dummy types:
-                 uint numdummy;
-                 iss >> numdummy;
-                 std::vector<uint> dummyatomtypes;
-                 for(uint i=0; i<numdummy; i++)
-                    {
-                       uint type;
-                       iss >> type;
-                       dummyatomtypes.push_back(type-1); //types counting begins at 0
-                    }
-                 std::swap(dummyatomtypes, m_params->_dummytypes);
-             }
-            else
-             {
-                std::string msg = "AttractForceField2: cannot read parameter file version \n";
-                msg += revnb ;
-                std::cerr << msg ;
-                ios_base::failure fail(msg);
-                throw fail;
-             }
+            mbest >> params.rbc[i][j] ;
         }
-        else 
+
+    for (uint i = 0; i<31; i++)
+        for (uint j = 0; j<31; j++)
+            mbest >> params.abc[i][j] ;
+
+    for (uint i = 0; i<31; i++)
+    {
+        for (uint j = 0; j<31; j++)
         {
-          //declare forcefield file as invalid:
-          std::string msg = "AttractForceField2: invalid paramters file format: doesn't contain AFF string \n";
-          std::cerr << msg ;
-          ios_base::failure fail(msg);
-          throw fail;
+            mbest >> params.iflo[i][j] ;
+            assert(params.iflo[i][j]==1 || params.iflo[i][j]==-1);
         }
+    }
 
 
-        for (uint i = 0; i<31; i++)
-            for (uint j = 0; j<31; j++)
-            {
-                mbest >> m_params->rbc[i][j] ;
-            }
 
-        for (uint i = 0; i<31; i++)
-            for (uint j = 0; j<31; j++)
-                mbest >> m_params->abc[i][j] ;
+    for (uint jj=0; jj<31; jj++)  // loop over attract atom types
+    {
 
-        for (uint i = 0; i<31; i++)
+        for (uint ii=0; ii<31; ii++) // loop over attract atom types
         {
-            for (uint j = 0; j<31; j++)
-            {
-                mbest >> m_params->iflo[i][j] ;
-                assert(m_params->iflo[i][j]==1 || m_params->iflo[i][j]==-1);
-            }
+
+            dbl rbc2 = params.rbc[ii][jj]*params.rbc[ii][jj];
+            dbl rbc6 = rbc2*rbc2*rbc2;
+            dbl rbc8 = rbc6*rbc2;
+            params.rc[ii][jj] = params.abc[ii][jj] * rbc8;
+            params.ac[ii][jj] = params.abc[ii][jj] * rbc6;
+
+            params.ipon[ii][jj] = params.iflo[ii][jj] ;
+            assert(params.ipon[ii][jj]==1 || params.ipon[ii][jj]==-1);
+
+            dbl alen = params.ac[ii][jj];
+            dbl rlen = params.rc[ii][jj];
+            dbl alen4 = alen*alen*alen*alen;
+            dbl rlen3 = rlen*rlen*rlen;
+            params.emin[ii][jj] = -27.0*alen4/(256.0*rlen3);
+            params.rmin2[ii][jj]= 4.0*rlen/(3.0*alen);
+
+
         }
+    }
+}
 
 
 
-        for (uint jj=0; jj<31; jj++)  // loop over attract atom types
-        {
+AttractForceField2::AttractForceField2(const std::string & filename, dbl cutoff)
+{
+     loadParams(filename, cutoff);
+}
 
-            for (uint ii=0; ii<31; ii++) // loop over attract atom types
-            {
+void AttractForceField2::resetParams()
+{
+     m_params.reset();
+     m_filename = "";
+}
+
+void AttractForceField2::reloadParams(const std::string & filename, dbl cutoff)
+{
+  resetParams();
+  loadParams(filename, cutoff);
+}
 
-                dbl rbc2 = m_params->rbc[ii][jj]*m_params->rbc[ii][jj];
-                dbl rbc6 = rbc2*rbc2*rbc2;
-                dbl rbc8 = rbc6*rbc2;
-                m_params->rc[ii][jj] = m_params->abc[ii][jj] * rbc8;
-                m_params->ac[ii][jj] = m_params->abc[ii][jj] * rbc6;
 
-                m_params->ipon[ii][jj] = m_params->iflo[ii][jj] ;
-                assert(m_params->ipon[ii][jj]==1 || m_params->ipon[ii][jj]==-1);
+void AttractForceField2::loadParams(const std::string & filename, dbl cutoff)
+{
 
-                dbl alen = m_params->ac[ii][jj];
-                dbl rlen = m_params->rc[ii][jj];
-                dbl alen4 = alen*alen*alen*alen;
-                dbl rlen3 = rlen*rlen*rlen;
-                m_params->emin[ii][jj] = -27.0*alen4/(256.0*rlen3);
-                m_params->rmin2[ii][jj]= 4.0*rlen/(3.0*alen);
+    m_cutoff=cutoff;
 
+    std::string content, key;
+    uint hash;
+    ScopedLock lock(paramscache_mutex);
 
-            }
-        }
+    //open(11,file=eingabe2) -> eingabe2: mbest1k.par
+    if (!readParamsFile(filename, content, key, hash))
+    {
+        //the file cannot be opened
+        std::string msg = "Forcefield.cpp: Cannot Locate file  " + filename + "\n" ;
+        ios_base::failure fail(msg);
+        std::cout << msg ;
+        throw fail;
     }
 
+    std::map<std::string, boost::shared_ptr<const AttFF2_params> >::iterator it = ff2cache.find(key);
+    if (it != ff2cache.end())
+    {
+        m_params = it->second;
+    }
+    else
+    {
+        boost::shared_ptr<AttFF2_params> params (new AttFF2_params());
+        std::istringstream mbest(content);
+        parseParams(mbest, *params);
+        params->paramsid = ++lastparamsid;
+        params->paramshash = hash;
+        ff2cache[key] = params;
+        m_params = params;
+    }
 
+    m_filename = filename;
+    m_paramsid = m_params->paramsid;
+    m_paramshash = m_params->paramshash;
 }
 
 
@@ -349,9 +597,10 @@ dbl BaseAttractForceField::Function(const Vdouble& stateVars )
 
 
     //put the ligands to the correct positions defined by stateVars
+    //(moved and centered ligands share their reference coordinates: only the matrix is copied)
     for (uint i=0; i<m_movedligand.size(); i++)
     {
-        m_movedligand[i] = m_centeredligand[i];
+        m_movedligand[i].SetMatrixFrom(m_centeredligand[i]);
         m_movedligand[i].resetForces(); //just to be sure that the forces are set to zero. Maybe not needed.
 
 
@@ -376,7 +625,7 @@ dbl BaseAttractForceField::Function(const Vdouble& stateVars )
 
     }
 
-
+    if (m_skin > 0.0) checkPairLists();
 
 
     dbl enernon = 0.0 ;
@@ -387,7 +636,23 @@ dbl BaseAttractForceField::Function(const Vdouble& stateVars )
         for (uint j=i+1; j<m_movedligand.size(); j++)
         {
             assert(plistnumber < m_pairlists.size() );
-            enernon += nonbon8(m_movedligand[i], m_movedligand[j],  m_pairlists[plistnumber++] );   //calculates energy contribution for every pair. Forces are stored for each ligand
+            if (m_recgrid[i].IsValid())
+                enernon += gridEnergy(m_movedligand[j], m_recgrid[i]);
+            else if (m_recgrid[j].IsValid())
+                enernon += gridEnergy(m_movedligand[i], m_recgrid[j]);
+            else
+            {
+                //calculates energy contribution for every pair. Forces are stored for each ligand
+                //(same as nonbon8() but with the forcefield buffers)
+                AttractRigidbody & rec = m_movedligand[i];
+                AttractRigidbody & lig = m_movedligand[j];
+                m_forcerec.assign(rec.Size(), Coord3D());
+                m_forcelig.assign(lig.Size(), Coord3D());
+                enernon += nonbon8_forces(rec, lig, m_pairlists[plistnumber], m_forcerec, m_forcelig);
+                rec.addForces(m_forcerec);
+                lig.addForces(m_forcelig);
+            }
+            plistnumber++;
         }
 
 
@@ -460,47 +725,63 @@ void BaseAttractForceField::Derivatives(const Vdouble& stateVars, Vdouble& delta
 
 
 
+/*! \brief energy and derivatives at the same point
+*
+*  The forces used for the derivatives are always those of stateVars,
+*  and each ligand atom is visited once for its rotational and
+*  translational derivatives (see RotaTrans()).
+*/
+dbl BaseAttractForceField::Evaluate(const Vdouble& stateVars, Vdouble& delta)
+{
+    dbl ener = Function(stateVars);
+
+    uint svptr = 0; // stateVars 'pointer'
+    for (uint i=0; i<m_movedligand.size(); i++)
+    {
+        const AttractRigidbody & lig = m_movedligand[i];
+        if (!(lig.hasrotation || lig.hastranslation)) continue;
+        RotaTrans(i, stateVars, delta, svptr);
+        if (lig.hasrotation) svptr+=3;
+        if (lig.hastranslation) svptr+=3;
+    }
+
+    return ener;
+}
+
+
+
 /*! \brief Non bonded energy
 *
 *   translated from fortran file nonbon8.f
 *   TODO: add comments in the code, remove debug instructions
 */
-dbl AttractForceField2::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, bool print)
+void AttractForceField2::nonbon8_range(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, uint first, uint last, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, dbl& vdw, dbl& elec)
 {
 
     dbl enon = 0.0;
     dbl epote = 0.0;
 
-
-    std::cout.precision(20);
-
-    //synchronise coordinates to later use unsafeGetCoords (should be faster)
-    rec.syncCoords();
-    lig.syncCoords();
-
     Coord3D a;
     Coord3D b;
 
-    for (uint ik=0; ik<pairlist.Size(); ik++ )
-    {
-        AtomPair atpair = pairlist[ik];
-
-
-        uint i = atpair.atrec ;
-        uint j = atpair.atlig ;
-        uint ii=rec.m_atomTypeNumber[i];
-        uint jj=lig.m_atomTypeNumber[j];
+    //with a Verlet skin the list contains pairs beyond the cutoff
+    const bool checkcutoff = (pairlist.GetSkin() > 0.0);
+    const dbl squarecutoff = pairlist.GetSquareCutoff();
 
-        assert(ii<31);
-        assert(jj<31);
-        dbl alen = m_params->ac[ii][jj];
-        dbl rlen = m_params->rc[ii][jj];
-        int ivor = m_params->ipon[ii][jj];
-        assert(ivor==1 || ivor==-1);
+    const std::vector<uint> & vectl = pairlist.GetLigandIndexes();
+    const std::vector<uint> & vectr = pairlist.GetReceptorIndexes();
+    const PairParams & params = pairlist.GetPairParams();
+    assert(params.paramsid == m_paramsid);
 
+    for (uint ik=first; ik<last; ik++ )
+    {
+        uint i = vectr[ik] ;
+        uint j = vectl[ik] ;
 
-        dbl charge= rec.m_charge[i]* lig.m_charge[j];  //charge product of the two atoms
-        //std::cout << "charge: " << charge << std::endl;
+        dbl alen = params.alen[ik];
+        dbl rlen = params.rlen[ik];
+        int ivor = params.ipon[ik];
+        dbl charge = params.charge[ik];  //charge product of the two atoms
 
         rec.unsafeGetCoords(i,a); lig.unsafeGetCoords(j,b);
 
@@ -508,6 +789,7 @@ dbl AttractForceField2::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody&
 
 
         dbl r2 = Norm2(dx);
+        if (checkcutoff && r2 > squarecutoff) continue;
         if (r2 < 0.001) r2=0.001 ;
 
         dbl rr2 = 1.0/r2;
@@ -525,12 +807,12 @@ dbl AttractForceField2::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody&
         }
 
         //switch between minimum or saddle point
-        if (r2 < m_params->rmin2[ii][jj] ) {
+        if (r2 < params.rmin2[ik] ) {
 
             dbl rr23 = rr2*rr2*rr2 ;
             dbl rep = rlen*rr2 ;
             dbl vlj = (rep-alen)*rr23;
-            enon=enon+vlj+(ivor-1)*m_params->emin[ii][jj] ;
+            enon=enon+vlj+(ivor-1)*params.emin[ik] ;
 
             dbl fb=6.0*vlj+2.0*(rep*rr23);
             Coord3D fdb = fb*dx;
@@ -553,10 +835,122 @@ dbl AttractForceField2::nonbon8_forces(AttractRigidbody& rec, AttractRigidbody&
 
     }
 
-    if (print) std::cout << "vlj  coulomb: " << enon << "  " << epote << "\n";
-    m_elec = epote;
-    m_vdw = enon;
-    return enon+epote;
+    vdw = enon;
+    elec = epote;
+}
+
+
+
+void AttractForceField2::cachePairParams(const AttractRigidbody& rec, const AttractRigidbody& lig, AttractPairList & pairlist)
+{
+    const std::vector<uint> & vectl = pairlist.GetLigandIndexes();
+    const std::vector<uint> & vectr = pairlist.GetReceptorIndexes();
+    const uint npairs = vectl.size();
+
+    //arrays are filled in place to reuse their storage
+    PairParams & params = pairlist.GetPairParams();
+    params.alen.resize(npairs);
+    params.rlen.resize(npairs);
+    params.charge.resize(npairs);
+    params.ipon.resize(npairs);
+    params.emin.resize(npairs);
+    params.rmin2.resize(npairs);
+
+    for (uint ik=0; ik<npairs; ik++)
+    {
+        uint i = vectr[ik];
+        uint j = vectl[ik];
+        uint ii=rec.m_atomTypeNumber[i];
+        uint jj=lig.m_atomTypeNumber[j];
+
+        assert(ii<31);
+        assert(jj<31);
+        params.alen[ik] = m_params->ac[ii][jj];
+        params.rlen[ik] = m_params->rc[ii][jj];
+        params.ipon[ik] = m_params->ipon[ii][jj];
+        assert(params.ipon[ik]==1 || params.ipon[ik]==-1);
+        params.emin[ik] = m_params->emin[ii][jj];
+        params.rmin2[ik] = m_params->rmin2[ii][jj];
+        params.charge[ik] = rec.m_charge[i]* lig.m_charge[j];
+    }
+
+    params.paramsid = m_paramsid;
+}
+
+
+
+dbl AttractForceField2::pairVdw(uint rectype, uint ligtype, dbl r2) const
+{
+    assert(rectype<31);
+    assert(ligtype<31);
+
+    if (r2 < 0.001) r2=0.001 ;
+    dbl rr2 = 1.0/r2;
+    dbl rr23 = rr2*rr2*rr2 ;
+    dbl vlj = (m_params->rc[rectype][ligtype]*rr2 - m_params->ac[rectype][ligtype])*rr23;
+    int ivor = m_params->ipon[rectype][ligtype];
+
+    //switch between minimum or saddle point
+    if (r2 < m_params->rmin2[rectype][ligtype])
+        return vlj+(ivor-1)*m_params->emin[rectype][ligtype];
+    return ivor*vlj;
+}
+
+
+
+/*! \brief energy of a receptor/ligand pair, without forces
+*
+*  Same energy as nonbon8() with a pairlist of the same cutoff, but the
+*  atom pairs are streamed from a spatial index of the receptor: no pairlist
+*  is stored and no force is computed. The vdw/coulomb split is then
+*  available from getVdw() and getCoulomb().
+*/
+dbl BaseAttractForceField::ScoreEnergy(const AttractRigidbody& rec, const AttractRigidbody& lig, dbl cutoff)
+{
+    ReceptorIndex index(rec, cutoff * (1.0 + 1e-6) + 1e-6);
+    return ScoreEnergy(rec, index, lig, cutoff);
+}
+
+
+dbl BaseAttractForceField::ScoreEnergy(const AttractRigidbody& rec, const ReceptorIndex& index, const AttractRigidbody& lig, dbl cutoff)
+{
+    if (index.Size() != rec.Size())
+        throw std::invalid_argument("ScoreEnergy: the receptor index does not match the receptor");
+
+    const dbl squarecutoff = cutoff*cutoff;
+    dbl sumLJ = 0.0;
+    dbl sumElectrostatic = 0.0;
+    std::vector<uint> neighbors;
+
+    for (uint j = 0; j < lig.Size(); j++)
+    {
+        if (!lig.isAtomActive(j)) continue;
+
+        Coord3D b = lig.GetCoords(j);
+        index.Neighbors(b, squarecutoff, neighbors);
+
+        const uint ligtype = lig.m_atomTypeNumber[j];
+        const dbl ligcharge = lig.m_charge[j];
+
+        for (uint k = 0; k < neighbors.size(); k++)
+        {
+            uint i = neighbors[k];
+            if (!rec.isAtomActive(i)) continue;
+
+            dbl r2 = Norm2(b - index.GetCoords(i));
+            if (r2 < 0.001) r2 = 0.001;
+
+            sumLJ += pairVdw(rec.m_atomTypeNumber[i], ligtype, r2);
+
+            dbl reccharge = rec.m_charge[i];
+            if (reccharge*ligcharge != 0.0)
+                sumElectrostatic += pairElec(reccharge, ligcharge, 1.0/r2);
+        }
+    }
+
+    m_vdw = sumLJ;
+    m_elec = sumElectrostatic;
+    return sumLJ + sumElectrostatic;
 }
 
 
@@ -606,6 +1000,108 @@ void BaseAttractForceField::Trans(uint molIndex, Vdouble & delta, uint shift,  b
 
 
 
+/*! \brief rotational and translational derivatives of ligand 'molIndex'
+*
+*  Same results as Rota() followed by Trans(), with a single loop over the
+*  active atoms (the other atoms do not have forces). The variables of the
+*  ligand start at stateVars[shift] (rotation first, if any).
+*/
+void BaseAttractForceField::RotaTrans(uint molIndex, const Vdouble& stateVars, Vdouble& delta, uint shift)
+{
+    AttractRigidbody & ligCentered = m_centeredligand[molIndex];
+    const AttractRigidbody & ligMoved = m_movedligand[molIndex];
+    const bool hasrotation = ligMoved.hasrotation;
+
+    dbl cs=1.0, cp=1.0, ss=0.0, sp=0.0, crot=1.0, srot=0.0;
+    if (hasrotation)
+    {
+        assert(shift+2 < stateVars.size());
+        cs=cos(stateVars[shift+1]);
+        cp=cos(stateVars[shift]);
+        ss=sin(stateVars[shift+1]);
+        sp=sin(stateVars[shift]);
+        crot=cos(stateVars[shift+2]);
+        srot=sin(stateVars[shift+2]);
+    }
+    const dbl cscp=cs*cp;
+    const dbl cssp=cs*sp;
+    const dbl sscp=ss*cp;
+    const dbl sssp=ss*sp;
+
+    dbl drot[3] = {0.0, 0.0, 0.0};
+    dbl ftr1=0.0, ftr2=0.0, ftr3=0.0;
+    dbl pm[3][3];
+    Coord3D coords;
+
+    ligCentered.syncCoords();
+    for (uint i=0; i<ligCentered.m_activeAtoms.size(); i++)
+    {
+        const uint atomIndex = ligCentered.m_activeAtoms[i];
+        const Coord3D & force = ligMoved.m_forces[atomIndex];
+
+        ftr1=ftr1 + force.x;
+        ftr2=ftr2 + force.y;
+        ftr3=ftr3 + force.z;
+
+        if (!hasrotation) continue;
+
+        ligCentered.unsafeGetCoords(atomIndex, coords);
+        const dbl X = coords.x;
+        const dbl Y = coords.y;
+        const dbl Z = coords.z;
+
+        const dbl xar=X*crot+Y*srot;
+        const dbl yar=-X*srot+Y*crot;
+        pm[0][0]=-xar*cssp-yar*cp-Z*sssp ;
+        pm[1][0]=xar*cscp-yar*sp+Z*sscp ;
+        pm[2][0]=0.0 ;
+
+        pm[0][1]=-xar*sscp+Z*cscp ;
+        pm[1][1]=-xar*sssp+Z*cssp ;
+        pm[2][1]=-xar*cs-Z*ss ;
+
+        pm[0][2]=yar*cscp+xar*sp ;
+        pm[1][2]=yar*cssp-xar*cp ;
+        pm[2][2]=-yar*ss ;
+
+        for (uint j=0;j<3;j++)
+        {
+            drot[j] += pm[0][j] * force.x ;
+            drot[j] += pm[1][j] * force.y ;
+            drot[j] += pm[2][j] * force.z ;
+        }
+    }
+
+    if (hasrotation)
+    {
+        for (uint j=0; j<3; j++) delta[j+shift] = drot[j];
+        shift+=3;
+    }
+
+    if (ligMoved.hastranslation)
+    {
+        // force reduction, as in Trans()
+        const dbl flim = 1.0e18;
+        for (uint i=0; i<3; i++)
+        {
+            dbl fbetr=ftr1*ftr1 +ftr2*ftr2 +ftr3*ftr3;
+            if (fbetr > flim)
+            {
+                ftr1=.01*ftr1;
+                ftr2=.01*ftr2;
+                ftr3=.01*ftr3;
+            }
+        }
+
+        assert(shift+2 < delta.size());
+        delta[0+shift]=ftr1;
+        delta[1+shift]=ftr2;
+        delta[2+shift]=ftr3;
+    }
+}
+
+
+
 void BaseAttractForceField::Rota(uint molIndex, dbl phi,dbl ssi, dbl rot, Vdouble & delta,uint shift, bool print)
 {
 // molIndex is the index of the protein we want to extract the average
@@ -701,7 +1197,126 @@ void BaseAttractForceField::AddLigand(AttractRigidbody & lig)
     m_movedligand.push_back(lig);
     centeredlig.CenterToOrigin();
     m_centeredligand.push_back(centeredlig);
+    m_recindex.push_back(ReceptorIndex());
+    m_recgrid.push_back(ReceptorGrid());
+
+}
+
+
+/*! \brief moves ligand i to a new starting position
+*
+*  'lig' must have the same atoms (number, types and charges) as ligand i,
+*  otherwise std::invalid_argument is thrown. The ligands copies, pairlists
+*  and buffers of the forcefield are reused: only coordinates are copied.
+*  All ligands are put back to their starting positions and the pairlists
+*  are updated, so that a minimizer can be run again on this forcefield.
+*/
+void BaseAttractForceField::ResetLigand(uint i, const AttractRigidbody & lig)
+{
+    if (i >= m_movedligand.size())
+        throw std::out_of_range("ResetLigand: no such ligand");
+    if (lig.Size() != m_movedligand[i].Size())
+        throw std::invalid_argument("ResetLigand: the new ligand has a different number of atoms");
+    if (lig.getAtomTypeNumbers() != m_movedligand[i].getAtomTypeNumbers() || lig.getCharges() != m_movedligand[i].getCharges())
+        throw std::invalid_argument("ResetLigand: the new ligand has different atom types or charges");
+    if (m_recindex[i].IsValid() || m_recgrid[i].IsValid())
+        throw std::invalid_argument("ResetLigand: cannot move a ligand with a spatial index or a grid");
+
+    m_centeredligand[i].SetCoordsFrom(lig);
+    m_ligcenter[i] = lig.FindCenter();
+    m_centeredligand[i].CenterToOrigin();
+    m_centeredligand[i].hasrotation = lig.hasrotation;
+    m_centeredligand[i].hastranslation = lig.hastranslation;
+    m_movedligand[i].hasrotation = lig.hasrotation;
+    m_movedligand[i].hastranslation = lig.hastranslation;
+
+    //back to the starting positions (MakePairLists() expects them)
+    for (uint j=0; j < m_movedligand.size(); j++)
+    {
+        if (j == i)
+        {
+            m_movedligand[i].SetCoordsFrom(lig);
+        }
+        else
+        {
+            m_movedligand[j].SetCoordsFrom(m_centeredligand[j]);
+            m_movedligand[j].Translate(m_ligcenter[j]);
+        }
+    }
 
+    const uint nlig = m_movedligand.size();
+    if (m_pairlists.size() == (nlig*(nlig-1))/2)
+    {
+        if (m_skin > 0.0 && m_listpositions.size() != nlig)
+        {
+            //the skin was set after the pairlists were built: build them again with it
+            MakePairLists();
+        }
+        else
+        {
+            //the pairlists point to m_movedligand: update them in place
+            for (uint k=0; k < m_pairlists.size(); k++)
+                m_pairlists[k].update();
+
+            if (m_skin > 0.0)
+                for (uint j=0; j < nlig; j++)
+                    for (uint k=0; k < m_listpositions[j].size(); k++)
+                        m_movedligand[j].unsafeGetCoords(k, m_listpositions[j][k]);
+        }
+    }
+    m_pairlistupdates = 0;
+}
+
+
+
+/*! \brief add a fixed ligand along with its spatial index
+*
+*  The index is used to build the pairlists in which this ligand is the
+*  receptor. It is only valid for a ligand which does not move,
+*  so rotations and translations must have been disabled.
+*/
+void BaseAttractForceField::AddLigand(AttractRigidbody & lig, const ReceptorIndex & index)
+{
+    if (lig.hasrotation || lig.hastranslation)
+        throw std::invalid_argument("AddLigand: a ligand with a spatial index must have rotation and translation disabled");
+    if (index.Size() != lig.Size())
+        throw std::invalid_argument("AddLigand: the spatial index does not match the ligand");
+
+    AddLigand(lig);
+    m_recindex.back() = index;
+}
+
+
+/*! \brief add a fixed ligand whose interactions are given by precomputed grids
+*
+*  The interactions of the other ligands with this one are then interpolated
+*  from the grid (no pairlist), at a cost which only depends on their size.
+*  No force is computed on the gridded ligand: it must not move, and the grid
+*  must have been computed at its current position with the parameters of
+*  this forcefield.
+*/
+void BaseAttractForceField::AddLigand(AttractRigidbody & lig, const ReceptorGrid & grid)
+{
+    if (lig.hasrotation || lig.hastranslation)
+        throw std::invalid_argument("AddLigand: a ligand with a grid must have rotation and translation disabled");
+    if (grid.ReceptorSize() != lig.Size())
+        throw std::invalid_argument("AddLigand: the grid does not match the ligand");
+    if (grid.GetNumberOfTypes() != numberOfTypes() || grid.GetParamsHash() != m_paramshash)
+        throw std::invalid_argument("AddLigand: the grid was not computed with parameters of this forcefield");
+    if (fabs(real(grid.GetCutoff() - m_cutoff)) > 1e-6)
+        throw std::invalid_argument("AddLigand: the grid was not computed with the cutoff of this forcefield");
+
+    AddLigand(lig);
+    m_recgrid.back() = grid;
+}
+
+
+dbl BaseAttractForceField::gridEnergy(AttractRigidbody & lig, const ReceptorGrid & grid)
+{
+    m_forcelig.assign(lig.Size(), Coord3D());
+    dbl ener = grid.Interpolate(lig, m_forcelig, m_vdw, m_elec);
+    lig.addForces(m_forcelig);
+    return ener;
 }
 
 
@@ -711,14 +1326,91 @@ void BaseAttractForceField::MakePairLists()
 //at this point we expect that m_movedligand still contains original coordinates of all ligands
 //(ie not centered) because we will generate the pairlist from this vector (list)
 
+    m_pairlists.clear();
 
 //creates the pairlist: loop over all pairs of ligands
     for (uint i=0; i < m_movedligand.size(); i++)
         for (uint j=i+1; j<m_movedligand.size(); j++)
         {
-            AttractPairList plist(m_movedligand[i], m_movedligand[j], m_cutoff);
-            m_pairlists.push_back(plist);
+            if (m_recgrid[i].IsValid() || m_recgrid[j].IsValid())
+                m_pairlists.push_back(AttractPairList()); //interactions read from a grid
+            else if (m_recindex[i].IsValid())
+                m_pairlists.push_back(AttractPairList(m_movedligand[i], m_movedligand[j], m_recindex[i], m_cutoff, m_skin));
+            else
+                m_pairlists.push_back(AttractPairList(m_movedligand[i], m_movedligand[j], m_cutoff, m_skin));
+        }
+
+//with a skin, keep the positions used to build the lists to know when to update them
+    m_listpositions.clear();
+    if (m_skin > 0.0)
+    {
+        m_listpositions.resize(m_movedligand.size());
+        for (uint i=0; i < m_movedligand.size(); i++)
+        {
+            std::vector<Coord3D> & positions = m_listpositions[i];
+            positions.resize(m_movedligand[i].Size());
+            for (uint k=0; k < positions.size(); k++)
+                positions[k] = m_movedligand[i].GetCoords(k);
         }
+    }
+
+}
+
+
+
+/*! \brief Verlet skin criterion
+*
+*   A pairlist between ligands i and j stays valid as long as none of the two
+*   molecules has an atom that moved by more than skin/2 since the positions
+*   recorded at the last update. Only the outdated pairlists are updated.
+*/
+void BaseAttractForceField::checkPairLists()
+{
+    const uint nlig = m_movedligand.size();
+    if (m_listpositions.size() != nlig) return;
+
+    const dbl halfskin2 = 0.25*m_skin*m_skin;
+
+    std::vector<bool> & moved = m_ligmoved;
+    moved.assign(nlig, false);
+    for (uint i=0; i<nlig; i++)
+    {
+        AttractRigidbody & lig = m_movedligand[i];
+        if (!(lig.hasrotation || lig.hastranslation)) continue;
+
+        const std::vector<Coord3D> & positions = m_listpositions[i];
+        lig.syncCoords();
+        Coord3D co;
+        for (uint k=0; k<positions.size(); k++)
+        {
+            lig.unsafeGetCoords(k, co);
+            if (Norm2(co - positions[k]) > halfskin2)
+            {
+                moved[i] = true;
+                break;
+            }
+        }
+    }
+
+    uint plistnumber = 0;
+    for (uint i=0; i<nlig; i++)
+        for (uint j=i+1; j<nlig; j++)
+        {
+            if (moved[i] || moved[j])
+            {
+                m_pairlists[plistnumber].update();
+                m_pairlistupdates++;
+            }
+            plistnumber++;
+        }
+
+    for (uint i=0; i<nlig; i++)
+    {
+        if (!moved[i]) continue;
+        std::vector<Coord3D> & positions = m_listpositions[i];
+        for (uint k=0; k<positions.size(); k++)
+            m_movedligand[i].unsafeGetCoords(k, positions[k]);
+    }
 
 }
 
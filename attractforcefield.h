@@ -2,6 +2,9 @@
 #define ATTRACTFORCEFIELD_H
 
 #include "forcefield.h"
+#include "receptorgrid.h"
+
+#include <boost/shared_ptr.hpp>
 
 
 namespace PTools{
@@ -19,16 +22,29 @@ class BaseAttractForceField: public ForceField
 
 public:
 
+    BaseAttractForceField(): m_skin(0.0), m_pairlistupdates(0), m_paramsid(0), m_paramshash(0), m_numthreads(1) {};
+
     ///called before every minimization by the minimizer (Lbfgs)
     virtual void initMinimization();
     ///analytical derivative
     void Derivatives(const Vdouble&, Vdouble&);
     uint ProblemSize();
     dbl Function(const Vdouble&);
+    ///energy and analytical derivatives in a single pass (used by Lbfgs)
+    dbl Evaluate(const Vdouble& stateVars, Vdouble& delta);
 
     ///add a new ligand to the ligand list...
     void AddLigand(AttractRigidbody & lig);
 
+    ///add a fixed ligand (typically the receptor) with a prebuilt spatial index shared between forcefields
+    void AddLigand(AttractRigidbody & lig, const ReceptorIndex & index);
+
+    ///add a fixed ligand (typically the receptor) whose interactions are read from precomputed potential grids (computed with the parameters file and the cutoff of this forcefield)
+    void AddLigand(AttractRigidbody & lig, const ReceptorGrid & grid);
+
+    ///set a new starting position for ligand 'i', reusing all the forcefield storage
+    void ResetLigand(uint i, const AttractRigidbody & lig);
+
     ///after a minimization, get minimized ligand 'i'
     AttractRigidbody GetLigand(uint i);
 
@@ -47,8 +63,20 @@ public:
         return ener;
     }
 
+    ///energy of a receptor/ligand pair (atoms closer than cutoff), without forces nor pairlist
+    dbl ScoreEnergy(const AttractRigidbody& rec, const AttractRigidbody& lig, dbl cutoff);
+
+    ///same as above, with a prebuilt index of the receptor
+    dbl ScoreEnergy(const AttractRigidbody& rec, const ReceptorIndex& index, const AttractRigidbody& lig, dbl cutoff);
+
     ///non-bonded interactions, forces are returned separately
-    virtual dbl nonbon8_forces(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, bool print=false)=0;
+    virtual dbl nonbon8_forces(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, bool print=false);
+
+    ///set the number of threads for the non-bonded interactions (requires OpenMP, default: 1)
+    void setNumThreads(uint nthreads);
+
+    ///return the number of threads for the non-bonded interactions
+    uint getNumThreads(){return m_numthreads;}
 
     virtual ~BaseAttractForceField(){};
 
@@ -59,12 +87,24 @@ public:
     ///rotational derivatives
     void Rota(uint molIndex, dbl phi, dbl ssi, dbl rot, Vdouble& delta, uint shift, bool print=false);
 
+    ///rotational and translational derivatives of a ligand in one loop over its atoms
+    void RotaTrans(uint molIndex, const Vdouble& stateVars, Vdouble& delta, uint shift);
+
     ///return van der waals energy
     dbl getVdw(){return m_vdw;}
 
     ///coulomb (electrostatic) energy
     dbl getCoulomb(){return m_elec;}
 
+    ///set the Verlet skin: pairlists are built at cutoff+skin and updated when a ligand moved by more than skin/2 (0: pairlists are never updated)
+    void setSkin(dbl skin){m_skin = skin;}
+
+    ///return the Verlet skin
+    dbl getSkin(){return m_skin;}
+
+    ///number of pairlists updates since the beginning of the last minimization
+    uint getPairListUpdates(){return m_pairlistupdates;}
+
 
 
 protected:
@@ -74,51 +114,114 @@ protected:
     std::vector<AttractRigidbody> m_centeredligand; ///< array of ligands with their centroid at O (required for Euler rotations)
     std::vector<AttractRigidbody> m_movedligand;
     std::vector<Coord3D> m_ligcenter; ///< list of ligands centroids before centering.
+    std::vector<ReceptorIndex> m_recindex; ///< spatial index of each ligand (empty if none was provided)
+    std::vector<ReceptorGrid> m_recgrid; ///< potential grids of each ligand (empty if none was provided)
     dbl m_cutoff; ///< cutoff for the pairlist generation
+    dbl m_skin; ///< Verlet skin added to the cutoff for the pairlist generation
+
+    std::vector<std::vector<Coord3D> > m_listpositions; ///< ligands atoms positions at the last pairlist update (only with a skin)
+    uint m_pairlistupdates; ///< number of pairlists updates during the current minimization
+
+    uint m_paramsid; ///< identifier of the current parameters (see PairParams)
+    uint m_paramshash; ///< hash of the current parameters file (identifies them in grid files)
+    uint m_numthreads; ///< number of threads for the non-bonded interactions
+    std::vector<std::vector<Coord3D> > m_threadforcerec; ///< per-thread receptor forces buffers
+    std::vector<std::vector<Coord3D> > m_threadforcelig; ///< per-thread ligand forces buffers
+    std::vector<dbl> m_threadvdw; ///< per-thread LJ energies
+    std::vector<dbl> m_threadelec; ///< per-thread electrostatic energies
+    std::vector<Coord3D> m_forcerec; ///< receptor forces buffer of Function()
+    std::vector<Coord3D> m_forcelig; ///< ligand forces buffer of Function()
+    std::vector<bool> m_ligmoved; ///< ligands which moved out of their skin (checkPairLists())
 
     dbl m_vdw; ///< van der waals energy
     dbl m_elec; ///< electrostatic energy
 
 
-    
+    ///energy (vdw and elec) and forces of the pairs [first, last[ of a pairlist. Coordinates must be synchronized.
+    virtual void nonbon8_range(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, uint first, uint last, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, dbl& vdw, dbl& elec)=0;
+
+    ///fill the parameters cache of a pairlist
+    virtual void cachePairParams(const AttractRigidbody& rec, const AttractRigidbody& lig, AttractPairList & pairlist)=0;
+
+    ///LJ energy between a receptor atom of type rectype and a ligand atom of type ligtype at a square distance r2 (for grids)
+    virtual dbl pairVdw(uint rectype, uint ligtype, dbl r2) const =0;
+
+    ///constant k of the electrostatic energy k*qr*ql/r^2
+    virtual dbl elecConstant() const =0;
+
+    ///electrostatic energy between two charges qr and ql, rr2 being 1/r^2
+    virtual dbl pairElec(dbl qr, dbl ql, dbl rr2) const =0;
+
+    ///number of atom types described by the parameters
+    virtual uint numberOfTypes() const =0;
+
 
 
 private:
     //private functions members:
 
+    ///update the pairlists of the ligands which moved by more than skin/2
+    void checkPairLists();
+
+    ///interaction energy of a ligand with a receptor grid
+    dbl gridEnergy(AttractRigidbody & lig, const ReceptorGrid & grid);
+
 
     ///set list of ignored atom types (dummy atoms)
     virtual void setDummyTypeList(AttractRigidbody& lig)=0;
 
+    friend class ReceptorGrid;
+    friend class BatchScorer;
 
 };
 
 
 
+/*! \brief Attract ForceField1 parameters
+*
+*   Read-only once loaded: shared between all the forcefields built from the same file
+*/
+struct AttFF1_params
+{
+    uint paramsid; ///< identifier of this set of parameters (see PairParams)
+    uint paramshash; ///< FNV-1a hash of the parameters file content (same for all the processes)
+
+    Vdouble rad ; //Ri LJ (8,6) parameter
+    Vdouble amp ; //Ai LJ (8,6) parameter
+    // rad and amp are the Ri (in Angstrom) and Ai (in [RT]^1/2) Lennard-Jones (8,6) parameters respectively as described in M. Zacharias Prot. Sci. 2003, 12, 1271-1282.
+
+
+    dbl rc[64][64]; //some pre-calculated results
+    dbl ac[64][64]; //some pre-calculated results
+    // rc[i][j] and ac[i][j] are the pre-calculated repulsive (Bij) and attractive (Cij) pair-wise interactions between pseudo atom i and j at a distance rij calculated from: Eij= [Bij/(rij)^8 - Cij/(rij)^6] with Bij = AiAj(Ri+Rj)^8 and Cij = AiAj(Ri+Rj)^6
+};
+
+
+
 class AttractForceField1: public BaseAttractForceField
 {
 public:
     void InitParams(const std::string & paramsFileName);
     AttractForceField1(std::string paramsFileName, dbl cutoff);
-    dbl nonbon8_forces(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, bool print=false);
 
     virtual ~AttractForceField1(){};
 private:
 
-    Vdouble m_rad ; //Ri LJ (8,6) parameter
-    Vdouble m_amp ; //Ai LJ (8,6) parameter
-    // m_rad and m_amp are the Ri (in Angstrom) and Ai (in [RT]^1/2) Lennard-Jones (8,6) parameters respectively as described in M. Zacharias Prot. Sci. 2003, 12, 1271-1282.
-
-
-    dbl m_rc[64][64]; //some pre-calculated results
-    dbl m_ac[64][64]; //some pre-calculated results
-    // m_rc[i][j] and m_ac[i][j] are the pre-calculated repulsive (Bij) and attractive (Cij) pair-wise interactions between pseudo atom i and j at a distance rij calculated from: Eij= [Bij/(rij)^8 - Cij/(rij)^6] with Bij = AiAj(Ri+Rj)^8 and Cij = AiAj(Ri+Rj)^6
+    boost::shared_ptr<const AttFF1_params> m_params; ///< parameters (shared with other forcefields)
 
     int m_ligRestraintIndex;
 
     dbl m_rstk;
 
     void setDummyTypeList(AttractRigidbody& lig){std::vector<uint> dummytypes; lig.setDummyTypes(dummytypes);}; //forcefield1 has no dummy type
+
+    void nonbon8_range(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, uint first, uint last, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, dbl& vdw, dbl& elec);
+    void cachePairParams(const AttractRigidbody& rec, const AttractRigidbody& lig, AttractPairList & pairlist);
+
+    dbl pairVdw(uint rectype, uint ligtype, dbl r2) const;
+    dbl elecConstant() const {return 332.053986/20.0;};
+    dbl pairElec(dbl qr, dbl ql, dbl rr2) const {return qr*ql*(332.053986/20.0)*rr2;};
+    uint numberOfTypes() const {return m_params->rad.size();};
 };
 
 
@@ -163,9 +266,13 @@ class TestForceField: public ForceField
 
 /*! \brief Attract ForceField2 parameters
 *
+*   Read-only once loaded: shared between all the forcefields built from the same file
 */
 struct AttFF2_params
 {
+    uint paramsid; ///< identifier of this set of parameters (see PairParams)
+    uint paramshash; ///< FNV-1a hash of the parameters file content (same for all the processes)
+
     int ipon[31][31];  // flag to switch between saddle point and "normal" minimum curve of the LJ potential.
 
     dbl rc[31][31];  // some pre-calculated results equal to abc[i][j]*rbc[i][j]^8
@@ -199,7 +306,6 @@ class AttractForceField2 : public BaseAttractForceField
 public:
 
     AttractForceField2(const std::string & paramsFileName, dbl cutoff);
-    dbl nonbon8_forces(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, bool print=false);
 
     ///allows to reload a file of parameters
     void reloadParams(const std::string & filename, dbl cutoff);
@@ -212,6 +318,15 @@ private:
 
     virtual void setDummyTypeList(AttractRigidbody& lig);
     std::string m_filename;   ///< name of parameter file
+    boost::shared_ptr<const AttFF2_params> m_params; ///< parameters (shared with other forcefields)
+
+    void nonbon8_range(AttractRigidbody& rec, AttractRigidbody& lig, AttractPairList & pairlist, uint first, uint last, std::vector<Coord3D>& forcerec, std::vector<Coord3D>& forcelig, dbl& vdw, dbl& elec);
+    void cachePairParams(const AttractRigidbody& rec, const AttractRigidbody& lig, AttractPairList & pairlist);
+
+    dbl pairVdw(uint rectype, uint ligtype, dbl r2) const;
+    dbl elecConstant() const {return 332.053986/15.0;};
+    dbl pairElec(dbl qr, dbl ql, dbl rr2) const {dbl et = qr*ql*rr2; return et*(332.053986/15.0);};
+    uint numberOfTypes() const {return 31;};
 
 
 
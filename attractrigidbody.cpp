@@ -41,19 +41,13 @@ this->init_();
 
 void AttractRigidbody::init_()
 {
-    // extracts the "extra" field of Atoms to the m_atomTypeNumber array:
-    uint   atcategory  = 0;
-    dbl  atcharge   = 0.0;
-
+    // extracts the "extra" field of Atoms to the m_atomTypeNumber array
+    // (the category and charge are read once per distinct extra string):
     for (uint i = 0; i < Size() ; ++i)
     {
-        Atomproperty & at (mAtomProp[i]);
-        std::string extra = at.GetExtra();
-
-        std::istringstream iss( extra );
-        iss >> atcategory >> atcharge ;
-        m_atomTypeNumber.push_back(atcategory-1);  // -1 to directly use the atomTypeNumber into C-array
-        m_charge.push_back(atcharge);
+        const Atomproperty & at (atomProp()[i]);
+        m_atomTypeNumber.push_back(at.GetExtraCategory()-1);  // -1 to directly use the atomTypeNumber into C-array
+        m_charge.push_back(at.GetExtraCharge());
 
     }
 
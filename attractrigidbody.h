@@ -56,6 +56,10 @@ public:
         return m_charge[i];
     };
 
+    const std::vector<uint> & getAtomTypeNumbers() const {return m_atomTypeNumber;} ///< atom types of all atoms
+    const std::vector<dbl> & getCharges() const {return m_charge;} ///< charges of all atoms
+    const std::vector<Coord3D> & getForces() const {return m_forces;} ///< forces of the last forcefield evaluation
+
     virtual bool isAtomActive(uint i) const {
 
        uint atomtype = this->m_atomTypeNumber[i];
@@ -68,7 +72,7 @@ public:
 
     void resetForces()
     {
-        m_forces = std::vector<Coord3D> (this->Size() ) ;
+        m_forces.assign(this->Size(), Coord3D()); //keeps the storage
     }
 
     void addForces(const std::vector<Coord3D>& forces)
@@ -0,0 +1,199 @@
+#include "batchscorer.h"
+#include "geometry.h"
+#include "pairlist.h"
+
+#include <cmath>
+#include <stdexcept>
+
+
+namespace PTools
+{
+
+
+BatchScorer::BatchScorer(const AttractRigidbody & receptor, const AttractRigidbody & ligand, BaseAttractForceField & ff, dbl cutoff)
+    : m_receptor(receptor), m_ligand(ligand), m_centered(ligand), m_pose(ligand),
+      m_ff(ff), m_cutoff(cutoff), m_matrix(4, 4)
+{
+    if (real(cutoff) <= 0.0)
+        throw std::invalid_argument("BatchScorer: cutoff must be positive");
+    if (ligand.Size() == 0)
+        throw std::invalid_argument("BatchScorer: empty ligand");
+
+    //the forcefield ignores its dummy atom types, as in AddLigand()
+    m_ff.setDummyTypeList(m_receptor);
+    m_ff.setDummyTypeList(m_ligand);
+    m_ff.setDummyTypeList(m_centered);
+    m_ff.setDummyTypeList(m_pose);
+
+    m_index = ReceptorIndex(m_receptor, cutoff * (1.0 + 1e-6) + 1e-6);
+    m_center = m_ligand.FindCenter();
+    m_centered.CenterToOrigin();
+}
+
+
+dbl BatchScorer::ScoreEuler(const Vdouble & pose)
+{
+    if (pose.size() != 6)
+        throw std::invalid_argument("BatchScorer: an Euler pose has 6 values");
+    double values[6];
+    for (uint k=0; k<6; k++) values[k] = real(pose[k]);
+    double ener;
+    Score(values, 1, 6, &ener);
+    return ener;
+}
+
+
+dbl BatchScorer::ScoreMatrix(const Matrix & pose)
+{
+    Matrix shared(pose); //shares the data, getDim() is not const
+    if (shared.getDim().first != 4 || shared.getDim().second != 4)
+        throw std::invalid_argument("BatchScorer: a matrix pose must be 4x4");
+    double values[16];
+    for (uint i=0; i<4; i++)
+        for (uint j=0; j<4; j++)
+            values[4*i+j] = real(pose(i,j));
+    double ener;
+    Score(values, 1, 16, &ener);
+    return ener;
+}
+
+
+void BatchScorer::Score(const double * poses, uint n, uint posesize, double * energies,
+                        double * vdw, double * elec, double * gradients)
+{
+    if (posesize != 6 && posesize != 16)
+        throw std::invalid_argument("BatchScorer: poses must be 4x4 matrices (16 values) or Euler variables (6 values)");
+
+    for (uint p=0; p<n; p++)
+    {
+        const double * pose = poses + p*posesize;
+        dbl pvdw, pelec;
+        double * gradient = gradients ? gradients + 6*p : 0;
+        energies[p] = real(scorePose(pvdw, pelec, gradient, posesize == 6, pose));
+        if (vdw) vdw[p] = real(pvdw);
+        if (elec) elec[p] = real(pelec);
+    }
+}
+
+
+///moves the working ligand as Function() does for (phi, ssi, rot, tx, ty, tz)
+void BatchScorer::placeEuler(const double * pose)
+{
+    m_pose.SetMatrixFrom(m_centered);
+    m_pose.AttractEulerRotate(pose[0], pose[1], pose[2]);
+    m_pose.Translate(m_center);
+    m_pose.Translate(Coord3D(pose[3], pose[4], pose[5]));
+}
+
+
+void BatchScorer::placeMatrix(const double * pose)
+{
+    for (uint i=0; i<4; i++)
+        for (uint j=0; j<4; j++)
+            m_matrix(i,j) = pose[4*i+j];
+    m_pose.SetMatrixFrom(m_ligand);
+    m_pose.ApplyMatrix(m_matrix);
+}
+
+
+dbl BatchScorer::scorePose(dbl & vdw, dbl & elec, double * gradient, bool euler, const double * pose)
+{
+    if (euler) placeEuler(pose);
+    else placeMatrix(pose);
+
+    if (!gradient)
+    {
+        dbl ener = m_ff.ScoreEnergy(m_receptor, m_index, m_pose, m_cutoff);
+        vdw = m_ff.getVdw();
+        elec = m_ff.getCoulomb();
+        return ener;
+    }
+
+    AttractPairList pairlist(m_receptor, m_pose, m_index, m_cutoff);
+    m_forcerec.assign(m_receptor.Size(), Coord3D());
+    m_forcelig.assign(m_pose.Size(), Coord3D());
+    dbl ener = m_ff.nonbon8_forces(m_receptor, m_pose, pairlist, m_forcerec, m_forcelig);
+    vdw = m_ff.getVdw();
+    elec = m_ff.getCoulomb();
+
+    //m_forcelig holds the gradient of the energy with respect to each atom
+    Coord3D sumg;
+    if (euler)
+    {
+        //dE/dangle = sum over atoms of g.(dR/dangle p), with p the centered
+        //coordinates: only S[a][b] = sum(g[a]*p[b]) is needed
+        dbl S[3][3] = {{0.0, 0.0, 0.0}, {0.0, 0.0, 0.0}, {0.0, 0.0, 0.0}};
+        Coord3D p;
+        m_centered.syncCoords();
+        for (uint i=0; i<m_pose.Size(); i++)
+        {
+            const Coord3D & g = m_forcelig[i];
+            sumg += g;
+            m_centered.unsafeGetCoords(i, p);
+            S[0][0] += g.x*p.x; S[0][1] += g.x*p.y; S[0][2] += g.x*p.z;
+            S[1][0] += g.y*p.x; S[1][1] += g.y*p.y; S[1][2] += g.y*p.z;
+            S[2][0] += g.z*p.x; S[2][1] += g.z*p.y; S[2][2] += g.z*p.z;
+        }
+
+        //derivatives of the rotation matrix of CoordsArray::AttractEulerRotate
+        const dbl cs=cos(pose[1]), ss=sin(pose[1]);
+        const dbl cp=cos(pose[0]), sp=sin(pose[0]);
+        const dbl crot=cos(pose[2]), srot=sin(pose[2]);
+        const dbl dR[3][3][3] = {
+            { //phi
+                {-crot*cs*sp + srot*cp, -srot*cs*sp - crot*cp, -ss*sp},
+                { crot*cs*cp + srot*sp,  srot*cs*cp - crot*sp,  ss*cp},
+                { 0.0, 0.0, 0.0}
+            },
+            { //ssi
+                {-crot*ss*cp, -srot*ss*cp, cs*cp},
+                {-crot*ss*sp, -srot*ss*sp, cs*sp},
+                {-crot*cs,    -srot*cs,    -ss}
+            },
+            { //rot
+                {-srot*cs*cp + crot*sp,  crot*cs*cp + srot*sp, 0.0},
+                {-srot*cs*sp - crot*cp,  crot*cs*sp - srot*cp, 0.0},
+                { srot*ss,              -crot*ss,              0.0}
+            }
+        };
+
+        for (uint k=0; k<3; k++)
+        {
+            dbl d = 0.0;
+            for (uint a=0; a<3; a++)
+                for (uint b=0; b<3; b++)
+                    d += dR[k][a][b]*S[a][b];
+            gradient[k] = real(d);
+        }
+    }
+    else
+    {
+        //torque around the center of the posed ligand
+        Coord3D sumr, sumrxg, rxg, r;
+        m_pose.syncCoords();
+        for (uint i=0; i<m_pose.Size(); i++)
+        {
+            const Coord3D & g = m_forcelig[i];
+            m_pose.unsafeGetCoords(i, r);
+            VectProd(r, g, rxg);
+            sumr += r;
+            sumg += g;
+            sumrxg += rxg;
+        }
+        Coord3D cxg;
+        VectProd(sumr / (dbl) m_pose.Size(), sumg, cxg);
+        gradient[0] = real(sumrxg.x - cxg.x);
+        gradient[1] = real(sumrxg.y - cxg.y);
+        gradient[2] = real(sumrxg.z - cxg.z);
+    }
+
+    gradient[3] = real(sumg.x);
+    gradient[4] = real(sumg.y);
+    gradient[5] = real(sumg.z);
+
+    return ener;
+}
+
+
+
+}//namespace PTools
@@ -0,0 +1,85 @@
+#ifndef BATCHSCORER_H
+#define BATCHSCORER_H
+
+#include "attractrigidbody.h"
+#include "attractforcefield.h"
+#include "receptorindex.h"
+
+
+namespace PTools
+{
+
+
+/*! \brief Energies of many poses of a ligand against a fixed receptor
+*
+*   The receptor is indexed once and a single working copy of the ligand is
+*   moved to each pose, so that no object has to be built per pose.
+*   Poses are given in flat arrays (row-major), either as 4x4 matrices
+*   applied to the ligand coordinates or as Attract variables
+*   (phi, ssi, rot, tx, ty, tz), the same as a forcefield with one fixed
+*   receptor and one mobile ligand.
+*
+*   Gradients have 6 components per pose:
+*    - Euler poses: derivatives with respect to the 6 variables
+*    - matrix poses: torque around the ligand center then net force,
+*      i.e. derivatives with respect to an infinitesimal rotation of the
+*      posed ligand around its center and to a translation.
+*
+*   Without gradients, energies are streamed from the receptor index as in
+*   BaseAttractForceField::ScoreEnergy(). With gradients a pairlist is built
+*   for each pose (energies equal to nonbon8() with that cutoff).
+*
+*   The scorer uses the forcefield given to the constructor: it must not be
+*   used elsewhere while poses are scored.
+*/
+class BatchScorer
+{
+public:
+    BatchScorer(const AttractRigidbody & receptor, const AttractRigidbody & ligand, BaseAttractForceField & ff, dbl cutoff);
+
+    uint ReceptorSize() const {return m_receptor.Size();}; ///< number of receptor atoms
+    uint LigandSize() const {return m_ligand.Size();}; ///< number of ligand atoms
+    dbl GetCutoff() const {return m_cutoff;}; ///< interaction cutoff
+
+    ///energy of a single Euler pose (phi, ssi, rot, tx, ty, tz)
+    dbl ScoreEuler(const Vdouble & pose);
+
+    ///energy of a single pose given as a 4x4 matrix
+    dbl ScoreMatrix(const Matrix & pose);
+
+    /*! \brief scores n poses stored contiguously in 'poses'
+    *
+    *   'posesize' is 16 for 4x4 matrices and 6 for Euler variables.
+    *   'energies' receives n values. 'vdw' and 'elec' (n values) and
+    *   'gradients' (6*n values) may be null when they are not wanted.
+    */
+    void Score(const double * poses, uint n, uint posesize, double * energies,
+               double * vdw=0, double * elec=0, double * gradients=0);
+
+
+private:
+
+    void placeEuler(const double * pose);
+    void placeMatrix(const double * pose);
+    dbl scorePose(dbl & vdw, dbl & elec, double * gradient, bool euler, const double * pose);
+
+    AttractRigidbody m_receptor;
+    AttractRigidbody m_ligand; ///< ligand at its input position
+    AttractRigidbody m_centered; ///< ligand centered on the origin
+    AttractRigidbody m_pose; ///< working copy moved to each pose
+    Coord3D m_center; ///< center of the input ligand
+    ReceptorIndex m_index;
+    BaseAttractForceField & m_ff;
+    dbl m_cutoff;
+
+    Matrix m_matrix; ///< 4x4 scratch matrix
+    std::vector<Coord3D> m_forcerec;
+    std::vector<Coord3D> m_forcelig;
+
+};
+
+
+
+}//namespace PTools
+
+#endif
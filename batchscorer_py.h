@@ -0,0 +1,79 @@
+//
+// Python (numpy) front-end of BatchScorer, included by the Py++ generated bindings only
+//
+
+#ifndef BATCHSCORER_PY_H
+#define BATCHSCORER_PY_H
+
+#include "py_numpy.h"
+#include "batchscorer.h"
+
+
+namespace PTools
+{
+
+
+/*! \brief scores a (N,4,4) or (N,6) array of poses
+*
+*   returns the (N,) energies, or a tuple starting with the energies followed by
+*   the (N,) vdw and elec arrays if split is true, and by the (N,6) gradients
+*   if gradient is true. The Python lock is released during the calculation.
+*/
+inline boost::python::object BatchScorer_Score(BatchScorer & scorer, boost::python::object poses, bool split=false, bool gradient=false)
+{
+    namespace bp = boost::python;
+    bp::object numpy = bp::import("numpy");
+    bp::object array = numpy_float64(poses);
+
+    const int ndim = bp::extract<int>(array.attr("ndim"));
+    bp::object shape = array.attr("shape");
+    uint posesize = 0;
+    if (ndim == 3 && bp::extract<int>(shape[1]) == 4 && bp::extract<int>(shape[2]) == 4)
+        posesize = 16;
+    else if (ndim == 2 && bp::extract<int>(shape[1]) == 6)
+        posesize = 6;
+    else
+        throw std::invalid_argument("BatchScorer.Score: poses must be a (N,4,4) or a (N,6) array");
+    const uint n = bp::extract<uint>(shape[0]);
+
+    bp::object energies = numpy.attr("zeros")(n);
+    bp::object vdw, elec, gradients;
+    double * pvdw = 0;
+    double * pelec = 0;
+    double * pgradients = 0;
+    if (split)
+    {
+        vdw = numpy.attr("zeros")(n);
+        elec = numpy.attr("zeros")(n);
+        pvdw = (double *) numpy_data(vdw);
+        pelec = (double *) numpy_data(elec);
+    }
+    if (gradient)
+    {
+        gradients = numpy.attr("zeros")(bp::make_tuple(n, 6));
+        pgradients = (double *) numpy_data(gradients);
+    }
+
+    const double * pposes = (const double *) numpy_data(array);
+    double * penergies = (double *) numpy_data(energies);
+    {
+        ScopedGILRelease nogil;
+        scorer.Score(pposes, n, posesize, penergies, pvdw, pelec, pgradients);
+    }
+
+    if (!split && !gradient) return energies;
+    bp::list result;
+    result.append(energies);
+    if (split)
+    {
+        result.append(vdw);
+        result.append(elec);
+    }
+    if (gradient) result.append(gradients);
+    return bp::tuple(result);
+}
+
+
+}//namespace PTools
+
+#endif
@@ -28,7 +28,7 @@ namespace PTools{
 
 
 
-CoordsArray::CoordsArray()
+CoordsArray::CoordsArray(): _sharedcoords(0), _nshared(0)
 {
     for (uint i=0; i<4; i++)
         for (uint j=0; j<4; j++)
@@ -43,6 +43,9 @@ CoordsArray::CoordsArray()
 CoordsArray::CoordsArray(const CoordsArray & ca) //copy constructor
 {
     _refcoords   = ca._refcoords;
+    _sharedcoords = ca._sharedcoords;
+    _nshared = ca._nshared;
+    _sharedowner = ca._sharedowner;
     _movedcoords = ca._movedcoords;
 
     _modified();
@@ -90,6 +93,54 @@ void CoordsArray::ResetMatrix()
 
 
 
+void CoordsArray::SetMatrixFrom(const CoordsArray& ca)
+{
+    assert(Size() == ca.Size());
+    for (uint i=0; i<4; i++)
+        for (uint j=0; j<4; j++)
+            this->mat44[i][j]=ca.mat44[i][j];
+    _modified();  //moved coordinates are recomputed in place when needed
+}
+
+
+void CoordsArray::SetMatrix(const dbl mat[4][4], const Coord3D * rotated)
+{
+    for (uint i=0; i<4; i++)
+        for (uint j=0; j<4; j++)
+            mat44[i][j]=mat[i][j];
+
+    if (!rotated)
+    {
+        _modified();
+        return;
+    }
+
+    //same operations as matrix44xVect(), the rotation part being already done
+    _movedcoords.resize(Size());
+    for (uint k=0; k<_movedcoords.size(); k++)
+    {
+        _movedcoords[k].x = rotated[k].x + mat44[0][3];
+        _movedcoords[k].y = rotated[k].y + mat44[1][3];
+        _movedcoords[k].z = rotated[k].z + mat44[2][3];
+    }
+    _uptodate = true;
+    _getcoords = & CoordsArray::unsafeGetCoords;
+}
+
+
+void CoordsArray::RotateRefCoords(const dbl mat[4][4], Coord3D * out) const
+{
+    const Coord3D * refcoords = _refdata();
+    for (uint k=0; k<Size(); k++)
+    {
+        const Coord3D & vect = refcoords[k];
+        out[k].x = vect.x * mat[ 0 ][ 0 ] + vect.y * mat[ 0 ][ 1 ] + vect.z * mat[ 0 ][ 2 ];
+        out[k].y = vect.x * mat[ 1 ][ 0 ] + vect.y * mat[ 1 ][ 1 ] + vect.z * mat[ 1 ][ 2 ];
+        out[k].z = vect.x * mat[ 2 ][ 0 ] + vect.y * mat[ 2 ][ 1 ] + vect.z * mat[ 2 ][ 2 ];
+    }
+}
+
+
 std::string CoordsArray::PrintMatrix() const
 {
     std::string out;
@@ -144,40 +195,99 @@ void CoordsArray::GetCoords(const uint i, Coord3D& co)  const throw(std::out_of_
 };
 
 
-void CoordsArray::SetCoords(const uint k, const Coord3D& co)
+const VCoords & CoordsArray::GetMovedCoords() const
 {
-//sets the coordinate [i] to be 'co' after rotation/translation
+    Coord3D co;
+    if (Size() > 0) (*this.*_getcoords)(0, co); //synchronize
+    return _movedcoords;
+}
 
-Coord3D co2 (co);
 
-co2.x -= mat44[0][3];
-co2.y -= mat44[1][3];
-co2.z -= mat44[2][3];
+///inverse of the rotation/translation matrix (the rotation part is orthogonal)
+void CoordsArray::_inverseMatrix(dbl matinv[4][4]) const
+{
+    for(uint i=0; i<3; i++)
+        for(uint j=0; j<3;j++)
+            matinv[i][j]=mat44[j][i];
 
-dbl matinv[4][4]; //invert matrix
+    for(uint i=0; i<4; i++)
+    {
+        matinv[i][3]=0;
+        matinv[3][i]=0;
+    }
+    matinv[3][3]=1;
+}
 
 
-for(uint i=0; i<3; i++)
-  for(uint j=0; j<3;j++)
-    matinv[i][j]=mat44[j][i];
+void CoordsArray::SetAllCoords(const Coord3D * coords)
+{
+    //same as SetCoords() for each atom, with a single inversion of the matrix
+    dbl matinv[4][4];
+    _inverseMatrix(matinv);
+    const Coord3D tr(mat44[0][3], mat44[1][3], mat44[2][3]);
 
-for(uint i=0; i<4; i++)
- {
-   matinv[i][3]=0;
-   matinv[3][i]=0;
- }
-   matinv[3][3]=1;
+    _ownRefCoords();
+    for (uint k=0; k<Size(); k++)
+        PTools::matrix44xVect(matinv, coords[k] - tr, _refcoords[k]);
 
+    _modified();
+}
 
-Coord3D final;
 
+void CoordsArray::AddCoords(const VCoords & coords)
+{
+    _ownRefCoords();
+    _refcoords.insert(_refcoords.end(), coords.begin(), coords.end());
+    _movedcoords.insert(_movedcoords.end(), coords.begin(), coords.end());
+    _modified();
+}
 
-PTools::matrix44xVect(matinv,co2, final );
 
-_refcoords[k] = final;
-_modified();
+void CoordsArray::ShareCoords(const Coord3D * coords, uint n, boost::shared_ptr<const void> owner)
+{
+    if (Size() > 0 || n == 0)
+    {
+        AddCoords(VCoords(coords, coords + n));
+        return;
+    }
+    _sharedcoords = coords;
+    _nshared = n;
+    _sharedowner = owner;
+    _movedcoords.clear(); //sized and computed when needed
+    _modified();
+}
+
+
+void CoordsArray::_ownRefCoords()
+{
+    if (!_sharedcoords) return;
+    _refcoords.assign(_sharedcoords, _sharedcoords + _nshared);
+    _movedcoords.resize(_nshared);
+    _sharedcoords = 0;
+    _nshared = 0;
+    _sharedowner.reset();
+}
+
+
+void CoordsArray::SetCoords(const uint k, const Coord3D& co)
+{
+//sets the coordinate [i] to be 'co' after rotation/translation
+
+Coord3D co2 (co);
+
+co2.x -= mat44[0][3];
+co2.y -= mat44[1][3];
+co2.z -= mat44[2][3];
+
+dbl matinv[4][4]; //invert matrix
+_inverseMatrix(matinv);
 
+_ownRefCoords();
+PTools::matrix44xVect(matinv,co2, _refcoords[k] );
 
+//an up to date cache stays valid: only atom k is recomputed
+if (_uptodate)
+    matrix44xVect(mat44, _refcoords[k], _movedcoords[k]);
 }
 
 
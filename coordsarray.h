@@ -22,6 +22,7 @@
 
 #include <vector>
 #include<stdexcept>
+#include <boost/shared_ptr.hpp>
 
 
 #include "coord3d.h"
@@ -50,8 +51,11 @@ class CoordsArray
 private:  //private data
 
     /* don't forget the constructors if you add some private data ! */
-    VCoords _refcoords;
-    mutable VCoords _movedcoords;
+    VCoords _refcoords; ///< reference coordinates (unused while they are shared, see ShareCoords())
+    const Coord3D * _sharedcoords; ///< shared reference coordinates (0 if not shared)
+    uint _nshared; ///< number of shared reference coordinates
+    boost::shared_ptr<const void> _sharedowner; ///< keeps the shared reference coordinates alive
+    mutable VCoords _movedcoords; ///< moved coordinates (sized at the first synchronization)
     dbl mat44[4][4]; // 4x4 matrix
 
     mutable bool _uptodate ;
@@ -65,15 +69,24 @@ private: //private methods
 
 
 
+    void _inverseMatrix(dbl matinv[4][4]) const;
+
     void _modified() { _uptodate = false; _getcoords = & CoordsArray::_safegetcoords;  }; // call this function when _movedcoords needs an update before getting real coordinates
 
+    /// reference coordinates (shared or owned)
+    const Coord3D * _refdata() const {return _sharedcoords ? _sharedcoords : (_refcoords.empty() ? 0 : &_refcoords[0]);};
+
+    void _ownRefCoords(); // copies the shared reference coordinates before they are modified
+
     void _safegetcoords(const uint i, Coord3D& co) const {
 
-        assert(_refcoords.size() == _movedcoords.size());
+        const uint size = Size();
+        const Coord3D * refcoords = _refdata();
+        _movedcoords.resize(size);
 
-        for (uint j=0; j<_refcoords.size(); j++)
+        for (uint j=0; j<size; j++)
         {
-            matrix44xVect(mat44, _refcoords[j], _movedcoords[j]);
+            matrix44xVect(mat44, refcoords[j], _movedcoords[j]);
         }
 
         _uptodate = true;
@@ -94,14 +107,32 @@ public:
     /// get the cached coordinates. You must ensure that update() has been called first !
     void inline unsafeGetCoords(const uint i, Coord3D& co) const { co = _movedcoords[i];};
 
-    void AddCoord(const Coord3D& co) {_refcoords.push_back(co); _movedcoords.push_back(co);  _modified();  };
-    uint Size() const {return _refcoords.size();};
+    void AddCoord(const Coord3D& co) {_ownRefCoords(); _refcoords.push_back(co); _movedcoords.push_back(co);  _modified();  };
+    uint Size() const {return _sharedcoords ? _nshared : _refcoords.size();};
 
 
     void GetCoords(const uint i, Coord3D& co)  const throw(std::out_of_range) ;
 
     void SetCoords(const uint k, const Coord3D& co);
 
+    /// coordinates of all atoms after rotation/translation (the reference is invalidated when atoms are added)
+    const VCoords & GetMovedCoords() const;
+
+    /// set the coordinates of all atoms (Size() values) after rotation/translation
+    void SetAllCoords(const Coord3D * coords);
+
+    /// add several coordinates at once (same as AddCoord() for each of them)
+    void AddCoords(const VCoords & coords);
+
+    /*! \brief adds coordinates which stay in external memory
+    *
+    *   The n reference coordinates are read from 'coords' without being copied,
+    *   'owner' keeping this memory alive (copies of the array share it). They
+    *   are copied at their first modification: SetCoords(), SetAllCoords() or
+    *   added coordinates. The coordinates of a non-empty array are copied at once.
+    */
+    void ShareCoords(const Coord3D * coords, uint n, boost::shared_ptr<const void> owner);
+
     /// Translate the whole object
     void Translate(const Coord3D& tr);
      /// Euler Rotation
@@ -109,11 +140,26 @@ public:
 
     void ResetMatrix();
 
+    /// copy the rotation/translation matrix of another array with the same reference coordinates
+    void SetMatrixFrom(const CoordsArray& ca);
+
     std::string PrintMatrix() const;
 
     ///return the rotation/translation matrix
     Matrix GetMatrix() const;
 
+    /*! \brief replaces the rotation/translation matrix
+    *
+    *   'rotated' (optional, Size() values) are the reference coordinates
+    *   moved by the rotation part of 'mat' as given by RotateRefCoords():
+    *   the moved coordinates are then only translated, with the same
+    *   result as a multiplication by 'mat'.
+    */
+    void SetMatrix(const dbl mat[4][4], const Coord3D * rotated = 0);
+
+    /// reference coordinates moved by the rotation part of 'mat' ('out' receives Size() values)
+    void RotateRefCoords(const dbl mat[4][4], Coord3D * out) const;
+
 
 
 protected:
@@ -31,6 +31,14 @@ public:
         NumDerivatives(StateVars, delta, true);
     }
 
+    ///function value and its analytical derivatives at the same point
+    virtual dbl Evaluate(const Vdouble& StateVars, Vdouble& delta)
+    {
+        dbl ener = Function(StateVars);
+        Derivatives(StateVars, delta);
+        return ener;
+    }
+
     ///numerical derivative for testing purpose. Not very accurate
     virtual void NumDerivatives(const Vdouble& StateVars, Vdouble& delta, bool print=false);
 
@@ -29,6 +29,7 @@ normalize.call_policies = module_builder.call_policies.return_internal_reference
 
 coordsarray = mb.class_("CoordsArray")
 coordsarray.include()
+coordsarray.member_functions(lambda f: f.name in ("GetMovedCoords", "SetAllCoords", "SetMatrix", "RotateRefCoords", "ShareCoords")).exclude()
 #matrix44xVect = coordsarray.member_function
 
 
@@ -36,9 +37,26 @@ rigidbody = mb.class_("Rigidbody")
 #getatom = rigidbody.member_function("GetAtomReference")
 #getatom.call_policies = module_builder.call_policies.return_internal_reference()
 rigidbody.include()
+#arrays are exchanged with python as numpy arrays (see rigidbody_py.h):
+rigidbody.member_functions(lambda f: f.name in ("GetCoordsArray", "SetCoordsArray", "ApplyMatrixBatch", "atomProp", "mutableAtomProp", "AddAtom", "AddAtoms")).exclude()
+rigidbody.add_declaration_code('#include "rigidbody_py.h"')
+rigidbody.add_registration_code('def( "GetCoordsView", &PTools::Rigidbody_GetCoordsView )')
+rigidbody.add_registration_code('def( "GetResidIds", &PTools::Rigidbody_GetResidIds )')
+rigidbody.add_registration_code('def( "GetMatrixArray", &PTools::Rigidbody_GetMatrixArray )')
+rigidbody.add_registration_code('def( "SetCoordsArray", &PTools::Rigidbody_SetCoordsArray, ( bp::arg("coords") ) )')
+rigidbody.add_registration_code('def( "ApplyMatrixBatch", &PTools::Rigidbody_ApplyMatrixBatch, ( bp::arg("matrices") ) )')
+#atoms are not added while numpy views of the rigidbody exist:
+rigidbody.add_registration_code('def( "AddAtom", &PTools::Rigidbody_AddAtom, ( bp::arg("at"), bp::arg("co") ) )')
+rigidbody.add_registration_code('def( "AddAtom", &PTools::Rigidbody_AddAtom2, ( bp::arg("at") ) )')
+rigidbody.add_registration_code('def( "AddAtoms", &PTools::Rigidbody_AddAtoms, ( bp::arg("atoms"), bp::arg("coords") ) )')
 
 attractrigidbody=mb.class_("AttractRigidbody")
 attractrigidbody.include()
+attractrigidbody.member_functions(lambda f: f.name in ("getAtomTypeNumbers", "getCharges", "getForces")).exclude()
+attractrigidbody.add_declaration_code('#include "rigidbody_py.h"')
+attractrigidbody.add_registration_code('def( "GetForcesView", &PTools::AttractRigidbody_GetForcesView )')
+attractrigidbody.add_registration_code('def( "GetAtomTypesView", &PTools::AttractRigidbody_GetAtomTypesView )')
+attractrigidbody.add_registration_code('def( "GetChargesView", &PTools::AttractRigidbody_GetChargesView )')
 
 
 Region = mb.class_("Region")
@@ -50,6 +68,7 @@ Mcoprigid.include()
 
 atomproperty=mb.class_("Atomproperty")
 atomproperty.include()
+atomproperty.member_functions(lambda f: f.name in ("GetStringCodes", "SetStringCodes")).exclude()
 
 atom = mb.class_("Atom")
 atom.include()
@@ -86,6 +105,27 @@ AtomPair.include()
 
 attpairlist=mb.class_("AttractPairList")
 attpairlist.include()
+attpairlist.member_function("GetPairParams").exclude()
+attpairlist.member_function("GetLigandIndexes").call_policies = module_builder.call_policies.return_value_policy(module_builder.call_policies.copy_const_reference)
+attpairlist.member_function("GetReceptorIndexes").call_policies = module_builder.call_policies.return_value_policy(module_builder.call_policies.copy_const_reference)
+
+receptorindex=mb.class_("ReceptorIndex")
+receptorindex.include()
+
+receptorgrid=mb.class_("ReceptorGrid")
+receptorgrid.include()
+receptorgrid.member_function("Interpolate").exclude()
+
+batchscorer=mb.class_("BatchScorer")
+batchscorer.include()
+#the scorer keeps a reference to its forcefield:
+batchscorer.constructors().call_policies = module_builder.call_policies.with_custodian_and_ward(1, 4)
+#raw arrays are replaced by a numpy front-end which releases the GIL:
+batchscorer.member_function("Score").exclude()
+batchscorer.add_declaration_code('#include "batchscorer_py.h"')
+batchscorer.add_registration_code('def( "Score", &PTools::BatchScorer_Score, ( bp::arg("poses"), bp::arg("split")=false, bp::arg("gradient")=false ) )')
+
+mb.class_("RotationSet").include()
 #mb.namespace( 'py_details' ).exclude()  #exclude the py_details ugly namespace
 
 
@@ -110,6 +150,8 @@ PrintCoord=mb.free_function("PrintCoord")
 PrintCoord.include()
 WritePDB=mb.free_function("WritePDB")
 WritePDB.include()
+mb.free_function("WriteBinary").include()
+mb.free_function("SetBinaryCache").include()
 
 
 atomselection = mb.class_("AtomSelection")
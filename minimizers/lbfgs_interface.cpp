@@ -76,9 +76,9 @@ void Lbfgs::minimize(int maxiter)
     std::cout  << "number of free variables for the minimizer: " << n << std::endl;
 
 
-    std::vector<double> l(n);
-    std::vector<double> u(n);
-    Vint nbd(n);
+    l.resize(n);
+    u.resize(n);
+    nbd.resize(n);
 
     x.resize(n);
     g.resize(n);
@@ -98,9 +98,21 @@ void Lbfgs::minimize(int maxiter)
 
     int m = 5;
 
-    m_opt = lbfgsb_create(n, m, &l[0], &u[0], &nbd[0]);
+    //the minimizer workspace is reused if the problem size did not change
+    //(for instance after BaseAttractForceField::ResetLigand())
+    if (m_opt && m_opt->n == n && m_opt->m == m)
+    {
+        lbfgsb_reset(m_opt, &l[0], &u[0], &nbd[0]);
+    }
+    else
+    {
+        if (m_opt) lbfgsb_destroy(m_opt);
+        m_opt = lbfgsb_create(n, m, &l[0], &u[0], &nbd[0]);
+    }
     assert(m_opt);
 
+    m_vars_over_time.clear();
+
 
     m_opt->iprint=-1;
 
@@ -167,8 +179,7 @@ void Lbfgs::minimize(int maxiter)
             std::vector<dbl> vdblg;
             tocplx(g,vdblg);
 
-            f = objToMinimize.Function(vdblx);
-            objToMinimize.Derivatives(vdblx,vdblg);
+            f = objToMinimize.Evaluate(vdblx,vdblg);
 
             g=todbl(vdblg);
 
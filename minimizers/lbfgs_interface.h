@@ -36,7 +36,11 @@ class Lbfgs
             std::vector<double> x ; // position variables
             std::vector<double> g ; // gradient
 
-            lbfgsb_t* m_opt; //minimizer structure
+            std::vector<double> l ; // lower bounds (unused: no bounds)
+            std::vector<double> u ; // upper bounds (unused: no bounds)
+            Vint nbd ; // type of bounds
+
+            lbfgsb_t* m_opt; //minimizer structure, kept for the next call to minimize()
 
             std::vector<std::vector<double> > m_vars_over_time;
 
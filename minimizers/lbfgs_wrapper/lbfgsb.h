@@ -65,6 +65,7 @@ typedef struct {
 } lbfgsb_t;
 
 lbfgsb_t* lbfgsb_create(int n, int m, double* l, double* u, int* nbd);
+void lbfgsb_reset(lbfgsb_t* obj, double* l, double* u, int* nbd);
 int lbfgsb_run(lbfgsb_t* obj, double* x, double* f, double* g);
 void lbfgsb_destroy(lbfgsb_t* obj);
 
@@ -137,6 +137,26 @@ lbfgsb_t* lbfgsb_create(int n, int m, double* l, double* u, int* nbd) {
     return opt;
 }
 
+/* prepare an opt object for a new optimization of the same dimension
+ * the workspace is kept, l, u and nbd are the (new) bounds arrays
+ * (they must be all NULL if they were NULL at creation)
+ */
+void lbfgsb_reset(lbfgsb_t* opt, double* l, double* u, int* nbd) {
+    int i;
+
+    opt->niter     = 0;
+    opt->fun_min   = DBL_MAX;
+    if (opt->nbd_ == 0) {
+        opt->l = l;
+        opt->u = u;
+        opt->nbd = nbd;
+    }
+
+    for (i = 0; i < 60; ++i)
+        opt->task[i] = ' ';
+    strncpy(opt->task, "START", 5);
+}
+
 /* free all the memory used by the optimizer */
 void lbfgsb_destroy(lbfgsb_t* opt) {
     free(opt->l_);
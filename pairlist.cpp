@@ -1,14 +1,23 @@
 #include "pairlist.h"
 
+#include <stdexcept>
+
 namespace PTools
 {
 
 
-AttractPairList::AttractPairList(const AttractRigidbody & receptor , const AttractRigidbody & ligand, dbl cutoff )
+/*! \brief pairlist of all atoms pairs closer than cutoff+skin
+*
+*  With a non-null skin the list remains valid while no atom moved by more
+*  than skin/2: forcefields then discard the listed pairs beyond the cutoff.
+*/
+AttractPairList::AttractPairList(const AttractRigidbody & receptor , const AttractRigidbody & ligand, dbl cutoff, dbl skin )
 {
     mp_ligand = &ligand;
     mp_receptor = &receptor;
     squarecutoff = cutoff*cutoff;
+    squarelistcutoff = (cutoff+skin)*(cutoff+skin);
+    m_skin = skin;
     no_update = false;
     update();
 }
@@ -16,12 +25,35 @@ AttractPairList::AttractPairList(const AttractRigidbody & receptor , const Attra
 
 
 
+/*! \brief pairlist built with a shared index of the receptor
+*
+*  The index must have been built from the receptor at its current position:
+*  the receptor is not expected to move during the pairlist lifetime.
+*/
+AttractPairList::AttractPairList(const AttractRigidbody & receptor , const AttractRigidbody & ligand, const ReceptorIndex & index, dbl cutoff, dbl skin )
+{
+    if (index.Size() != receptor.Size())
+        throw std::invalid_argument("AttractPairList: the receptor index does not match the receptor");
+
+    mp_ligand = &ligand;
+    mp_receptor = &receptor;
+    squarecutoff = cutoff*cutoff;
+    squarelistcutoff = (cutoff+skin)*(cutoff+skin);
+    m_skin = skin;
+    no_update = false;
+    m_index = index;
+    update();
+}
+
+
+
 AttractPairList::AttractPairList(const AttractRigidbody & receptor, const AttractRigidbody & ligand)
 {
 
     mp_ligand = &ligand;
     mp_receptor = &receptor;
     no_update = true ; //if infinite cutoff
+    m_skin = 0.0;
 
     for (uint i = 0 ; i < mp_ligand->Size(); i++)
         for (uint j = 0; j < mp_receptor->Size(); j++)
@@ -39,7 +71,14 @@ AttractPairList::~AttractPairList()
 
 
 /**
-   Very basic implementation of an atom pairlist.
+   Pairlist generation with a cell list.
+
+   Receptor atoms are binned into cubic cells (see ReceptorIndex), so that
+   only the cells surrounding a ligand atom are scanned. Without a shared index,
+   a temporary one is built at each update with cells (slightly above) the cutoff (+skin).
+   For each ligand atom the receptor indexes are sorted before insertion, which
+   gives exactly the same vectl/vectr contents (and order) as the former N*M
+   double loop.
 */
 void AttractPairList::update()
 {
@@ -48,50 +87,30 @@ void AttractPairList::update()
     if (no_update) return ;
     vectl.clear(); // clears the pairlist
     vectr.clear();
+    m_pairparams.paramsid = 0; //arrays are kept for reuse
 
-    //basic implementation of a pairlist generation:
+    if (mp_ligand->Size() == 0 || mp_receptor->Size() == 0) return;
 
-    std::vector<uint> activelig;
-    std::vector<uint> activerec;
+    ReceptorIndex index = m_index;
+    if (!index.IsValid())
+        index = ReceptorIndex(*mp_receptor, sqrt(real(squarelistcutoff)) * (1.0 + 1e-6) + 1e-6);
 
-    for (uint i=0; i<mp_ligand->Size(); i++)
-    {
-        if (mp_ligand->isAtomActive(i))
-        {
-            activelig.push_back(i);
-        }
-    }
+    std::vector<uint> neighbors;
 
-    for (uint i=0; i<mp_receptor->Size(); i++)
+    for (uint i = 0 ; i < mp_ligand->Size() ; i++)
     {
-        if (mp_receptor->isAtomActive(i))
-        {
-            activerec.push_back(i);
-        }
-    }
+        if (!mp_ligand->isAtomActive(i)) continue;
 
-    uint activeligsize = activelig.size();
-    uint activerecsize = activerec.size();
+        index.Neighbors(mp_ligand->GetCoords(i), squarelistcutoff, neighbors);
 
-
-    for (uint ii = 0 ; ii < activeligsize ; ii++)
-    {
-
-        for (uint jj = 0; jj < activerecsize; jj++)
+        for (uint k = 0; k < neighbors.size(); k++)
         {
-            uint i=activelig[ii];
-            uint j=activerec[jj];
-
-
-            Coord3D c1 = mp_ligand->GetCoords(i) ;
-            Coord3D c2 = mp_receptor->GetCoords(j);
-            if (Norm2(c1-c2) <= squarecutoff)
+            uint j = neighbors[k];
+            if (mp_receptor->isAtomActive(j))
             {
                 vectl.push_back(i);
                 vectr.push_back(j);
             }
-
-
         }
     }
 
@@ -105,6 +124,7 @@ void AttractPairList::addPair(const AttractRigidbody & ligand, const AttractRigi
     {
         vectl.push_back(pair.atlig);
         vectr.push_back(pair.atrec);
+        m_pairparams.paramsid = 0;
     }
     else
     {
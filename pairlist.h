@@ -2,6 +2,7 @@
 #define PAIRLIST_H
 
 #include "attractrigidbody.h"
+#include "receptorindex.h"
 
 
 #include <vector>
@@ -19,6 +20,27 @@ struct AtomPair
 
 
 
+/*! \brief Forcefield parameters of each pair of a pairlist
+*
+*   Filled by the forcefields (see BaseAttractForceField::nonbon8_forces)
+*   the first time they use a pairlist, and dropped when the pairlist is
+*   updated. Arrays are indexed like the pairs.
+*/
+struct PairParams
+{
+    PairParams(): paramsid(0) {};
+
+    uint paramsid; ///< identifier of the forcefield parameters used to fill the arrays (0: empty)
+    std::vector<dbl> alen; ///< attractive LJ coefficient
+    std::vector<dbl> rlen; ///< repulsive LJ coefficient
+    std::vector<dbl> charge; ///< charge product (may include the electrostatic constant)
+    std::vector<int> ipon; ///< saddle point/minimum flag (forcefield 2)
+    std::vector<dbl> emin; ///< saddle point energy (forcefield 2)
+    std::vector<dbl> rmin2; ///< saddle point square distance (forcefield 2)
+};
+
+
+
 /*! \brief Contains list of pairs of atoms in interaction
 *
 *
@@ -27,9 +49,10 @@ struct AtomPair
 class AttractPairList
 {
 public:
-    AttractPairList(const AttractRigidbody & receptor, const AttractRigidbody & ligand, dbl cutoff );
+    AttractPairList(const AttractRigidbody & receptor, const AttractRigidbody & ligand, dbl cutoff, dbl skin=0.0 );
+    AttractPairList(const AttractRigidbody & receptor, const AttractRigidbody & ligand, const ReceptorIndex & index, dbl cutoff, dbl skin=0.0 ); ///< constructor using a prebuilt index of the (fixed) receptor
     AttractPairList(const AttractRigidbody & receptor,const AttractRigidbody &  ligand); ///< constructor with infinite cutoff ;
-    AttractPairList(){}; //null constructor for use with std::vector
+    AttractPairList(): squarecutoff(0.0), squarelistcutoff(0.0), m_skin(0.0), mp_ligand(0), mp_receptor(0), no_update(true) {}; //null (empty) constructor for use with std::vector
 
     ~AttractPairList();
 
@@ -44,11 +67,30 @@ public:
         return sqrt(squarecutoff);
     };
 
+    ///return the current cutoff^2
+    dbl GetSquareCutoff() const {
+        return squarecutoff;
+    };
+
+    /// return the Verlet skin: pairs are listed up to cutoff+skin
+    dbl GetSkin() const {
+        return m_skin;
+    };
+
     ///return number of pairs of atoms in interaction (distance <= cutoff)
     uint Size() {
         return vectl.size();
     };
 
+    ///ligand atoms indexes of all pairs
+    const std::vector<uint> & GetLigandIndexes() const {return vectl;};
+
+    ///receptor atoms indexes of all pairs
+    const std::vector<uint> & GetReceptorIndexes() const {return vectr;};
+
+    ///forcefield parameters of the pairs
+    PairParams & GetPairParams() {return m_pairparams;};
+
     /// get atom pair number i of the pairlist
     AtomPair operator[](int i) {
         AtomPair pair;
@@ -61,14 +103,19 @@ public:
 private:
 
     dbl squarecutoff ; ///< cutoff^2
+    dbl squarelistcutoff ; ///< (cutoff+skin)^2, distance used to build the list
+    dbl m_skin ; ///< Verlet skin (0 by default)
     const AttractRigidbody* mp_ligand;
     const AttractRigidbody* mp_receptor;
 
     bool no_update; ///< if true the pairlist is never updated
+    ReceptorIndex m_index; ///< shared index of the receptor (may be empty)
 
     std::vector <uint> vectl ; ///< index of ligands atoms
     std::vector <uint> vectr ; ///< index of receptor atoms
 
+    PairParams m_pairparams; ///< cached forcefield parameters of the pairs
+
 };
 
 
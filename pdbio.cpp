@@ -1,8 +1,19 @@
 #include <algorithm>
 #include <cctype>
+#include <cstdlib>
 #include <iostream>
 #include <fstream>
 
+#include <cstring>
+#include <map>
+#include <ctime>
+#include <stdint.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <boost/shared_ptr.hpp>
+
 #include "atom.h"
 #include "stdio.h"
 #include "pdbio.h"
@@ -39,119 +50,178 @@ bool isHeteroAtom(const std::string& line) {
 
 
 
-std::string readatomtype(const std::string &ligne) {
-    std::string type="" ;
-    int i=12 ;
-    while (ligne[i]==' ')
+/*! \brief reads a name in columns [first, last] of a line, upper-cased
+*
+*   the name starts at the first non blank character of the columns and ends
+*   at the next blank (or at the end of the line).
+*/
+static void readname(const char * line, size_t len, size_t first, size_t last, std::string & name)
+{
+    name.clear();
+    size_t i = first;
+    while (i < len && line[i]==' ')
     {
         i++;
-        if (i>15) return type ;
+        if (i > last) return;
     }
-
-    int j=i ;
-    while (ligne[j]!=' ') j++ ;
-
-    type=ligne.substr(i,j-i) ;
-    std::transform(type.begin(),type.end(),
-                   type.begin(), //destination
-                   (int(*)(int)) toupper //to upper: convert to upper case
-                  );
-
-    //cout << type <<"a" ;
-
+    for (size_t j = i; j < len && line[j]!=' '; j++)
+        name += (char) toupper(line[j]);
+}
 
 
-    return type;
+///copies a fixed-width field of a line into a null-terminated buffer (for atof/atoi)
+static const char * readfield(const char * line, size_t len, size_t pos, size_t width, char * buffer)
+{
+    size_t n = (pos < len) ? std::min(width, len - pos) : 0;
+    std::copy(line + pos, line + pos + n, buffer);
+    buffer[n] = '\0';
+    return buffer;
 }
 
 
-std::string readresidtype(const std::string &ligne) {
-    std::string type="" ;
-    int i=17 ;
-    while (ligne[i]==' ')
+/*! \brief reads a fixed-width decimal number such as the PDB coordinates
+*
+*   Numbers with at most 15 digits and no exponent are read as an integer
+*   divided by a power of ten, which gives the same correctly rounded double
+*   as atof(). Other numbers are read by atof().
+*/
+static double readcoord(const char * line, size_t len, size_t pos, size_t width, char * buffer)
+{
+    static const double powers[] = {1.0, 10.0, 100.0, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9, 1e10, 1e11, 1e12, 1e13, 1e14, 1e15};
+    const size_t end = (pos < len) ? pos + std::min(width, len - pos) : pos;
+
+    size_t i = pos;
+    while (i < end && line[i]==' ') i++;
+    bool negative = false;
+    if (i < end && (line[i]=='-' || line[i]=='+')) negative = (line[i++]=='-');
+
+    unsigned long long mantissa = 0;
+    int ndigits = 0;
+    int nfraction = -1; // number of digits after the point, -1 before the point
+    for (; i < end; i++)
     {
-        i++;
-        if (i>19) return type ;
+        const char c = line[i];
+        if (c >= '0' && c <= '9')
+        {
+            mantissa = 10*mantissa + (c - '0');
+            ndigits++;
+            if (nfraction >= 0) nfraction++;
+        }
+        else if (c == '.' && nfraction < 0) nfraction = 0;
+        else break;
     }
 
-    int j=i ;
-    while (ligne[j]!=' ') j++ ;
-
-    type=ligne.substr(i,j-i) ;
-    std::transform(type.begin(),type.end(),
-                   type.begin(), //destination
-                   (int(*)(int)) toupper //to upper: convert to upper case
-                  );
-
-    //cout << type <<"a" ;
+    //anything else than blanks after the number, or an unusual number: atof() decides
+    size_t j = i;
+    while (j < end && line[j]==' ') j++;
+    if (j < end || ndigits == 0 || ndigits > 15)
+        return atof(readfield(line, len, pos, width, buffer));
 
-
-
-    return type;
+    const double value = (double) mantissa / powers[nfraction > 0 ? nfraction : 0];
+    return negative ? -value : value;
 }
 
 
-void ReadPDB(ifstream& fichier, Rigidbody& protein) {
-
-    std::string ligne ;
-    int compteur = 0 , compteur1=0;
-    //std::cout << "file opening  " << nomfich.c_str() << std::endl ;
-
-
-    while ( std::getline(fichier, ligne))
+/*! \brief reads the ATOM records of a whole PDB file held in memory
+*
+*   Fields are parsed at their fixed columns directly from the buffer. The
+*   strings of an atom are only interned (or, for the extra field, copied)
+*   when they differ from the previous atom ones (residue names and chains
+*   usually repeat), and the atoms are added to the rigidbody at once.
+*/
+static void ReadPDBBuffer(const char * begin, const char * end, Rigidbody& protein)
+{
+    std::vector<Atomproperty> atoms;
+    std::vector<Coord3D> coords;
+    atoms.reserve((end - begin) / 54 + 1); //at most one atom per 54 characters
+    coords.reserve((end - begin) / 54 + 1);
+
+    Atomproperty a;
+    std::string type, residtype, chain, extra; //strings of the previous atom
+    std::string field;
+    char buffer[16];
+    bool first = true;
+
+    const char * line = begin;
+    while (line < end)
     {
-        compteur++ ;
-        if (isAtom(ligne))
-        {
-            // cout <<ligne <<endl;
-            compteur1++ ;
+        const char * eol = std::find(line, end, '\n');
+        const size_t len = eol - line;
 
-            std::string sx,sy,sz;
-
-            sx=ligne.substr(30,8);
-            sy=ligne.substr(38,8);
-            sz=ligne.substr(46,8);
+        if (len >= 10 && std::equal(line, line + 6, "ATOM  "))
+        {
+            if (len < 54)
+                throw std::out_of_range("ReadPDB: ATOM line shorter than 54 characters");
 
             Coord3D pos;
-            pos.x=atof(sx.c_str());
-            pos.y=atof(sy.c_str());
-            pos.z=atof(sz.c_str());
+            pos.x = readcoord(line, len, 30, 8, buffer);
+            pos.y = readcoord(line, len, 38, 8, buffer);
+            pos.z = readcoord(line, len, 46, 8, buffer);
+
+            readname(line, len, 12, 15, field);
+            if (first || field != type) {type = field; a.SetType(type);}
+            readname(line, len, 17, 19, field);
+            if (first || field != residtype) {residtype = field; a.SetResidType(residtype);}
+            field.assign(line + 21, 1);
+            if (first || field != chain) {chain = field; a.SetChainId(chain);}
+            field.assign(line + 54, eol); //everything after the coordinates
+            if (first || field != extra) {extra = field; a.SetExtra(extra);}
+            first = false;
+
+            a.SetResidId(atoi(readfield(line, len, 22, 4, buffer)));
+            a.SetAtomId(atoi(readfield(line, len, 6, 5, buffer)));
+
+            atoms.push_back(a);
+            coords.push_back(pos);
+        }
 
-            Atomproperty a;
-            a.SetType( readatomtype(ligne));
-            a.SetResidType(readresidtype(ligne));
-            a.SetChainId(ligne.substr(21,1));
-            a.SetResidId(atoi(ligne.substr(22,4).c_str()));
-            a.SetAtomId(atoi(ligne.substr(6,5).c_str()));
-            std::string extra = ligne.substr(54,ligne.size()-1-54+1); //extracts everything after the position 27 to the end of line
-            a.SetExtra(extra);
+        line = eol + 1;
+    }
 
-            protein.AddAtom(a,pos);
+    protein.AddAtoms(atoms, coords);
+}
 
-        }
 
+void ReadPDB(ifstream& fichier, Rigidbody& protein) {
 
-    }
+    //the remaining of the stream is read at once
+    std::vector<char> content;
+    char chunk[65536];
+    while (fichier.read(chunk, sizeof(chunk)) || fichier.gcount() > 0)
+        content.insert(content.end(), chunk, chunk + fichier.gcount());
 
+    if (!content.empty())
+        ReadPDBBuffer(&content[0], &content[0] + content.size(), protein);
 }
 
 
 
+///reads a whole file, returns false if it cannot be opened
+static bool readFile(const std::string & name, std::vector<char> & content)
+{
+    FILE * fichier = fopen(name.c_str(), "rb");
+    if (!fichier) return false;
+
+    char chunk[65536];
+    size_t n;
+    while ((n = fread(chunk, 1, sizeof(chunk), fichier)) > 0)
+        content.insert(content.end(), chunk, chunk + n);
+    fclose(fichier);
+    return true;
+}
+
+
 void ReadPDB(const std::string name,Rigidbody& protein ) {
     std::string nomfich=name ;
-	// pointer toward the filename given in the constructor argument
-    ifstream fichier(nomfich.c_str()); 
-    if (!fichier)
+    //the whole file is read in a single buffer
+    std::vector<char> content;
+    if (!readFile(nomfich, content))
     {
-        std::ostringstream oss;
         throw std::invalid_argument("##### ReadPDB:Could not open file \"" + nomfich + "\" #####") ;
-//        exit(-1);
     }
 
-    ReadPDB(fichier, protein);
-    fichier.close();
-    return;
-
+    if (!content.empty())
+        ReadPDBBuffer(&content[0], &content[0] + content.size(), protein);
 }
 
 void WritePDB(const Rigidbody& rigid, std::string filename)
@@ -186,7 +256,428 @@ void WritePDB(const Rigidbody& rigid, std::string filename)
     fclose(file);
 }
 
-} //namespace PTools
+////////////////////////////////////////////////////////////////
+//     binary structure files
+////////////////////////////////////////////////////////////////
+
+static const char binary_magic[8] = {'P','T','O','O','L','S','B','N'};
+static const uint32_t binary_version = 1;
+static const size_t binary_headersize = 64;
+static const size_t binary_atomsize = 40;
+
+///true if the environment variable PTOOLS_BINARY_CACHE is set to a value other than 0
+static bool binaryCacheFromEnvironment()
+{
+    const char * value = getenv("PTOOLS_BINARY_CACHE");
+    return value && *value && strcmp(value, "0") != 0;
+}
+
+static bool binary_cache = binaryCacheFromEnvironment(); ///< ReadStructure() uses binary copies of PDB files
+
+
+///description of the source of a binary cache (all zero for plain binary files)
+struct BinarySource
+{
+    BinarySource(): size(0), mtime(0), hash(0), cachetime(0) {};
+    uint64_t size;
+    int64_t mtime;
+    uint64_t hash;
+    int64_t cachetime;
+};
+
+
+static bool hostIsLittleEndian()
+{
+    const uint32_t one = 1;
+    return *(const char *) &one == 1;
+}
+
+
+///appends a number to a buffer in little-endian order
+template <class T> static void putLittleEndian(std::vector<char> & buffer, T value)
+{
+    char bytes[sizeof(T)];
+    memcpy(bytes, &value, sizeof(T));
+    if (!hostIsLittleEndian()) std::reverse(bytes, bytes + sizeof(T));
+    buffer.insert(buffer.end(), bytes, bytes + sizeof(T));
+}
+
+
+///reads a little-endian number
+template <class T> static T getLittleEndian(const char * data)
+{
+    char bytes[sizeof(T)];
+    memcpy(bytes, data, sizeof(T));
+    if (!hostIsLittleEndian()) std::reverse(bytes, bytes + sizeof(T));
+    T value;
+    memcpy(&value, bytes, sizeof(T));
+    return value;
+}
+
+
+///FNV-1a hash (64 bits) of a buffer
+static uint64_t hashContent(const std::vector<char> & content)
+{
+    uint64_t hash = 14695981039346656037ULL;
+    for (size_t i = 0; i < content.size(); i++)
+    {
+        hash ^= (unsigned char) content[i];
+        hash *= 1099511628211ULL;
+    }
+    return hash;
+}
+
+
+///writes a file atomically (written under a temporary name then renamed), returns false on failure
+static bool writeAtomically(const std::vector<char> & buffer, const std::string & filename)
+{
+    std::ostringstream tmpname;
+    tmpname << filename << ".tmp" << getpid();
+    FILE * file = fopen(tmpname.str().c_str(), "wb");
+    if (!file) return false;
+    const bool written = (fwrite(&buffer[0], 1, buffer.size(), file) == buffer.size());
+    if (fclose(file) != 0 || !written || rename(tmpname.str().c_str(), filename.c_str()) != 0)
+    {
+        remove(tmpname.str().c_str());
+        return false;
+    }
+    return true;
+}
+
+
+///appends the source description of a binary file header (offset 24 to 56)
+static void putBinarySource(std::vector<char> & buffer, const BinarySource & source)
+{
+    putLittleEndian<uint64_t>(buffer, source.size);
+    putLittleEndian<int64_t>(buffer, source.mtime);
+    putLittleEndian<uint64_t>(buffer, source.hash);
+    putLittleEndian<int64_t>(buffer, source.cachetime);
+}
+
+
+///writes a binary file atomically, returns false on failure
+static bool writeBinaryFile(const Rigidbody & rigid, const std::string & filename, const BinarySource & source)
+{
+    //file indexes of the strings: the four names (by code) and the extra field (by text)
+    std::map<uint, uint32_t> indexes;
+    std::map<std::string, uint32_t> extraindexes;
+    std::vector<const std::string *> strings;
+    std::vector<uint32_t> atomstrings(5 * rigid.Size());
+    for (uint i = 0; i < rigid.Size(); i++)
+    {
+        const Atomproperty & atp = rigid.GetAtomProperty(i);
+        uint codes[4];
+        atp.GetStringCodes(codes);
+        for (uint k = 0; k < 4; k++)
+        {
+            std::map<uint, uint32_t>::iterator it = indexes.find(codes[k]);
+            if (it == indexes.end())
+            {
+                it = indexes.insert(std::make_pair(codes[k], (uint32_t) strings.size())).first;
+                strings.push_back(&GetAtomString(codes[k]).text);
+            }
+            atomstrings[5*i + k] = it->second;
+        }
+        std::map<std::string, uint32_t>::iterator it = extraindexes.find(atp.GetExtra());
+        if (it == extraindexes.end())
+        {
+            it = extraindexes.insert(std::make_pair(atp.GetExtra(), (uint32_t) strings.size())).first;
+            strings.push_back(&it->first);
+        }
+        atomstrings[5*i + 4] = it->second;
+    }
+
+    std::vector<char> stringblock;
+    for (uint s = 0; s < strings.size(); s++)
+    {
+        const std::string & text = *strings[s];
+        putLittleEndian<uint32_t>(stringblock, text.size());
+        stringblock.insert(stringblock.end(), text.begin(), text.end());
+    }
+    stringblock.resize((stringblock.size() + 7) / 8 * 8, '\0');
+
+    std::vector<char> buffer;
+    buffer.reserve(binary_headersize + stringblock.size() + (binary_atomsize + 24) * rigid.Size());
+    buffer.insert(buffer.end(), binary_magic, binary_magic + 8);
+    putLittleEndian<uint32_t>(buffer, binary_version);
+    putLittleEndian<uint32_t>(buffer, rigid.Size());
+    putLittleEndian<uint32_t>(buffer, strings.size());
+    putLittleEndian<uint32_t>(buffer, stringblock.size());
+    putBinarySource(buffer, source);
+    buffer.resize(binary_headersize, '\0');
+    buffer.insert(buffer.end(), stringblock.begin(), stringblock.end());
+
+    for (uint i = 0; i < rigid.Size(); i++)
+    {
+        const Atomproperty & atp = rigid.GetAtomProperty(i);
+        for (uint k = 0; k < 5; k++)
+            putLittleEndian<uint32_t>(buffer, atomstrings[5*i + k]);
+        putLittleEndian<uint32_t>(buffer, atp.GetResidId());
+        putLittleEndian<uint32_t>(buffer, atp.GetAtomId());
+        putLittleEndian<uint32_t>(buffer, 0);
+        putLittleEndian<double>(buffer, real(atp.GetAtomCharge()));
+    }
+
+    for (uint i = 0; i < rigid.Size(); i++)
+    {
+        const Coord3D co = rigid.GetCoords(i);
+        putLittleEndian<double>(buffer, real(co.x));
+        putLittleEndian<double>(buffer, real(co.y));
+        putLittleEndian<double>(buffer, real(co.z));
+    }
+
+    return writeAtomically(buffer, filename);
+}
+
+
+///a read-only memory mapping of a whole file (shared by the rigidbodies which use its coordinates)
+class MappedFile
+{
+public:
+    MappedFile(const std::string & filename): m_data(0), m_size(0)
+    {
+        int fd = open(filename.c_str(), O_RDONLY);
+        if (fd < 0) return;
+        struct stat st;
+        if (fstat(fd, &st) == 0 && st.st_size > 0)
+        {
+            void * data = mmap(0, st.st_size, PROT_READ, MAP_SHARED, fd, 0);
+            if (data != MAP_FAILED)
+            {
+                m_data = (const char *) data;
+                m_size = st.st_size;
+            }
+        }
+        close(fd);
+    }
+    ~MappedFile() {if (m_data) munmap((void *) m_data, m_size);}
+
+    const char * data() const {return m_data;}
+    size_t size() const {return m_size;}
+
+private:
+    MappedFile(const MappedFile &);
+    MappedFile & operator=(const MappedFile &);
+    const char * m_data;
+    size_t m_size;
+};
+
+
+///checks the header of a mapped binary file and reads its source description
+static bool readBinaryHeader(const MappedFile & file, BinarySource & source)
+{
+    const char * data = file.data();
+    if (!data || file.size() < binary_headersize) return false;
+    if (!std::equal(binary_magic, binary_magic + 8, data)) return false;
+    if (getLittleEndian<uint32_t>(data + 8) != binary_version) return false;
+    source.size = getLittleEndian<uint64_t>(data + 24);
+    source.mtime = getLittleEndian<int64_t>(data + 32);
+    source.hash = getLittleEndian<uint64_t>(data + 40);
+    source.cachetime = getLittleEndian<int64_t>(data + 48);
+    return true;
+}
+
+
+///rewrites a mapped binary file with another source description, returns false on failure
+static bool updateBinarySource(const MappedFile & file, const std::string & filename, const BinarySource & source)
+{
+    std::vector<char> header;
+    putBinarySource(header, source);
+    std::vector<char> buffer(file.data(), file.data() + file.size());
+    std::copy(header.begin(), header.end(), buffer.begin() + 24);
+    return writeAtomically(buffer, filename);
+}
+
+
+///true if the coordinates block of a mapped file can be used as Coord3D values
+static bool mappableCoords(const char * coorddata)
+{
+#ifdef AUTO_DIFF
+    return false;
+#endif
+    return hostIsLittleEndian() && sizeof(Coord3D) == 3 * sizeof(double) && (size_t) coorddata % sizeof(double) == 0;
+}
+
+
+/*! \brief loads the atoms of a mapped binary file (the header must have been checked)
+*
+*   When possible, the reference coordinates of the rigidbody are the ones
+*   of the mapping (see CoordsArray::ShareCoords()), which then stays
+*   alive as long as they are not modified.
+*/
+static void readBinaryAtoms(const boost::shared_ptr<const MappedFile> & file, const std::string & name, Rigidbody & protein)
+{
+    const char * data = file->data();
+    const uint32_t natoms = getLittleEndian<uint32_t>(data + 12);
+    const uint32_t nstrings = getLittleEndian<uint32_t>(data + 16);
+    const uint32_t stringsize = getLittleEndian<uint32_t>(data + 20);
+    if (file->size() != binary_headersize + stringsize + (uint64_t) natoms * (binary_atomsize + 24))
+        throw std::invalid_argument("ReadBinary: truncated or corrupted file \"" + name + "\"");
+
+    std::vector<std::string> strings(nstrings);
+    const char * p = data + binary_headersize;
+    const char * stringend = p + stringsize;
+    for (uint32_t s = 0; s < nstrings; s++)
+    {
+        if (stringend - p < 4) throw std::invalid_argument("ReadBinary: corrupted string table in \"" + name + "\"");
+        const uint32_t len = getLittleEndian<uint32_t>(p);
+        p += 4;
+        if ((uint64_t) (stringend - p) < len) throw std::invalid_argument("ReadBinary: corrupted string table in \"" + name + "\"");
+        strings[s].assign(p, len);
+        p += len;
+    }
+
+    //names are interned once, extra fields are read once into an atom whose copies share them
+    std::vector<uint> codes(nstrings);
+    std::vector<bool> interned(nstrings, false);
+    std::vector<Atomproperty> extras(nstrings);
+    std::vector<bool> extraread(nstrings, false);
+
+    std::vector<Atomproperty> atoms(natoms);
+    const char * atomdata = stringend;
+    for (uint32_t i = 0; i < natoms; i++, atomdata += binary_atomsize)
+    {
+        uint32_t indexes[5];
+        for (uint k = 0; k < 5; k++)
+        {
+            indexes[k] = getLittleEndian<uint32_t>(atomdata + 4*k);
+            if (indexes[k] >= nstrings) throw std::invalid_argument("ReadBinary: corrupted atom in \"" + name + "\"");
+        }
+        if (!extraread[indexes[4]])
+        {
+            extras[indexes[4]].SetExtra(strings[indexes[4]]);
+            extraread[indexes[4]] = true;
+        }
+        uint atomcodes[4];
+        for (uint k = 0; k < 4; k++)
+        {
+            if (!interned[indexes[k]])
+            {
+                codes[indexes[k]] = InternAtomString(strings[indexes[k]]);
+                interned[indexes[k]] = true;
+            }
+            atomcodes[k] = codes[indexes[k]];
+        }
+        atoms[i] = extras[indexes[4]];
+        atoms[i].SetStringCodes(atomcodes);
+        atoms[i].SetResidId(getLittleEndian<uint32_t>(atomdata + 20));
+        atoms[i].SetAtomId(getLittleEndian<uint32_t>(atomdata + 24));
+        atoms[i].SetAtomCharge(getLittleEndian<double>(atomdata + 32));
+    }
+
+    const char * coorddata = atomdata;
+    if (mappableCoords(coorddata))
+    {
+        protein.AddAtoms(atoms, (const Coord3D *) coorddata, file);
+        return;
+    }
+
+    std::vector<Coord3D> coords(natoms);
+    for (uint32_t i = 0; i < natoms; i++, coorddata += 24)
+    {
+        coords[i].x = getLittleEndian<double>(coorddata);
+        coords[i].y = getLittleEndian<double>(coorddata + 8);
+        coords[i].z = getLittleEndian<double>(coorddata + 16);
+    }
+
+    protein.AddAtoms(atoms, coords);
+}
+
+
+void WriteBinary(const Rigidbody& rigid, std::string filename)
+{
+    if (!writeBinaryFile(rigid, filename, BinarySource()))
+        throw std::invalid_argument("WriteBinary: could not write file \"" + filename + "\"");
+}
+
+
+void ReadBinary(const std::string name, Rigidbody& protein)
+{
+    boost::shared_ptr<const MappedFile> file(new MappedFile(name));
+    BinarySource source;
+    if (!file->data())
+        throw std::invalid_argument("##### ReadBinary:Could not open file \"" + name + "\" #####");
+    if (!readBinaryHeader(*file, source))
+        throw std::invalid_argument("ReadBinary: \"" + name + "\" is not a binary structure file of a supported version");
+    readBinaryAtoms(file, name, protein);
+}
+
+
+bool IsBinaryFile(const std::string name)
+{
+    char magic[8];
+    FILE * file = fopen(name.c_str(), "rb");
+    if (!file) return false;
+    const bool binary = (fread(magic, 1, 8, file) == 8 && std::equal(binary_magic, binary_magic + 8, magic));
+    fclose(file);
+    return binary;
+}
+
+
+void SetBinaryCache(bool enable)
+{
+    binary_cache = enable;
+}
+
 
+void ReadStructure(const std::string name, Rigidbody& protein)
+{
+    if (IsBinaryFile(name))
+    {
+        ReadBinary(name, protein);
+        return;
+    }
+    if (!binary_cache)
+    {
+        ReadPDB(name, protein);
+        return;
+    }
+
+    const std::string cachename = name + ".ptb";
+    BinarySource source, cached;
+    struct stat st;
+    if (stat(name.c_str(), &st) == 0)
+    {
+        source.size = st.st_size;
+        source.mtime = st.st_mtime;
+    }
+
+    {
+        boost::shared_ptr<const MappedFile> cache(new MappedFile(cachename));
+        if (readBinaryHeader(*cache, cached) && cached.size == source.size && cached.mtime == source.mtime
+            && cached.cachetime > cached.mtime + 1)
+        {
+            readBinaryAtoms(cache, cachename, protein);
+            return;
+        }
+    }
 
+    std::vector<char> content;
+    if (!readFile(name, content))
+        throw std::invalid_argument("##### ReadPDB:Could not open file \"" + name + "\" #####");
+    source.hash = hashContent(content);
+    source.cachetime = time(0);
 
+    {
+        boost::shared_ptr<const MappedFile> cache(new MappedFile(cachename));
+        if (readBinaryHeader(*cache, cached) && cached.size == source.size && cached.hash == source.hash)
+        {
+            readBinaryAtoms(cache, cachename, protein);
+            //same content, new modification time: the next reads must not hash the source again
+            if (source.cachetime > source.mtime + 1)
+                updateBinarySource(*cache, cachename, source);
+            return;
+        }
+    }
+
+    Rigidbody parsed;
+    if (!content.empty())
+        ReadPDBBuffer(&content[0], &content[0] + content.size(), parsed);
+    writeBinaryFile(parsed, cachename, source); //the cache is optional: failures are ignored
+
+    std::vector<Atomproperty> atoms(parsed.Size());
+    for (uint i = 0; i < parsed.Size(); i++) atoms[i] = parsed.GetAtomProperty(i);
+    protein.AddAtoms(atoms, parsed.GetCoordsArray());
+}
+
+} //namespace PTools
@@ -21,6 +21,51 @@ void ReadPDB(std::ifstream& fichier,Rigidbody& protein ); ///< read a PDB file f
 void ReadPDB(const std::string name,Rigidbody& protein ); ///< read a PDB file from a filename and load datas in Rigidbody
 void WritePDB(const Rigidbody& rigid, std::string filename); ///< write a PDB file given a Rigidbody and a filename
 
+/*! \brief binary structure files
+*
+*   A binary file holds the atoms of a Rigidbody (strings stored once,
+*   little-endian numbers and coordinates). Rigidbody(filename) recognizes
+*   binary files, which are much faster to load than PDB files.
+*
+*   The file is memory-mapped and, on little-endian hosts, the reference
+*   coordinates of the loaded Rigidbody stay in the mapping until they are
+*   modified: loading does not copy them, and the workers which load the same
+*   file share them through the page cache. The file must not be modified in
+*   place while it is used (WriteBinary() and the cache replace files).
+*
+*   Format (version 1), all numbers little-endian:
+*    - header (64 bytes): "PTOOLSBN", version, number of atoms, number of
+*      strings and size of the string block (uint32), then for caches the
+*      size, modification time and FNV-1a hash of the source file and the
+*      time the cache was written (64 bits each, 0 otherwise)
+*    - strings: length (uint32) and characters of each string, padded to 8 bytes
+*    - atoms (40 bytes each): indexes of the type, element, residue type,
+*      chain and extra strings, residue number, atom number, padding (uint32)
+*      and charge (float64). The Attract category and charge are read from
+*      the extra strings.
+*    - coordinates: x, y, z of each atom (float64)
+*/
+void WriteBinary(const Rigidbody& rigid, std::string filename); ///< write a Rigidbody in a binary file
+void ReadBinary(const std::string name, Rigidbody& protein); ///< read a binary file and load datas in Rigidbody
+bool IsBinaryFile(const std::string name); ///< true if the file is a binary structure file
+
+/*! \brief reads a PDB or a binary file
+*
+*   When the binary cache is enabled (SetBinaryCache()), a PDB file is read
+*   through a binary copy written next to it (name + ".ptb"). The copy is
+*   used while the source has the same content: it is trusted without
+*   reading the source if the size and modification time are unchanged (and
+*   the source was not modified in the second it was cached), otherwise the
+*   source content hash is compared. When only the hash matches (the source
+*   was touched or copied), the copy is updated with the new size and time.
+*   Copies which cannot be written are silently skipped.
+*
+*   The cache is enabled by default when the environment variable
+*   PTOOLS_BINARY_CACHE is set to 1 (any value other than 0).
+*/
+void ReadStructure(const std::string name, Rigidbody& protein);
+void SetBinaryCache(bool enable); ///< enable or disable the binary cache of ReadStructure() (default: PTOOLS_BINARY_CACHE)
+
 }
 
 #endif //#ifndef PDBIO_H
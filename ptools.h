@@ -14,6 +14,10 @@
 #include "pdbio.h"
 #include "forcefield.h"
 #include "pairlist.h"
+#include "receptorindex.h"
+#include "receptorgrid.h"
+#include "batchscorer.h"
+#include "rotationset.h"
 #include "minimizers/lbfgs_interface.h"
 #include "rmsd.h"
 #include "atomselection.h"
@@ -0,0 +1,90 @@
+//
+// numpy helpers for the Py++ generated bindings (not part of the C++ library)
+//
+// numpy is only imported at run time, through its array interface:
+// the bindings do not need the numpy headers.
+//
+
+#ifndef PY_NUMPY_H
+#define PY_NUMPY_H
+
+#include <boost/python.hpp>
+#include <string>
+
+
+namespace PTools
+{
+
+
+///releases the Python global lock for the lifetime of the object
+class ScopedGILRelease
+{
+public:
+    ScopedGILRelease() {m_state = PyEval_SaveThread();};
+    ~ScopedGILRelease() {PyEval_RestoreThread(m_state);};
+private:
+    PyThreadState * m_state;
+};
+
+
+///numpy type string of a C type ('<f8' for a little endian double...)
+template <class T> std::string numpy_typestr(char kind)
+{
+    const int one = 1;
+    const char endian = (*(const char *) &one == 1) ? '<' : '>';
+    std::string typestr;
+    typestr += endian;
+    typestr += kind;
+    typestr += (char) ('0' + sizeof(T));
+    return typestr;
+}
+
+
+///a contiguous float64 copy of any sequence (no copy if already a contiguous float64 array)
+inline boost::python::object numpy_float64(boost::python::object sequence)
+{
+    boost::python::object numpy = boost::python::import("numpy");
+    return numpy.attr("ascontiguousarray")(sequence, numpy.attr("float64"));
+}
+
+
+///address of the data of a contiguous numpy array
+inline void * numpy_data(boost::python::object array)
+{
+    boost::python::object data = array.attr("__array_interface__")["data"];
+    return reinterpret_cast<void *>( (size_t) boost::python::extract<size_t>(data[0]) );
+}
+
+
+/*! \brief numpy array using the memory of a C++ object (no copy)
+*
+*   'owner' (the Python object which owns the memory) is kept alive by the
+*   array.
+*/
+inline boost::python::object numpy_view(const void * data, boost::python::tuple shape, const std::string & typestr, bool readonly, boost::python::object owner)
+{
+    namespace bp = boost::python;
+    //a plain Python class which only carries the array interface (created once, never freed)
+    static bp::object * holderclass = 0;
+    if (!holderclass)
+    {
+        bp::object type( bp::handle<>(bp::borrowed((PyObject *) &PyType_Type)) );
+        holderclass = new bp::object( type("PToolsArrayHolder", bp::make_tuple(bp::object( bp::handle<>(bp::borrowed((PyObject *) &PyBaseObject_Type)) )), bp::dict()) );
+    }
+
+    bp::dict interface;
+    interface["shape"] = shape;
+    interface["typestr"] = typestr;
+    interface["data"] = bp::make_tuple((size_t) data, readonly);
+    interface["version"] = 3;
+
+    bp::object holder = (*holderclass)();
+    holder.attr("__array_interface__") = interface;
+    holder.attr("owner") = owner;
+    return bp::import("numpy").attr("asarray")(holder);
+}
+
+
+}//namespace PTools
+
+#endif
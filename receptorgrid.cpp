@@ -0,0 +1,330 @@
+#include "receptorgrid.h"
+#include "receptorindex.h"
+#include "attractforcefield.h"
+
+#include <fstream>
+#include <algorithm> //for std::fill
+#include <stdexcept>
+#include <math.h>
+
+
+using std::ios_base;
+
+
+namespace PTools
+{
+
+
+static const char gridmagic[] = "PTOOLSGRID 2\n";
+
+
+/*! \brief trilinear interpolation of a map
+*
+*  'base' is the index of the lower corner of the cell, sx and sy the
+*  strides of the x and y dimensions. The gradient is returned in grid units.
+*/
+static inline double trilinear(const float* map, uint base, uint sx, uint sy, double fx, double fy, double fz, double grad[3])
+{
+    const double c000 = map[base];
+    const double c001 = map[base+1];
+    const double c010 = map[base+sy];
+    const double c011 = map[base+sy+1];
+    const double c100 = map[base+sx];
+    const double c101 = map[base+sx+1];
+    const double c110 = map[base+sx+sy];
+    const double c111 = map[base+sx+sy+1];
+
+    const double gx = 1.0-fx;
+    const double gy = 1.0-fy;
+    const double gz = 1.0-fz;
+
+    grad[0] = (c100-c000)*gy*gz + (c110-c010)*fy*gz + (c101-c001)*gy*fz + (c111-c011)*fy*fz;
+    grad[1] = (c010-c000)*gx*gz + (c110-c100)*fx*gz + (c011-c001)*gx*fz + (c111-c101)*fx*fz;
+    grad[2] = (c001-c000)*gx*gy + (c101-c100)*fx*gy + (c011-c010)*gx*fy + (c111-c110)*fx*fy;
+
+    return gx*(gy*(gz*c000 + fz*c001) + fy*(gz*c010 + fz*c011))
+         + fx*(gy*(gz*c100 + fz*c101) + fy*(gz*c110 + fz*c111));
+}
+
+
+static inline double cap(double energy, double maxenergy)
+{
+    if (energy > maxenergy) return maxenergy;
+    if (energy < -maxenergy) return -maxenergy;
+    return energy;
+}
+
+
+
+ReceptorGrid::ReceptorGrid(const AttractRigidbody & receptor, BaseAttractForceField & ff, dbl spacing, dbl cutoff, dbl maxenergy)
+{
+    if (real(spacing) <= 0.0 || real(cutoff) <= 0.0)
+        throw std::invalid_argument("ReceptorGrid: spacing and cutoff must be positive");
+    if (receptor.Size() == 0)
+        throw std::invalid_argument("ReceptorGrid: empty receptor");
+
+    //the forcefield may ignore some receptor atoms (dummy types):
+    AttractRigidbody rec(receptor);
+    ff.setDummyTypeList(rec);
+
+    Maps* maps = new Maps;
+    m_data = boost::shared_ptr<const Maps>(maps);
+
+    const double h = real(spacing);
+    const double cut = real(cutoff);
+    maps->spacing = h;
+    maps->cutoff = cut;
+    maps->maxenergy = real(maxenergy);
+    maps->ntypes = ff.numberOfTypes();
+    maps->receptorsize = rec.Size();
+    maps->paramshash = ff.m_paramshash;
+
+    //bounding box of the receptor, extended by the cutoff
+    Coord3D boxmin = rec.GetCoords(0);
+    Coord3D boxmax = boxmin;
+    for (uint i = 0; i < rec.Size(); i++)
+    {
+        Coord3D c = rec.GetCoords(i);
+        if (c.x < boxmin.x) boxmin.x = c.x;
+        if (c.y < boxmin.y) boxmin.y = c.y;
+        if (c.z < boxmin.z) boxmin.z = c.z;
+        if (c.x > boxmax.x) boxmax.x = c.x;
+        if (c.y > boxmax.y) boxmax.y = c.y;
+        if (c.z > boxmax.z) boxmax.z = c.z;
+    }
+
+    maps->origin = boxmin - Coord3D(cut, cut, cut);
+    maps->npoints[0] = (int) ceil((real(boxmax.x - boxmin.x) + 2.0*cut) / h) + 1;
+    maps->npoints[1] = (int) ceil((real(boxmax.y - boxmin.y) + 2.0*cut) / h) + 1;
+    maps->npoints[2] = (int) ceil((real(boxmax.z - boxmin.z) + 2.0*cut) / h) + 1;
+    const uint npoints = maps->npoints[0]*maps->npoints[1]*maps->npoints[2];
+
+    maps->vdw.assign(maps->ntypes*npoints, 0.0f);
+    maps->elec.assign(npoints, 0.0f);
+
+    const double elecconstant = real(ff.elecConstant());
+    const dbl squarecutoff = cutoff*cutoff;
+    ReceptorIndex index(rec, cutoff);
+    std::vector<uint> neighbors;
+    std::vector<double> vdw(maps->ntypes);
+
+    uint point = 0;
+    for (int x = 0; x < maps->npoints[0]; x++)
+        for (int y = 0; y < maps->npoints[1]; y++)
+            for (int z = 0; z < maps->npoints[2]; z++, point++)
+            {
+                Coord3D p = maps->origin + Coord3D(x*h, y*h, z*h);
+                index.Neighbors(p, squarecutoff, neighbors);
+                if (neighbors.empty()) continue;
+
+                std::fill(vdw.begin(), vdw.end(), 0.0);
+                double phi = 0.0;
+
+                for (uint k = 0; k < neighbors.size(); k++)
+                {
+                    uint j = neighbors[k];
+                    if (!rec.isAtomActive(j)) continue;
+
+                    dbl r2 = Norm2(p - index.GetCoords(j));
+                    if (r2 < 0.001) r2 = 0.001;
+
+                    uint rectype = rec.getAtomTypeNumber(j);
+                    for (uint t = 0; t < maps->ntypes; t++)
+                        vdw[t] += real(ff.pairVdw(rectype, t, r2));
+
+                    phi += real(rec.getCharge(j)) * elecconstant / real(r2);
+                }
+
+                for (uint t = 0; t < maps->ntypes; t++)
+                    maps->vdw[t*npoints + point] = cap(vdw[t], maps->maxenergy);
+                maps->elec[point] = cap(phi, maps->maxenergy);
+            }
+}
+
+
+
+ReceptorGrid::ReceptorGrid(const std::string & filename)
+{
+    std::ifstream file(filename.c_str(), ios_base::in | ios_base::binary);
+    if (!file)
+    {
+        std::string msg = "ReceptorGrid: cannot open file " + filename + "\n";
+        throw ios_base::failure(msg);
+    }
+
+    std::string magic(sizeof(gridmagic)-1, ' ');
+    file.read(&magic[0], magic.size());
+    if (!file || magic != gridmagic)
+        throw ios_base::failure("ReceptorGrid: " + filename + " is not a grid file of this version\n");
+
+    Maps* maps = new Maps;
+    m_data = boost::shared_ptr<const Maps>(maps);
+
+    double origin[3];
+    file.read((char*) origin, sizeof(origin));
+    file.read((char*) &maps->spacing, sizeof(maps->spacing));
+    file.read((char*) &maps->cutoff, sizeof(maps->cutoff));
+    file.read((char*) &maps->maxenergy, sizeof(maps->maxenergy));
+    file.read((char*) maps->npoints, sizeof(maps->npoints));
+    file.read((char*) &maps->ntypes, sizeof(maps->ntypes));
+    file.read((char*) &maps->receptorsize, sizeof(maps->receptorsize));
+    file.read((char*) &maps->paramshash, sizeof(maps->paramshash));
+    if (!file || maps->npoints[0] <= 0 || maps->npoints[1] <= 0 || maps->npoints[2] <= 0)
+        throw ios_base::failure("ReceptorGrid: corrupted grid file " + filename + "\n");
+
+    maps->origin = Coord3D(origin[0], origin[1], origin[2]);
+
+    const uint npoints = maps->npoints[0]*maps->npoints[1]*maps->npoints[2];
+    maps->vdw.resize(maps->ntypes*npoints);
+    maps->elec.resize(npoints);
+    file.read((char*) &maps->vdw[0], maps->vdw.size()*sizeof(float));
+    file.read((char*) &maps->elec[0], maps->elec.size()*sizeof(float));
+    if (!file)
+        throw ios_base::failure("ReceptorGrid: truncated grid file " + filename + "\n");
+}
+
+
+
+void ReceptorGrid::Save(const std::string & filename) const
+{
+    if (!IsValid())
+        throw std::invalid_argument("ReceptorGrid::Save: empty grid");
+
+    std::ofstream file(filename.c_str(), ios_base::out | ios_base::binary);
+    if (!file)
+    {
+        std::string msg = "ReceptorGrid: cannot write file " + filename + "\n";
+        throw ios_base::failure(msg);
+    }
+
+    const Maps & maps = *m_data;
+    double origin[3] = {real(maps.origin.x), real(maps.origin.y), real(maps.origin.z)};
+
+    file.write(gridmagic, sizeof(gridmagic)-1);
+    file.write((const char*) origin, sizeof(origin));
+    file.write((const char*) &maps.spacing, sizeof(maps.spacing));
+    file.write((const char*) &maps.cutoff, sizeof(maps.cutoff));
+    file.write((const char*) &maps.maxenergy, sizeof(maps.maxenergy));
+    file.write((const char*) maps.npoints, sizeof(maps.npoints));
+    file.write((const char*) &maps.ntypes, sizeof(maps.ntypes));
+    file.write((const char*) &maps.receptorsize, sizeof(maps.receptorsize));
+    file.write((const char*) &maps.paramshash, sizeof(maps.paramshash));
+    file.write((const char*) &maps.vdw[0], maps.vdw.size()*sizeof(float));
+    file.write((const char*) &maps.elec[0], maps.elec.size()*sizeof(float));
+
+    if (!file)
+        throw ios_base::failure("ReceptorGrid: error while writing " + filename + "\n");
+}
+
+
+
+uint ReceptorGrid::ReceptorSize() const
+{
+    if (!IsValid()) return 0;
+    return m_data->receptorsize;
+}
+
+dbl ReceptorGrid::GetSpacing() const
+{
+    if (!IsValid()) return 0.0;
+    return m_data->spacing;
+}
+
+dbl ReceptorGrid::GetCutoff() const
+{
+    if (!IsValid()) return 0.0;
+    return m_data->cutoff;
+}
+
+dbl ReceptorGrid::GetMaxEnergy() const
+{
+    if (!IsValid()) return 0.0;
+    return m_data->maxenergy;
+}
+
+uint ReceptorGrid::GetNumberOfTypes() const
+{
+    if (!IsValid()) return 0;
+    return m_data->ntypes;
+}
+
+uint ReceptorGrid::GetParamsHash() const
+{
+    if (!IsValid()) return 0;
+    return m_data->paramshash;
+}
+
+
+
+dbl ReceptorGrid::Interpolate(AttractRigidbody & lig, std::vector<Coord3D> & forcelig, dbl & vdw, dbl & elec) const
+{
+    assert(forcelig.size() == lig.Size());
+
+    vdw = 0.0;
+    elec = 0.0;
+    if (!IsValid()) return 0.0;
+
+    const Maps & maps = *m_data;
+    const double h = maps.spacing;
+    const uint sy = maps.npoints[2];
+    const uint sx = maps.npoints[1]*sy;
+    const uint npoints = maps.npoints[0]*sx;
+
+    lig.syncCoords();
+    Coord3D c;
+    double grad[3];
+
+    for (uint i = 0; i < lig.Size(); i++)
+    {
+        if (!lig.isAtomActive(i)) continue;
+
+        lig.unsafeGetCoords(i, c);
+        double ux = real(c.x - maps.origin.x) / h;
+        double uy = real(c.y - maps.origin.y) / h;
+        double uz = real(c.z - maps.origin.z) / h;
+
+        //atom outside of the grid: out of the receptor cutoff
+        if (ux < 0.0 || uy < 0.0 || uz < 0.0 ||
+            ux >= maps.npoints[0]-1 || uy >= maps.npoints[1]-1 || uz >= maps.npoints[2]-1) continue;
+
+        int ix = (int) ux;
+        int iy = (int) uy;
+        int iz = (int) uz;
+        double fx = ux - ix;
+        double fy = uy - iy;
+        double fz = uz - iz;
+        uint base = ix*sx + iy*sy + iz;
+
+        uint type = lig.getAtomTypeNumber(i);
+        assert(type < maps.ntypes);
+
+        double e = trilinear(&maps.vdw[type*npoints], base, sx, sy, fx, fy, fz, grad);
+        vdw += e;
+        Coord3D force(grad[0]/h, grad[1]/h, grad[2]/h);
+
+        double charge = real(lig.getCharge(i));
+        if (charge != 0.0)
+        {
+            double phi = trilinear(&maps.elec[0], base, sx, sy, fx, fy, fz, grad);
+            elec += charge*phi;
+            force += Coord3D(charge*grad[0]/h, charge*grad[1]/h, charge*grad[2]/h);
+        }
+
+        forcelig[i] += force;
+    }
+
+    return vdw + elec;
+}
+
+
+
+dbl ReceptorGrid::Energy(AttractRigidbody & lig) const
+{
+    std::vector<Coord3D> forcelig(lig.Size());
+    dbl vdw, elec;
+    return Interpolate(lig, forcelig, vdw, elec);
+}
+
+
+
+} //namespace PTools
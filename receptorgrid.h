@@ -0,0 +1,101 @@
+#ifndef RECEPTORGRID_H
+#define RECEPTORGRID_H
+
+#include "attractrigidbody.h"
+
+#include <string>
+#include <vector>
+#include <boost/shared_ptr.hpp>
+
+
+namespace PTools
+{
+
+class BaseAttractForceField;
+
+
+/*! \brief Precomputed potential maps of a fixed receptor
+*
+*   For each ligand atom type of an Attract forcefield, the LJ energy
+*   created by the receptor is tabulated on a regular grid, along with the
+*   electrostatic potential (energy of a unit charge). Ligand energies and
+*   forces are then obtained by trilinear interpolation, at a cost which only
+*   depends on the ligand size.
+*
+*   The interpolation error is controlled by the grid spacing: trilinear
+*   interpolation is exact up to terms in spacing^2 times the curvature of
+*   the potentials, so halving the spacing divides the error by about 4 (and
+*   multiplies the memory by 8). For a docked pose of the test complex
+*   (pk6a/pk6c, mbest1k.par, cutoff 8A) the energy is within 3% of the
+*   pairwise one at 0.5A, 25% at 1.0A, and meaningless at 2.0A
+*   (testReceptorGridError). Compare a few poses against
+*   BaseAttractForceField::ScoreEnergy() before choosing the spacing of a new
+*   system. The potentials are not smoothed at the cutoff, hence the forces
+*   of atoms close to the cutoff distance do not improve with the spacing.
+*
+*   Close to the receptor atoms the potentials are capped to +/- maxenergy
+*   so that the steep repulsive walls do not spoil the neighbouring grid points.
+*   Outside the grid (further than cutoff from the receptor) the energy is 0.
+*
+*   A grid records the cutoff and the hash of the parameters file it was
+*   computed with: a forcefield only uses grids of its own parameters and
+*   cutoff (BaseAttractForceField::AddLigand()).
+*
+*   Copies are cheap: the maps are shared between the copies.
+*/
+class ReceptorGrid
+{
+public:
+    ///tabulates the potentials of 'receptor' with the parameters of 'ff'
+    ReceptorGrid(const AttractRigidbody & receptor, BaseAttractForceField & ff, dbl spacing, dbl cutoff, dbl maxenergy=100.0);
+    ///load a grid saved with Save()
+    ReceptorGrid(const std::string & filename);
+    ReceptorGrid(){}; //null constructor for use with std::vector
+
+    ///save the grid to a (binary) file
+    void Save(const std::string & filename) const;
+
+    ///true if the grid contains maps
+    bool IsValid() const {return m_data.get() != 0;};
+
+    ///number of atoms of the receptor used to build the grid
+    uint ReceptorSize() const;
+
+    dbl GetSpacing() const; ///< distance between two grid points
+    dbl GetCutoff() const; ///< cutoff used for the tabulated interactions
+    dbl GetMaxEnergy() const; ///< cap of the tabulated potentials
+    uint GetNumberOfTypes() const; ///< number of tabulated ligand atom types
+    uint GetParamsHash() const; ///< hash of the parameters file of the forcefield used to build the grid
+
+    ///interpolated energy of a ligand, its atomic forces are added to forcelig
+    dbl Interpolate(AttractRigidbody & lig, std::vector<Coord3D> & forcelig, dbl & vdw, dbl & elec) const;
+
+    ///interpolated energy of a ligand
+    dbl Energy(AttractRigidbody & lig) const;
+
+
+private:
+
+    struct Maps
+    {
+        Coord3D origin; ///< position of the first grid point
+        double spacing;
+        double cutoff;
+        double maxenergy;
+        int npoints[3]; ///< number of points in each dimension
+        uint ntypes; ///< number of ligand atom types
+        uint receptorsize;
+        uint paramshash; ///< hash of the forcefield parameters file
+        std::vector<float> vdw; ///< LJ energy maps, one per ligand atom type
+        std::vector<float> elec; ///< electrostatic potential map
+    };
+
+    boost::shared_ptr<const Maps> m_data;
+
+};
+
+
+
+}//namespace PTools
+
+#endif
@@ -0,0 +1,192 @@
+#include "receptorindex.h"
+
+#include <algorithm> //for std::sort, std::max, std::min
+#include <stdexcept>
+
+
+namespace PTools
+{
+
+
+ReceptorIndex::ReceptorIndex(const AttractRigidbody & receptor, dbl cellsize)
+{
+    if (real(cellsize) <= 0.0)
+        throw std::invalid_argument("ReceptorIndex: cell size must be positive");
+
+    Cells* cells = new Cells;
+    m_data = boost::shared_ptr<const Cells>(cells);
+
+    const uint size = receptor.Size();
+    cells->coords.resize(size);
+    cells->cellsize = real(cellsize);
+    cells->ncell[0] = cells->ncell[1] = cells->ncell[2] = 0;
+    cells->cellstart.push_back(0);
+
+    if (size == 0) return;
+
+    Coord3D boxmin = receptor.GetCoords(0);
+    Coord3D boxmax = boxmin;
+    for (uint i = 0; i < size; i++)
+    {
+        Coord3D c = receptor.GetCoords(i);
+        cells->coords[i] = c;
+        if (c.x < boxmin.x) boxmin.x = c.x;
+        if (c.y < boxmin.y) boxmin.y = c.y;
+        if (c.z < boxmin.z) boxmin.z = c.z;
+        if (c.x > boxmax.x) boxmax.x = c.x;
+        if (c.y > boxmax.y) boxmax.y = c.y;
+        if (c.z > boxmax.z) boxmax.z = c.z;
+    }
+
+    //the number of cells per dimension is bounded for very small cells
+    const int maxcells = 256;
+    double extent = real(boxmax.x - boxmin.x);
+    if (real(boxmax.y - boxmin.y) > extent) extent = real(boxmax.y - boxmin.y);
+    if (real(boxmax.z - boxmin.z) > extent) extent = real(boxmax.z - boxmin.z);
+    if (extent / cells->cellsize > maxcells - 1) cells->cellsize = extent / (maxcells - 1);
+
+    const double side = cells->cellsize;
+    cells->boxmin = boxmin;
+    cells->ncell[0] = (int) (real(boxmax.x - boxmin.x) / side) + 1;
+    cells->ncell[1] = (int) (real(boxmax.y - boxmin.y) / side) + 1;
+    cells->ncell[2] = (int) (real(boxmax.z - boxmin.z) / side) + 1;
+    const uint totalcells = cells->ncell[0]*cells->ncell[1]*cells->ncell[2];
+
+
+    //counting sort of the atoms into the cells (stable: inside a cell
+    //atoms keep an increasing index order)
+    std::vector<uint> atomcell(size);
+    cells->cellstart.assign(totalcells+1, 0);
+    for (uint i = 0; i < size; i++)
+    {
+        int cx = (int) (real(cells->coords[i].x - boxmin.x) / side);
+        int cy = (int) (real(cells->coords[i].y - boxmin.y) / side);
+        int cz = (int) (real(cells->coords[i].z - boxmin.z) / side);
+        atomcell[i] = (cx*cells->ncell[1] + cy)*cells->ncell[2] + cz;
+        cells->cellstart[atomcell[i]+1]++;
+    }
+
+    for (uint c = 0; c < totalcells; c++)
+        cells->cellstart[c+1] += cells->cellstart[c];
+
+    cells->cellatoms.resize(size);
+    cells->cellcoords.resize(size);
+    std::vector<uint> fill(cells->cellstart.begin(), cells->cellstart.end()-1);
+    for (uint i = 0; i < size; i++)
+    {
+        uint pos = fill[atomcell[i]]++;
+        cells->cellatoms[pos] = i;
+        cells->cellcoords[pos] = cells->coords[i];
+    }
+
+}
+
+
+uint ReceptorIndex::Size() const
+{
+    if (!m_data) return 0;
+    return m_data->coords.size();
+}
+
+
+dbl ReceptorIndex::GetCellSize() const
+{
+    if (!m_data) return 0.0;
+    return m_data->cellsize;
+}
+
+
+Coord3D ReceptorIndex::GetCoords(uint i) const
+{
+    if (i >= Size()) throw std::out_of_range("ReceptorIndex::GetCoords: atom index out of bounds");
+    return m_data->coords[i];
+}
+
+
+/*! \brief receptor atoms closer than sqrt(squarecutoff) from co
+*
+*  Only the cells within the cutoff of 'co' are scanned. The indexes are
+*  returned in increasing order.
+*/
+void ReceptorIndex::Neighbors(const Coord3D & co, dbl squarecutoff, std::vector<uint> & neighbors) const
+{
+    neighbors.clear();
+    if (scan(co, squarecutoff, &neighbors) > 1) std::sort(neighbors.begin(), neighbors.end());
+}
+
+
+uint ReceptorIndex::CountClashes(const Rigidbody & ligand, dbl distance) const
+{
+    const std::vector<Coord3D> & coords = ligand.GetCoordsArray();
+    const dbl squaredistance = distance*distance;
+    uint clashes = 0;
+    for (uint i=0; i<coords.size(); i++)
+        if (scan(coords[i], squaredistance, 0)) clashes++;
+    return clashes;
+}
+
+
+bool ReceptorIndex::InContact(const Rigidbody & ligand, dbl distance) const
+{
+    const std::vector<Coord3D> & coords = ligand.GetCoordsArray();
+    const dbl squaredistance = distance*distance;
+    for (uint i=0; i<coords.size(); i++)
+        if (scan(coords[i], squaredistance, 0)) return true;
+    return false;
+}
+
+
+///receptor atoms closer than sqrt(squarecutoff) from 'co' are added to 'neighbors'.
+///Returns the number of non-empty cells visited, or stops at the first neighbor if 'neighbors' is null (then returns 1 if there is one).
+uint ReceptorIndex::scan(const Coord3D & co, dbl squarecutoff, std::vector<uint> * neighbors) const
+{
+    if (Size() == 0) return 0;
+
+    const Cells & cells = *m_data;
+    const double side = cells.cellsize;
+
+    //number of layers of cells to scan around the cell of 'co', with a small
+    //margin against rounding errors at cell boundaries
+    const double cutoff = sqrt(real(squarecutoff));
+    const int layers = (int) ceil((cutoff * (1.0 + 1e-6) + 1e-6) / side);
+
+    double fx = floor(real(co.x - cells.boxmin.x) / side);
+    double fy = floor(real(co.y - cells.boxmin.y) / side);
+    double fz = floor(real(co.z - cells.boxmin.z) / side);
+
+    //point too far from the receptor box: no neighbor
+    if (fx < -layers || fy < -layers || fz < -layers ||
+        fx >= cells.ncell[0] + layers || fy >= cells.ncell[1] + layers || fz >= cells.ncell[2] + layers) return 0;
+
+    int cx = (int) fx;
+    int cy = (int) fy;
+    int cz = (int) fz;
+
+    uint visited = 0;
+
+    for (int x = std::max(cx-layers, 0); x <= std::min(cx+layers, cells.ncell[0]-1); x++)
+        for (int y = std::max(cy-layers, 0); y <= std::min(cy+layers, cells.ncell[1]-1); y++)
+            for (int z = std::max(cz-layers, 0); z <= std::min(cz+layers, cells.ncell[2]-1); z++)
+            {
+                uint cell = (x*cells.ncell[1] + y)*cells.ncell[2] + z;
+                uint first = cells.cellstart[cell];
+                uint last = cells.cellstart[cell+1];
+                if (first == last) continue;
+                visited++;
+
+                for (uint k = first; k < last; k++)
+                {
+                    if (Norm2(co-cells.cellcoords[k]) <= squarecutoff)
+                    {
+                        if (!neighbors) return 1;
+                        neighbors->push_back(cells.cellatoms[k]);
+                    }
+                }
+            }
+
+    return neighbors ? visited : 0;
+}
+
+
+
+} //namespace PTools
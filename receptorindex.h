@@ -0,0 +1,75 @@
+#ifndef RECEPTORINDEX_H
+#define RECEPTORINDEX_H
+
+#include "attractrigidbody.h"
+
+#include <vector>
+#include <boost/shared_ptr.hpp>
+
+
+namespace PTools
+{
+
+
+/*! \brief Spatial index (cell list) of a fixed receptor
+*
+*   The receptor atoms are binned once into cubic cells. Pairlists built
+*   with an index only scan the cells around each ligand atom, so that the
+*   index can be shared between all the minimizations of a docking run
+*   as long as the receptor does not move.
+*
+*   Copies are cheap: the cells are shared between the copies.
+*/
+class ReceptorIndex
+{
+public:
+    ///index all atoms of a receptor with cubic cells of side 'cellsize'
+    ReceptorIndex(const AttractRigidbody & receptor, dbl cellsize);
+    ReceptorIndex(){}; //null constructor for use with std::vector
+
+    ///true if the index was built from a receptor
+    bool IsValid() const {return m_data.get() != 0;};
+
+    ///number of atoms of the indexed receptor
+    uint Size() const;
+
+    ///return the side of the cells
+    dbl GetCellSize() const;
+
+    ///indexes of the receptor atoms (sorted) closer than sqrt(squarecutoff) from 'co'
+    void Neighbors(const Coord3D & co, dbl squarecutoff, std::vector<uint> & neighbors) const;
+
+    ///receptor atom coordinates at the time the index was built
+    Coord3D GetCoords(uint i) const;
+
+    ///number of ligand atoms closer than 'distance' to a receptor atom (steric clashes of a start position)
+    uint CountClashes(const Rigidbody & ligand, dbl distance) const;
+
+    ///true if a ligand atom is closer than 'distance' to a receptor atom (stops at the first one)
+    bool InContact(const Rigidbody & ligand, dbl distance) const;
+
+
+private:
+
+    uint scan(const Coord3D & co, dbl squarecutoff, std::vector<uint> * neighbors) const;
+
+    struct Cells
+    {
+        Coord3D boxmin; ///< lower corner of the first cell
+        double cellsize; ///< side of the cells
+        int ncell[3]; ///< number of cells in each dimension
+        std::vector<uint> cellstart; ///< atoms of cell c are cellatoms[cellstart[c]..cellstart[c+1][
+        std::vector<uint> cellatoms; ///< receptor atoms indexes sorted by cell
+        std::vector<Coord3D> cellcoords; ///< coordinates of cellatoms
+        std::vector<Coord3D> coords; ///< coordinates of all receptor atoms
+    };
+
+    boost::shared_ptr<const Cells> m_data;
+
+};
+
+
+
+}//namespace PTools
+
+#endif
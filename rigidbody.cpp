@@ -22,6 +22,8 @@
  ***************************************************************************/
 
 
+#include <algorithm>
+
 #include "rigidbody.h"
 #include "atomselection.h"
 #include "geometry.h"
@@ -32,6 +34,7 @@ namespace PTools{
 
 
 Rigidbody::Rigidbody()
+    : mAtomProp(new std::vector<Atomproperty>)
 {
     ResetMatrix();
 }
@@ -39,8 +42,9 @@ Rigidbody::Rigidbody()
 
 
 Rigidbody::Rigidbody(std::string filename)
+    : mAtomProp(new std::vector<Atomproperty>)
 {
-    ReadPDB(filename,*this);
+    ReadStructure(filename,*this);
     ResetMatrix();
 }
 
@@ -53,22 +57,48 @@ Rigidbody::Rigidbody(const Rigidbody& model)
 //TODO: verifier si c'est toujours le cas ...
 
     this->mForces = model.mForces;
-    this->mAtomProp = model.mAtomProp;
+    this->mAtomProp = model.mAtomProp; //shared until modified
     this-> _description = model._description;
 
 }
 
 
+std::vector<Atomproperty> & Rigidbody::mutableAtomProp()
+{
+    if (!mAtomProp.unique())
+        mAtomProp.reset(new std::vector<Atomproperty>(*mAtomProp));
+    return *mAtomProp;
+}
+
+
 void Rigidbody::AddAtom(const Atomproperty& at, Coord3D co)
 {
-    mAtomProp.push_back(at);
+    mutableAtomProp().push_back(at);
     AddCoord(co);
 }
 
 
+void Rigidbody::AddAtoms(const std::vector<Atomproperty>& atoms, const std::vector<Coord3D>& coords)
+{
+    if (atoms.size() != coords.size())
+        throw std::invalid_argument("AddAtoms: the numbers of atoms and coordinates differ");
+    std::vector<Atomproperty> & atomprop = mutableAtomProp();
+    atomprop.insert(atomprop.end(), atoms.begin(), atoms.end());
+    AddCoords(coords);
+}
+
+
+void Rigidbody::AddAtoms(const std::vector<Atomproperty>& atoms, const Coord3D * coords, boost::shared_ptr<const void> owner)
+{
+    std::vector<Atomproperty> & atomprop = mutableAtomProp();
+    atomprop.insert(atomprop.end(), atoms.begin(), atoms.end());
+    ShareCoords(coords, atoms.size(), owner);
+}
+
+
 Atom Rigidbody::CopyAtom(uint i) const
 {
-    Atom at(mAtomProp[i],GetCoords(i));
+    Atom at(atomProp()[i],GetCoords(i));
     return at;
 }
 
@@ -109,6 +139,16 @@ Coord3D Rigidbody::FindCenter() const
 }
 
 
+void Rigidbody::SetCoordsFrom(const Rigidbody& rig)
+{
+    if (rig.Size() != Size())
+        throw std::invalid_argument("SetCoordsFrom: rigidbodies sizes differ");
+
+    //vectors of the same size are copied in place
+    CoordsArray::operator=(rig);
+}
+
+
 void Rigidbody::CenterToOrigin()
 {
     Coord3D c = FindCenter();
@@ -176,9 +216,12 @@ AtomSelection Rigidbody::SelectAtomType(std::string atomtype)
     AtomSelection newsel;
     newsel.SetRigid(*this);
 
+    uint code;
+    if (!FindAtomString(atomtype, code)) return newsel; //no atom can have this type
+
     for (uint i=0; i<Size(); i++)
     {
-        if ( mAtomProp[i].GetType()==atomtype)
+        if ( atomProp()[i].GetTypeCode()==code)
             newsel.AddAtomIndex(i);
     }
 
@@ -191,9 +234,12 @@ AtomSelection Rigidbody::SelectResidType(std::string residtype)
     AtomSelection newsel;
     newsel.SetRigid(*this);
 
+    uint code;
+    if (!FindAtomString(residtype, code)) return newsel;
+
     for (uint i=0; i<Size(); i++)
     {
-        if (mAtomProp[i].GetResidType()==residtype)
+        if (atomProp()[i].GetResidTypeCode()==code)
             newsel.AddAtomIndex(i);
     }
     return newsel;
@@ -203,9 +249,11 @@ AtomSelection Rigidbody::SelectResidType(std::string residtype)
 AtomSelection Rigidbody::SelectChainId(std::string chainId) {
     AtomSelection newsel;
     newsel.SetRigid(*this);
+    uint code;
+    if (!FindAtomString(chainId, code)) return newsel;
     for (uint i=0; i<Size(); i++)
     {
-        if (mAtomProp[i].GetChainId()==chainId)
+        if (atomProp()[i].GetChainIdCode()==code)
             newsel.AddAtomIndex(i);
     }
     return newsel;
@@ -218,7 +266,7 @@ AtomSelection Rigidbody::SelectResRange(uint start, uint stop)
 
     for (uint i=0; i < Size(); i++)
     {
-        Atomproperty& atp ( mAtomProp[i] );
+        const Atomproperty& atp ( atomProp()[i] );
         if (atp.GetResidId() >=start && atp.GetResidId() <= stop) newsel.AddAtomIndex(i);
     }
     return newsel;
@@ -229,29 +277,25 @@ AtomSelection Rigidbody::CA() {
     return SelectAtomType("CA");
 }
 
-bool isBackbone(const std::string &  atomtype)
+AtomSelection Rigidbody::Backbone()
 {
+    AtomSelection newsel;
+    newsel.SetRigid(*this);
 
+    //codes of the backbone atom types
     const std::string bbtypes[] = {"N", "CA", "C", "O"};
     int const bbsize = sizeof(bbtypes)/sizeof(std::string);
-
+    std::vector<uint> bbcodes;
     for (int i =0; i<bbsize; i++)
     {
-        if (atomtype == bbtypes[i] ) return true;
+        uint code;
+        if (FindAtomString(bbtypes[i], code)) bbcodes.push_back(code);
     }
 
-    return false;
-}
-
-
-AtomSelection Rigidbody::Backbone()
-{
-    AtomSelection newsel;
-    newsel.SetRigid(*this);
-
     for (uint i=0; i<this->Size(); i++)
     {
-        if (isBackbone(CopyAtom(i).GetType()) )
+        const uint code = atomProp()[i].GetTypeCode();
+        if (std::find(bbcodes.begin(), bbcodes.end(), code) != bbcodes.end())
         {
             newsel.AddAtomIndex(i);
         }
@@ -264,10 +308,7 @@ AtomSelection Rigidbody::Backbone()
 /// operator +
 Rigidbody Rigidbody::operator+(const Rigidbody& rig) {
     Rigidbody rigFinal(*this);
-    for (uint i=0; i< rig.Size() ; i++) {
-        rigFinal.AddCoord(rig.GetCoords(i));
-        rigFinal.mAtomProp.push_back(rig.mAtomProp[i]);
-    }
+    rigFinal.AddAtoms(rig.atomProp(), rig.GetCoordsArray());
     return rigFinal;
 }
 
@@ -286,13 +327,52 @@ std::string Rigidbody::PrintPDB() const
     std::string output;
     for (uint i=0; i < size ; i++)
     {
-         Atom at(mAtomProp[i], this->GetCoords(i));
+         Atom at(atomProp()[i], this->GetCoords(i));
          output = output + at.ToPdbString();
     }
     return output;
 }
 
 
+void Rigidbody::SaveBinary(std::string filename) const
+{
+    WriteBinary(*this, filename);
+}
+
+
+void Rigidbody::SetAllCoords(const std::vector<Coord3D> & coords)
+{
+    if (coords.size() != Size())
+        throw std::invalid_argument("SetAllCoords: the number of coordinates differs from the number of atoms");
+    if (!coords.empty()) CoordsArray::SetAllCoords(&coords[0]);
+}
+
+
+void Rigidbody::SetCoordsArray(const Coord3D * coords, uint size)
+{
+    if (size != Size())
+        throw std::invalid_argument("SetCoordsArray: the number of coordinates differs from the number of atoms");
+    CoordsArray::SetAllCoords(coords);
+}
+
+
+void Rigidbody::ApplyMatrixBatch(const dbl * matrices, uint nmat, Coord3D * out) const
+{
+    const std::vector<Coord3D> & coords = GetCoordsArray();
+    const uint size = Size();
+    dbl mat44[4][4];
+    for (uint m=0; m<nmat; m++)
+    {
+        for(uint i=0; i<4;i++)
+            for(uint j=0;j<4;j++)
+                mat44[i][j] = matrices[16*m + 4*i + j];
+        Coord3D * outcoords = out + m*size;
+        for (uint k=0; k<size; k++)
+            matrix44xVect(mat44, coords[k], outcoords[k]);
+    }
+}
+
+
 void Rigidbody::ApplyMatrix(const Matrix& mat)
 {
 
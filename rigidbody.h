@@ -28,6 +28,7 @@
 
 #include <vector>
 #include <cassert>
+#include <boost/shared_ptr.hpp>
 
 
 #include "coord3d.h"
@@ -52,16 +53,26 @@ private:
     std::vector<Coord3D> mForces; ///< forces for each atom
     std::string _description; ///< some string to describe the molecule
 
-//    bool isBackbone(const std::string &  atomtype); ///<return true if a given atomtype string matches a backbone atom name
+
+    /*! \brief atom properties (copy on write)
+    *
+    *   Copies of a rigidbody share the same array until one of them modifies
+    *   it: a copy then only duplicates the coordinates. Read the array through
+    *   atomProp() and modify it through mutableAtomProp() only.
+    */
+    boost::shared_ptr<std::vector<Atomproperty> > mAtomProp;
 
 protected:
-    std::vector<Atomproperty> mAtomProp; ///< array of atom properties
+    ///array of atom properties (read only, possibly shared)
+    const std::vector<Atomproperty> & atomProp() const {return *mAtomProp;};
+    ///array of atom properties of this rigidbody only (detached from the copies first)
+    std::vector<Atomproperty> & mutableAtomProp();
 
 
 public:
     /// basic constructor
 	Rigidbody();
-	/// constructor that loads a PDB file
+	/// constructor that loads a PDB or a binary structure file
     Rigidbody(std::string filename);
 	/// copy constructor
     Rigidbody(const Rigidbody& model);
@@ -89,13 +100,13 @@ public:
     /// return atom properties
     Atomproperty const & GetAtomProperty(uint pos) const
     {
-        return mAtomProp[pos];
+        return (*mAtomProp)[pos];
     }
 	
 	/// define atom properties
     void SetAtomProperty(uint pos, const Atomproperty& atprop)
     {
-       mAtomProp[pos] = atprop;
+       mutableAtomProp()[pos] = atprop;
     }
 
 	/// define atom pos
@@ -107,6 +118,12 @@ public:
     /// add an atom to the molecule
     void AddAtom(const Atom& at);
 
+    /// add several atoms at once (deep copy)
+    void AddAtoms(const std::vector<Atomproperty>& atoms, const std::vector<Coord3D>& coords);
+
+    /// add several atoms whose coordinates stay in external memory until they are modified (see CoordsArray::ShareCoords())
+    void AddAtoms(const std::vector<Atomproperty>& atoms, const Coord3D * coords, boost::shared_ptr<const void> owner);
+
     //returns the coordinates of atom i
     Coord3D GetCoords(uint i) const
     {
@@ -126,6 +143,15 @@ public:
       GetCoords(0);
     }
 
+    /// copy the coordinates (and pending rotation/translation) of a rigidbody with the same atoms, without reallocation
+    void SetCoordsFrom(const Rigidbody& rig);
+
+    /// copy only the pending rotation/translation of a rigidbody sharing the same reference coordinates
+    void SetMatrixFrom(const Rigidbody& rig)
+    {
+       CoordsArray::SetMatrixFrom(rig);
+    }
+
 	/// define coordinates of atom i
     void SetCoords(uint i, const Coord3D& co)
     {
@@ -133,6 +159,21 @@ public:
        CoordsArray::SetCoords(i,co);
     }
 
+    /// coordinates of all atoms, without copy (invalidated when atoms are added)
+    const std::vector<Coord3D> & GetCoordsArray() const
+    {
+       return CoordsArray::GetMovedCoords();
+    }
+
+    /// define the coordinates of all atoms at once
+    void SetAllCoords(const std::vector<Coord3D> & coords);
+
+    /// same as above from a raw array ('size' must be Size())
+    void SetCoordsArray(const Coord3D * coords, uint size);
+
+    /// coordinates of the rigidbody moved by each of 'nmat' 4x4 matrices (row-major), the rigidbody is not modified
+    void ApplyMatrixBatch(const dbl * matrices, uint nmat, Coord3D * out) const;
+
     /// return geometric center of all atoms
     Coord3D FindCenter() const;
 
@@ -162,6 +203,9 @@ public:
     /// converts rigidbody to classical PDB-like string
     std::string PrintPDB() const ;
 
+    /// write the rigidbody in a binary structure file (see WriteBinary(), read back by the constructor)
+    void SaveBinary(std::string filename) const;
+
     /// selection : complete
     AtomSelection SelectAllAtoms() const;
 
@@ -204,6 +248,7 @@ public:
     friend void EulerZYZ(const Rigidbody & source, Rigidbody & cible, dbl theta, dbl phi, dbl psi);
 
     friend class AtomSelection;
+    friend class RotationSet;
 
     CoordsArray ToCoordsArray() const {return static_cast<CoordsArray> (*this);}
     // undocumented API
@@ -0,0 +1,214 @@
+//
+// Python (numpy) front-end of Rigidbody and AttractRigidbody arrays, included by the Py++ generated bindings only
+//
+// The forces, atom types and charges views share the memory of the C++ object: atoms
+// cannot be added to a rigidbody while such views exist (the arrays could be moved).
+// The coordinates are a copy, since the moved coordinates are a cache rewritten
+// when the rigidbody moves: ask for a new array after moving the rigidbody.
+//
+
+#ifndef RIGIDBODY_PY_H
+#define RIGIDBODY_PY_H
+
+#include "py_numpy.h"
+#include "attractrigidbody.h"
+
+#include <algorithm>
+#include <map>
+#include <stdexcept>
+
+
+namespace PTools
+{
+
+
+///number of live numpy views of each rigidbody (only used with the Python lock held)
+inline std::map<const Rigidbody *, uint> & rigidbody_views()
+{
+    static std::map<const Rigidbody *, uint> views;
+    return views;
+}
+
+
+///destructor of the objects returned by rigidbody_view_lock()
+inline void rigidbody_view_release(PyObject * capsule)
+{
+    const Rigidbody * rig = (const Rigidbody *) PyCapsule_GetPointer(capsule, "PTools.RigidbodyView");
+    std::map<const Rigidbody *, uint>::iterator it = rigidbody_views().find(rig);
+    if (it != rigidbody_views().end() && --it->second == 0) rigidbody_views().erase(it);
+}
+
+
+///a Python object which counts as a view of 'rig' until it is freed
+inline boost::python::object rigidbody_view_lock(const Rigidbody & rig)
+{
+    PyObject * capsule = PyCapsule_New((void *) &rig, "PTools.RigidbodyView", rigidbody_view_release);
+    if (!capsule) boost::python::throw_error_already_set();
+    boost::python::object lock( (boost::python::handle<>(capsule)) );
+    rigidbody_views()[&rig]++;
+    return lock;
+}
+
+
+///throws if numpy views of the memory of 'rig' exist
+inline void rigidbody_check_views(const Rigidbody & rig, const std::string & function)
+{
+    if (rigidbody_views().count(&rig))
+        throw std::runtime_error(function + ": atoms cannot be added while numpy views of the rigidbody exist");
+}
+
+
+///read-only view of the memory of a rigidbody ('self'), which keeps the rigidbody alive and unresized
+inline boost::python::object rigidbody_view(const void * data, boost::python::tuple shape, const std::string & typestr, boost::python::object self)
+{
+    const Rigidbody & rig = boost::python::extract<const Rigidbody &>(self);
+    return numpy_view(data, shape, typestr, true, boost::python::make_tuple(self, rigidbody_view_lock(rig)));
+}
+
+
+///AddAtom() refused while views exist
+inline void Rigidbody_AddAtom(Rigidbody & rig, const Atomproperty & at, Coord3D co)
+{
+    rigidbody_check_views(rig, "AddAtom");
+    rig.AddAtom(at, co);
+}
+
+
+///AddAtom() refused while views exist
+inline void Rigidbody_AddAtom2(Rigidbody & rig, const Atom & at)
+{
+    rigidbody_check_views(rig, "AddAtom");
+    rig.AddAtom(at);
+}
+
+
+///AddAtoms() refused while views exist
+inline void Rigidbody_AddAtoms(Rigidbody & rig, const std::vector<Atomproperty> & atoms, const std::vector<Coord3D> & coords)
+{
+    rigidbody_check_views(rig, "AddAtoms");
+    rig.AddAtoms(atoms, coords);
+}
+
+
+///(N,3) array of the coordinates (copy)
+inline boost::python::object Rigidbody_GetCoordsView(const Rigidbody & rig)
+{
+#ifdef AUTO_DIFF
+    throw std::runtime_error("numpy arrays are not available with automatic differentiation");
+#endif
+    const std::vector<Coord3D> & coords = rig.GetCoordsArray();
+    boost::python::object array = boost::python::import("numpy").attr("zeros")(boost::python::make_tuple(coords.size(), 3));
+    if (!coords.empty())
+        std::copy(coords.begin(), coords.end(), (Coord3D *) numpy_data(array));
+    return array;
+}
+
+
+///(N,) array of the residue numbers (copy)
+inline boost::python::object Rigidbody_GetResidIds(boost::python::object self)
+{
+    const Rigidbody & rig = boost::python::extract<const Rigidbody &>(self);
+    boost::python::object array = boost::python::import("numpy").attr("zeros")(rig.Size(), "int64");
+    if (rig.Size() == 0) return array;
+    long long * ids = (long long *) numpy_data(array);
+    for (uint i=0; i<rig.Size(); i++)
+        ids[i] = rig.GetAtomProperty(i).GetResidId();
+    return array;
+}
+
+
+///(4,4) array of the rotation/translation matrix (copy)
+inline boost::python::object Rigidbody_GetMatrixArray(Rigidbody & rig)
+{
+    Matrix mat = rig.GetMatrix();
+    boost::python::object array = boost::python::import("numpy").attr("zeros")(boost::python::make_tuple(4, 4));
+    double * data = (double *) numpy_data(array);
+    for (uint i=0; i<4; i++)
+        for (uint j=0; j<4; j++)
+            data[4*i+j] = real(mat(i,j));
+    return array;
+}
+
+
+///set all coordinates from a (N,3) array
+inline void Rigidbody_SetCoordsArray(Rigidbody & rig, boost::python::object coords)
+{
+#ifdef AUTO_DIFF
+    throw std::runtime_error("numpy arrays are not available with automatic differentiation");
+#endif
+    boost::python::object array = numpy_float64(coords);
+    if (boost::python::extract<int>(array.attr("size")) != (int) (3*rig.Size()))
+        throw std::invalid_argument("SetCoordsArray: a (N,3) array is expected, N being the number of atoms");
+    if (rig.Size() == 0) return;
+    rig.SetCoordsArray((const Coord3D *) numpy_data(array), rig.Size());
+}
+
+
+///(M,N,3) coordinates of the rigidbody moved by each matrix of a (M,4,4) array
+inline boost::python::object Rigidbody_ApplyMatrixBatch(const Rigidbody & rig, boost::python::object matrices)
+{
+#ifdef AUTO_DIFF
+    throw std::runtime_error("numpy arrays are not available with automatic differentiation");
+#endif
+    namespace bp = boost::python;
+    bp::object array = numpy_float64(matrices);
+    bp::object shape = array.attr("shape");
+    if (bp::extract<int>(array.attr("ndim")) != 3 || bp::extract<int>(shape[1]) != 4 || bp::extract<int>(shape[2]) != 4)
+        throw std::invalid_argument("ApplyMatrixBatch: a (M,4,4) array is expected");
+    const uint nmat = bp::extract<uint>(shape[0]);
+
+    bp::object out = bp::import("numpy").attr("zeros")(bp::make_tuple(nmat, rig.Size(), 3));
+    if (nmat == 0 || rig.Size() == 0) return out;
+    const dbl * pmatrices = (const dbl *) numpy_data(array);
+    Coord3D * pout = (Coord3D *) numpy_data(out);
+    rig.GetCoordsArray(); //synchronizes the coordinates while holding the lock
+    {
+        ScopedGILRelease nogil;
+        rig.ApplyMatrixBatch(pmatrices, nmat, pout);
+    }
+    return out;
+}
+
+
+///(N,3) view of the forces of the last forcefield evaluation
+inline boost::python::object AttractRigidbody_GetForcesView(boost::python::object self)
+{
+#ifdef AUTO_DIFF
+    throw std::runtime_error("numpy views are not available with automatic differentiation");
+#endif
+    const AttractRigidbody & rig = boost::python::extract<const AttractRigidbody &>(self);
+    const std::vector<Coord3D> & forces = rig.getForces();
+    boost::python::tuple shape = boost::python::make_tuple(forces.size(), 3);
+    if (forces.empty()) return boost::python::import("numpy").attr("zeros")(shape);
+    return rigidbody_view(&forces[0], shape, numpy_typestr<double>('f'), self);
+}
+
+
+///(N,) read-only view of the atom type numbers
+inline boost::python::object AttractRigidbody_GetAtomTypesView(boost::python::object self)
+{
+    const AttractRigidbody & rig = boost::python::extract<const AttractRigidbody &>(self);
+    const std::vector<uint> & types = rig.getAtomTypeNumbers();
+    boost::python::tuple shape = boost::python::make_tuple(types.size());
+    if (types.empty()) return boost::python::import("numpy").attr("zeros")(shape, "uint32");
+    return rigidbody_view(&types[0], shape, numpy_typestr<uint>('u'), self);
+}
+
+
+///(N,) read-only view of the charges
+inline boost::python::object AttractRigidbody_GetChargesView(boost::python::object self)
+{
+#ifdef AUTO_DIFF
+    throw std::runtime_error("numpy views are not available with automatic differentiation");
+#endif
+    const AttractRigidbody & rig = boost::python::extract<const AttractRigidbody &>(self);
+    const std::vector<dbl> & charges = rig.getCharges();
+    boost::python::tuple shape = boost::python::make_tuple(charges.size());
+    if (charges.empty()) return boost::python::import("numpy").attr("zeros")(shape);
+    return rigidbody_view(&charges[0], shape, numpy_typestr<double>('f'), self);
+}
+
+
+}//namespace PTools
+
+#endif
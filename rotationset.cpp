@@ -0,0 +1,131 @@
+#include "rotationset.h"
+
+#include <fstream>
+#include <stdexcept>
+
+
+namespace PTools
+{
+
+
+RotationSet::RotationSet(const std::string & filename)
+    : m_ligandsize(0)
+{
+    std::ifstream rotdat(filename.c_str());
+    if (!rotdat)
+        throw std::invalid_argument("##### RotationSet:Could not open file \"" + filename + "\" #####");
+
+    //same angles as the former rotation reader of attract.py
+    const double zwopi = 2.0*3.14159265;
+    int ntheta, nrot;
+    if (!(rotdat >> ntheta >> nrot) || ntheta < 0 || nrot <= 0)
+        throw std::invalid_argument("RotationSet: bad header in \"" + filename + "\"");
+    std::vector<double> theta(ntheta);
+    std::vector<int> nphi(ntheta);
+    for (int i=0; i<ntheta; i++)
+    {
+        if (!(rotdat >> theta[i] >> nphi[i]) || nphi[i] <= 0)
+            throw std::invalid_argument("RotationSet: bad line in \"" + filename + "\"");
+        theta[i] = zwopi*theta[i]/360.0;
+    }
+
+    for (int k=0; k<ntheta; k++)
+    {
+        const double phii = zwopi/nphi[k];
+        for (int j=0; j<nphi[k]; j++)
+            for (int i=0; i<nrot; i++)
+                AddRotation((j+1)*phii, theta[k], (i+1)*zwopi/nrot);
+    }
+}
+
+
+void RotationSet::AddRotation(dbl phi, dbl ssi, dbl rot)
+{
+    m_angles.push_back(phi);
+    m_angles.push_back(ssi);
+    m_angles.push_back(rot);
+    m_matrices.clear();
+    m_coords.clear();
+}
+
+
+Vdouble RotationSet::GetAngles(uint i) const
+{
+    if (i >= Size())
+        throw std::out_of_range("RotationSet::GetAngles: rotation out of range");
+    return Vdouble(m_angles.begin() + 3*i, m_angles.begin() + 3*i + 3);
+}
+
+
+void RotationSet::SetLigand(const Rigidbody & ligand, uint maxmemory)
+{
+    m_ligandsize = ligand.Size();
+    m_matrices.resize(16*Size());
+    m_coords.clear();
+
+    //the matrices are built by the operations of a placement by hand
+    const CoordsArray reference = ligand.ToCoordsArray();
+    const Matrix start = reference.GetMatrix();
+    const Coord3D center = ligand.FindCenter();
+    dbl mat[4][4];
+    for (uint i=0; i<4; i++)
+        for (uint j=0; j<4; j++)
+            mat[i][j] = start(i,j);
+    for (uint r=0; r<Size(); r++)
+    {
+        CoordsArray rotation;
+        rotation.SetMatrix(mat);
+        rotation.Translate(Coord3D()-center);
+        rotation.AttractEulerRotate(m_angles[3*r], m_angles[3*r+1], m_angles[3*r+2]);
+        const Matrix rotmat = rotation.GetMatrix();
+        for (uint i=0; i<4; i++)
+            for (uint j=0; j<4; j++)
+                m_matrices[16*r+4*i+j] = rotmat(i,j);
+    }
+
+    if ((double) Size() * m_ligandsize * sizeof(Coord3D) > maxmemory * 1048576.0)
+        return; //matrices only
+
+    m_coords.resize((size_t) Size() * m_ligandsize);
+    for (uint r=0; r<Size() && m_ligandsize>0; r++)
+        reference.RotateRefCoords((const dbl (*)[4]) &m_matrices[16*r], &m_coords[(size_t) r * m_ligandsize]);
+}
+
+
+Matrix RotationSet::GetMatrix(uint i) const
+{
+    if (i >= Size() || m_matrices.empty())
+        throw std::out_of_range("RotationSet::GetMatrix: rotation out of range or no ligand given");
+    Matrix mat(4,4);
+    for (uint k=0; k<4; k++)
+        for (uint j=0; j<4; j++)
+            mat(k,j) = m_matrices[16*i+4*k+j];
+    return mat;
+}
+
+
+void RotationSet::Place(uint i, const Coord3D & translation, Rigidbody & ligand) const
+{
+    if (m_matrices.empty())
+        throw std::invalid_argument("RotationSet::Place: no ligand given (SetLigand)");
+    if (i >= Size())
+        throw std::out_of_range("RotationSet::Place: rotation out of range");
+    if (ligand.Size() != m_ligandsize)
+        throw std::invalid_argument("RotationSet::Place: the ligand is not the one given to SetLigand");
+
+    dbl mat[4][4];
+    for (uint k=0; k<4; k++)
+        for (uint j=0; j<4; j++)
+            mat[k][j] = m_matrices[16*i+4*k+j];
+    //as Translate()
+    mat[0][3] += translation.x;
+    mat[1][3] += translation.y;
+    mat[2][3] += translation.z;
+
+    CoordsArray & coords = ligand;
+    coords.SetMatrix(mat, HasCoords() ? &m_coords[(size_t) i * m_ligandsize] : 0);
+}
+
+
+
+}//namespace PTools
@@ -0,0 +1,77 @@
+#ifndef ROTATIONSET_H
+#define ROTATIONSET_H
+
+#include "rigidbody.h"
+
+#include <string>
+#include <vector>
+
+
+namespace PTools
+{
+
+
+/*! \brief Starting orientations of a systematic docking run
+*
+*   The (phi, ssi, rot) Attract Euler angles are read from a rotation file
+*   (rotation.dat) or added one by one. Once a ligand is given, the matrix
+*   of each rotation (ligand centered on the origin then rotated) is computed
+*   once for the whole run, together with the rotated coordinates of the
+*   ligand if they fit in the memory limit. Placing a copy of the ligand at
+*   a translation point is then a matrix copy and, with the coordinates,
+*   a translation of each atom.
+*
+*   Placed ligands are identical, matrix and coordinates, to the ligand
+*   centered with Translate(), rotated with AttractEulerRotate() and
+*   translated again.
+*/
+class RotationSet
+{
+public:
+    RotationSet(): m_ligandsize(0) {};
+    ///reads a rotation file (rotation.dat format)
+    RotationSet(const std::string & filename);
+
+    ///appends a rotation (discards the precomputed ligand)
+    void AddRotation(dbl phi, dbl ssi, dbl rot);
+
+    uint Size() const {return m_angles.size()/3;}; ///< number of rotations
+
+    ///angles (phi, ssi, rot) of rotation i
+    Vdouble GetAngles(uint i) const;
+
+    /*! \brief precomputes the rotations of a ligand
+    *
+    *   The rotated coordinates are kept if they need less than 'maxmemory'
+    *   megabytes, otherwise only the matrices are kept.
+    */
+    void SetLigand(const Rigidbody & ligand, uint maxmemory = 256);
+
+    ///true if the rotated coordinates of the ligand are kept
+    bool HasCoords() const {return !m_coords.empty();};
+
+    ///4x4 matrix of rotation i for the ligand (centering included)
+    Matrix GetMatrix(uint i) const;
+
+    /*! \brief moves a copy of the ligand to rotation i and translation point 'translation'
+    *
+    *   'ligand' must have the reference coordinates of the ligand given to
+    *   SetLigand() (a copy of it): its rotation/translation is replaced.
+    */
+    void Place(uint i, const Coord3D & translation, Rigidbody & ligand) const;
+
+
+private:
+
+    std::vector<dbl> m_angles; ///< phi, ssi, rot of each rotation
+    std::vector<dbl> m_matrices; ///< 4x4 matrix of each rotation (row-major)
+    std::vector<Coord3D> m_coords; ///< rotated coordinates, ligand size values per rotation
+    uint m_ligandsize;
+
+};
+
+
+
+}//namespace PTools
+
+#endif